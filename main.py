@@ -8,74 +8,58 @@
 
 import sys
 import os
-import socket
-import time
-from PyQt5.QtWidgets import QApplication, QMessageBox
-from PyQt5.QtCore import Qt
+import multiprocessing
+from PyQt5.QtWidgets import QApplication
 
 # 添加src目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from main_window import MainWindow
+from debug_log import setup_logging
+from single_instance import SingleInstance
 
-class SingleInstanceApp:
-    """单实例应用程序类"""
-    
-    def __init__(self, port=12345):
-        self.port = port
-        self.socket = None
-        
-    def is_running(self):
-        """检查是否已有实例运行"""
-        try:
-            # 尝试绑定端口
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.bind(('127.0.0.1', self.port))
-            self.socket.listen(1)
-            return False  # 没有其他实例运行
-        except OSError:
-            return True   # 已有实例运行
-            
-    def cleanup(self):
-        """清理资源"""
-        if self.socket:
-            try:
-                self.socket.close()
-            except:
-                pass
 
 def main():
     """主函数"""
-    # 检查单实例
-    single_instance = SingleInstanceApp()
+    setup_logging()
+    
+    # 创建应用实例
+    app = QApplication(sys.argv)
+    app.setQuitOnLastWindowClosed(False)  # 关闭窗口时不退出应用
     
-    if single_instance.is_running():
-        # 已有实例运行，直接退出不显示任何提示
-        single_instance.cleanup()
+    # 命令行中的文档（从资源管理器打开时传入），转发时使用绝对路径
+    file_paths = [os.path.abspath(path) for path in app.arguments()[1:]]
+    
+    # 检查单实例：已有实例运行时把文档交给它打开，直接退出不显示任何提示
+    single_instance = SingleInstance()
+    if not single_instance.start(file_paths):
         return
     
     try:
-        # 创建应用实例
-        app = QApplication(sys.argv)
-        app.setQuitOnLastWindowClosed(False)  # 关闭窗口时不退出应用
-        
         # 设置应用信息
         app.setApplicationName("技术文档阅读器")
         app.setApplicationVersion("1.0.0")
         app.setOrganizationName("TechnicalReader")
         
+        # 已经确定是唯一的实例后才导入主窗口，转发后退出的实例不必加载它
+        from main_window import MainWindow
+        
         # 创建主窗口
         window = MainWindow()
+        single_instance.files_received.connect(window.open_files)
         window.show()
+        if file_paths:
+            window.open_files(file_paths)
         
         # 启动事件循环
         result = app.exec_()
         
     finally:
         # 清理资源
-        single_instance.cleanup()
+        single_instance.close()
         
     sys.exit(result)
 
 if __name__ == "__main__":
+    # 打包后的程序中，文档库索引的子进程从这里进入
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
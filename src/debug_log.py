@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志模块
+按类别输出日志，鼠标、光标等热路径上的跟踪默认关闭
+
+通过环境变量开启调试输出：
+    THIEF_READER_LOG=mouse,cursor      开启指定类别的调试日志，all表示全部
+    THIEF_READER_LOG_FILE=reader.log   同时写入日志文件
+
+热路径上的代码先判断 trace_enabled() 在导入时得到的模块级常量再记录日志，
+关闭时每个事件只多一次全局变量读取，不会格式化任何字符串。
+"""
+
+import logging
+import os
+import sys
+
+# 日志器名称的根
+ROOT_LOGGER = 'thief_reader'
+
+# 日志类别
+CATEGORIES = ('app', 'init', 'mouse', 'cursor', 'border', 'document', 'settings', 'mode', 'tray')
+
+LOG_ENV = 'THIEF_READER_LOG'
+LOG_FILE_ENV = 'THIEF_READER_LOG_FILE'
+
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+
+
+def _enabled_categories():
+    value = os.environ.get(LOG_ENV, '')
+    names = {name.strip().lower() for name in value.split(',') if name.strip()}
+    if 'all' in names:
+        return set(CATEGORIES)
+    return names
+
+
+_ENABLED = _enabled_categories()
+
+
+def trace_enabled(category):
+    """某个类别的调试日志是否开启，供热路径在导入时保存为模块级常量"""
+    return category in _ENABLED
+
+
+def get_logger(category):
+    """获取某个类别的日志器"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{category}")
+
+
+def setup_logging():
+    """
+    配置日志输出，程序启动时调用一次
+
+    默认只输出警告和错误；开启了调试类别时对应类别输出调试日志。
+    没有控制台的Windows窗口程序中 sys.stderr 为None，此时只写日志文件。
+    """
+    root = logging.getLogger(ROOT_LOGGER)
+    if root.handlers:
+        return
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    if sys.stderr is not None:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+    log_file = os.environ.get(LOG_FILE_ENV)
+    if log_file:
+        try:
+            handler = logging.FileHandler(log_file, encoding='utf-8')
+            handler.setFormatter(formatter)
+            root.addHandler(handler)
+        except OSError as e:
+            root.warning(f"无法打开日志文件 {log_file}: {e}")
+    if not root.handlers:
+        root.addHandler(logging.NullHandler())
+
+    root.setLevel(logging.WARNING)
+    root.propagate = False
+    for category in _ENABLED:
+        get_logger(category).setLevel(logging.DEBUG)
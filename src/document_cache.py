@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档缓存模块
+把提取出的PDF文本和渲染好的Markdown正文保存在磁盘上，重新打开时直接使用
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from document_reader import READER_VERSION, pdf_page_table
+from debug_log import get_logger
+
+log = get_logger('document')
+
+# 缓存总大小上限，超出后按最近最少使用淘汰
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+class DocumentCache:
+    """磁盘文档缓存
+
+    每个条目对应一个(文件路径, 内容类型)，并记录文件大小、修改时间和
+    阅读器版本，任一项变化时条目失效。条目索引保存在 index.json 中。
+    读取缓存只在内存中更新访问时间，索引在写入、删除条目时或调用 flush() 时才保存。
+    数据文件的写入和索引的保存都不持有锁，锁只保护内存中的索引；
+    启动时删除索引中没有记录的数据文件（写入数据后、保存索引前退出时留下的）。
+    """
+
+    def __init__(self, cache_dir, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self._lock = threading.Lock()
+        self._index = {}
+        self._dirty = False  # 内存中的索引是否有尚未保存的改动（访问时间、失效条目）
+        self._save_lock = threading.Lock()  # 串行化索引文件的写入
+        self._snapshot = 0        # 最近一次生成的索引快照序号
+        self._saved_snapshot = 0  # 已写入磁盘的快照序号，较旧的快照不再覆盖它
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+        self._remove_orphans()
+
+    def get(self, file_path, kind):
+        """
+        读取缓存
+
+        Args:
+            file_path (str): 文档路径
+            kind (str): 内容类型，如 'markdown-body'、'pdf-pages'
+
+        Returns:
+            str: 缓存的内容，没有或已失效时返回None
+        """
+        content = self._read(file_path, kind, lambda f: f.read())
+        return None if content is None else content.decode('utf-8')
+
+    def read_range(self, file_path, kind, offset, length):
+        """
+        读取缓存内容中的一段，不读取整个数据文件
+
+        Args:
+            offset (int): 起始字节偏移
+            length (int): 字节数
+
+        Returns:
+            str: 这一段内容，没有或已失效时返回None
+        """
+        def read(f):
+            f.seek(offset)
+            return f.read(length)
+
+        data = self._read(file_path, kind, read)
+        if data is None or len(data) != length:
+            return None
+        try:
+            return data.decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+
+    def _read(self, file_path, kind, read):
+        """校验缓存条目后以二进制方式打开数据文件，由read读取内容"""
+        file_stat = self.stat(file_path)
+        if file_stat is None:
+            return None
+
+        entry_id = self._entry_id(file_path, kind)
+        with self._lock:
+            entry = self._index.get(entry_id)
+            if entry is None:
+                return None
+            if not self._entry_matches(entry, file_stat):
+                # 文件已改变，删除过期条目
+                self._remove_entry(entry_id)
+                self._dirty = True
+                return None
+
+        # 在锁外读取内容，不阻塞其他线程；数据文件由 os.replace 整体替换，不会读到一半
+        try:
+            with open(self._data_file(entry_id), 'rb') as f:
+                content = read(f)
+        except OSError:
+            with self._lock:
+                if self._index.get(entry_id) is entry:
+                    self._remove_entry(entry_id)
+                    self._dirty = True
+            return None
+
+        with self._lock:
+            entry['access'] = time.time()
+            self._dirty = True
+        return content
+
+    def put(self, file_path, kind, content, file_stat=None):
+        """
+        写入缓存
+
+        Args:
+            file_path (str): 文档路径
+            kind (str): 内容类型
+            content (str): 要缓存的内容
+            file_stat (tuple): 读取文档之前获取的(大小, 修改时间)，
+                避免读取期间文件被修改导致缓存内容与文件不一致
+        """
+        if file_stat is None:
+            file_stat = self.stat(file_path)
+        if file_stat is None:
+            return
+
+        entry_id = self._entry_id(file_path, kind)
+        data = content.encode('utf-8')
+        if len(data) > self.max_bytes:
+            return
+
+        # 在锁外写入临时文件，每个线程使用自己的临时文件
+        data_file = self._data_file(entry_id)
+        temp_file = f"{data_file}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_file, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            log.warning(f"写入文档缓存时出错: {e}")
+            self._remove_file(temp_file)
+            return
+
+        with self._lock:
+            try:
+                os.replace(temp_file, data_file)
+            except OSError as e:
+                log.warning(f"写入文档缓存时出错: {e}")
+                self._remove_file(temp_file)
+                return
+
+            self._index[entry_id] = {
+                'path': file_path,
+                'kind': kind,
+                'size': file_stat[0],
+                'mtime': file_stat[1],
+                'version': READER_VERSION,
+                'bytes': len(data),
+                'access': time.time(),
+            }
+            self._evict()
+            self._dirty = True
+        self._save_index()
+
+    def put_pdf_pages(self, file_path, pages, file_stat=None):
+        """
+        缓存PDF的各页文本和页面表，之后可以用 get_pdf_page() 逐页读取
+
+        Args:
+            pages (list): 各页文本
+        """
+        pages_json, table_json = pdf_page_table(pages)
+        # 先写页面文本，读到页面表时页面文本一定已经写入
+        self.put(file_path, 'pdf-pages', pages_json, file_stat)
+        self.put(file_path, 'pdf-page-table', table_json, file_stat)
+
+    def get_pdf_page_table(self, file_path):
+        """缓存中PDF的页面表，没有或已失效时返回None"""
+        cached = self.get(file_path, 'pdf-page-table')
+        return json.loads(cached) if cached else None
+
+    def get_pdf_page(self, file_path, page_table, page_num):
+        """按页面表从缓存中读取一页文本，没有或已失效时返回None"""
+        offset, length = page_table[page_num][:2]
+        cached = self.read_range(file_path, 'pdf-pages', offset, length)
+        return json.loads(cached) if cached is not None else None
+
+    def flush(self):
+        """保存尚未写入的访问时间（程序退出时调用）"""
+        self._save_index()
+
+    def invalidate(self, file_path):
+        """删除某个文档的所有缓存条目"""
+        with self._lock:
+            for entry_id, entry in list(self._index.items()):
+                if entry['path'] == file_path:
+                    self._remove_entry(entry_id)
+                    self._dirty = True
+        self._save_index()
+
+    @staticmethod
+    def stat(file_path):
+        """获取文件的(大小, 修改时间)，文件不存在时返回None"""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def _entry_matches(self, entry, file_stat):
+        return (entry.get('size') == file_stat[0]
+                and entry.get('mtime') == file_stat[1]
+                and entry.get('version') == READER_VERSION)
+
+    def _entry_id(self, file_path, kind):
+        key = f"{os.path.abspath(file_path)}|{kind}"
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _data_file(self, entry_id):
+        return os.path.join(self.cache_dir, f"{entry_id}.dat")
+
+    def _remove_entry(self, entry_id):
+        self._index.pop(entry_id, None)
+        self._remove_file(self._data_file(entry_id))
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _remove_orphans(self):
+        """删除索引中没有记录的数据文件和残留的临时文件"""
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            entry_id, ext = os.path.splitext(name)
+            if (ext == '.dat' and entry_id not in self._index) or ext == '.tmp':
+                self._remove_file(os.path.join(self.cache_dir, name))
+
+    def _evict(self):
+        """超出大小上限时淘汰最久未访问的条目"""
+        total = sum(entry['bytes'] for entry in self._index.values())
+        if total <= self.max_bytes:
+            return
+        for entry_id, entry in sorted(self._index.items(), key=lambda item: item[1]['access']):
+            if total <= self.max_bytes:
+                break
+            total -= entry['bytes']
+            self._remove_entry(entry_id)
+
+    def _load_index(self):
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if isinstance(index, dict):
+                self._index = index
+        except (OSError, ValueError):
+            self._index = {}
+
+    def _save_index(self):
+        """保存索引：在锁内生成快照，在锁外写入文件（调用时不能持有 _lock）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            text = json.dumps(self._index, ensure_ascii=False)
+            self._dirty = False
+            self._snapshot += 1
+            snapshot = self._snapshot
+        with self._save_lock:
+            if snapshot < self._saved_snapshot:
+                # 其他线程已经写入了更新的快照
+                return
+            try:
+                temp_file = self.index_file + ".tmp"
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                os.replace(temp_file, self.index_file)
+                self._saved_snapshot = snapshot
+            except OSError as e:
+                log.warning(f"保存文档缓存索引时出错: {e}")
+                with self._lock:
+                    self._dirty = True
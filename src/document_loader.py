@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台文档加载模块
+在线程池中解析文档，通过信号把进度和内容送回GUI线程
+"""
+
+import json
+import os
+import threading
+from functools import partial
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from document_cache import DocumentCache
+from document_reader import LoadCancelled, check_cancelled, format_pdf_page
+from search_index import SearchIndex
+from virtual_text_view import MappedTextFile
+from debug_log import get_logger
+
+log = get_logger('document')
+
+# 后台加载时先送出的PDF页数
+PDF_INITIAL_PAGES = 5
+
+# 超过这个大小的文本文件使用内存映射的虚拟视图显示
+VIRTUAL_TEXT_THRESHOLD = 64 * 1024 * 1024
+
+
+class LoadResult:
+    """文档加载结果"""
+
+    def __init__(self, file_path, kind, content=None, pdf=None):
+        self.file_path = file_path
+        self.kind = kind          # 'pdf'、'html'（Markdown正文）、'text' 或 'mapped'
+        self.content = content    # 'pdf' 类型的内容已通过 partial_content 分段送出
+        self.pdf = pdf            # 按需加载的PDF文档
+        self.text_file = None     # 'mapped' 类型的内存映射文本文件
+        self.file_stat = None     # PDF未命中缓存时记录的文件状态，用于后台补全缓存
+
+
+class _LoaderSignals(QObject):
+    """工作线程使用的信号，对象本身属于GUI线程"""
+
+    progress = pyqtSignal(int, int, int)      # 任务ID, 已完成, 总量
+    partial = pyqtSignal(int, str)            # 任务ID, 部分内容
+    finished = pyqtSignal(int, object)        # 任务ID, LoadResult
+    failed = pyqtSignal(int, str)             # 任务ID, 错误信息
+    pages_ready = pyqtSignal(object, str)     # LazyPdfDocument, 追加的页面文本
+    index_progress = pyqtSignal(object, int, int)  # MappedTextFile, 已索引字节数, 文件大小
+    search_index = pyqtSignal(str, object)    # 文件路径, SearchIndex
+    search_index_failed = pyqtSignal(str, str)  # 文件路径, 错误信息
+    outline = pyqtSignal(str, object)         # 文件路径, PDF书签列表
+
+
+class _LoadTask(QRunnable):
+    """读取整个文档（PDF只读取前几页）的后台任务"""
+
+    def __init__(self, task_id, file_path, document_reader, document_cache, signals, prefetched=None):
+        """
+        Args:
+            prefetched (PrefetchStore): 空闲时预取的文档，有这个文档时直接使用
+        """
+        super().__init__()
+        self.task_id = task_id
+        self.file_path = file_path
+        self.document_reader = document_reader
+        self.document_cache = document_cache
+        self.signals = signals
+        self.prefetched = prefetched
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """请求取消任务"""
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            result = self._load()
+        except LoadCancelled:
+            return
+        except Exception as e:
+            if not self.cancel_event.is_set():
+                self.signals.failed.emit(self.task_id, str(e))
+            return
+
+        if self.cancel_event.is_set():
+            if result is not None:
+                _release_result(result)
+            return
+        if result is None:
+            self.signals.failed.emit(self.task_id, "无法读取文档内容")
+        else:
+            self.signals.finished.emit(self.task_id, result)
+
+    def _load(self):
+        file_ext = os.path.splitext(self.file_path)[1].lower()
+        cancel_check = self.cancel_event.is_set
+
+        cache = self.document_cache
+        file_stat = DocumentCache.stat(self.file_path)
+        prefetched = self.prefetched.take(self.file_path, file_stat) if self.prefetched else None
+
+        if file_ext == '.pdf':
+            page_table = cache.get_pdf_page_table(self.file_path) if cache else None
+            page_reader = partial(cache.get_pdf_page, self.file_path, page_table) if page_table else None
+            pdf = self.document_reader.open_pdf(self.file_path, page_table, page_reader)
+            if pdf is None:
+                return None
+            if prefetched is not None:
+                # 预取时已读取的前几页
+                pdf.add_pages(0, prefetched.content)
+            try:
+                # 逐页送出，第一页提取完就能显示
+                initial = min(PDF_INITIAL_PAGES, pdf.page_count)
+                for page_num in range(initial):
+                    text = pdf.next_pages(1, cancel_check)
+                    if text:
+                        self.signals.partial.emit(self.task_id, text)
+                    self.signals.progress.emit(self.task_id, page_num + 1, initial)
+            except Exception:
+                pdf.close()
+                raise
+            result = LoadResult(self.file_path, 'pdf', '', pdf)
+            if page_table is None:
+                result.file_stat = file_stat
+            return result
+
+        if prefetched is not None:
+            return LoadResult(self.file_path, prefetched.kind, prefetched.content)
+
+        encoding = None
+        if file_ext == '.txt':
+            encoding = self._text_encoding(file_stat)
+
+        if (file_ext == '.txt' and file_stat and file_stat[0] >= VIRTUAL_TEXT_THRESHOLD
+                and not encoding.startswith(('utf-16', 'utf-32'))):
+            # 超大文本不读入内存，行索引在后台另行建立（按单字节换行符分行，不支持UTF-16/32）
+            result = LoadResult(self.file_path, 'mapped')
+            result.text_file = MappedTextFile(self.file_path, encoding)
+            return result
+
+        if file_ext == '.md':
+            # 只缓存正文，样式外壳在显示时按当前字体和颜色套上
+            content = cache.get(self.file_path, 'markdown-body') if cache else None
+            if content is None:
+                check_cancelled(cancel_check)
+                content = self.document_reader.read_markdown_body(self.file_path, cancel_check)
+                if cache and file_stat:
+                    cache.put(self.file_path, 'markdown-body', content, file_stat)
+            return LoadResult(self.file_path, 'html', content)
+
+        content = self.document_reader.read_document(
+            self.file_path,
+            progress_callback=lambda done, total: self.signals.progress.emit(self.task_id, done, total),
+            cancel_check=cancel_check,
+            encoding=encoding)
+        if content is None:
+            return None
+        return LoadResult(self.file_path, 'text', content)
+
+    def _text_encoding(self, file_stat):
+        """文本文件的编码，优先使用缓存中记录的检测结果"""
+        cache = self.document_cache
+        encoding = cache.get(self.file_path, 'encoding') if cache else None
+        if encoding:
+            return encoding
+        encoding = self.document_reader.detect_encoding(self.file_path)
+        if cache and file_stat:
+            cache.put(self.file_path, 'encoding', encoding, file_stat)
+        return encoding
+
+
+def _release_result(result):
+    """释放加载结果中打开的文件"""
+    if result.pdf:
+        result.pdf.close()
+    if result.text_file:
+        result.text_file.close()
+
+
+class _LineIndexTask(QRunnable):
+    """为内存映射的文本文件建立行索引的后台任务"""
+
+    def __init__(self, text_file, signals, cancel_event):
+        super().__init__()
+        self.text_file = text_file
+        self.signals = signals
+        self.cancel_event = cancel_event
+
+    def run(self):
+        try:
+            self.text_file.build_index(
+                progress_callback=lambda done, total: self.signals.index_progress.emit(
+                    self.text_file, done, total),
+                cancel_check=self.cancel_event.is_set)
+        except LoadCancelled:
+            return
+        except Exception as e:
+            log.warning(f"建立行索引时出错: {e}")
+            return
+        self.signals.index_progress.emit(self.text_file, self.text_file.size, self.text_file.size)
+
+
+class _PdfPagesTask(QRunnable):
+    """为按需加载的PDF追加页面的后台任务"""
+
+    def __init__(self, pdf, count, signals, cancel_event):
+        super().__init__()
+        self.pdf = pdf
+        self.count = count
+        self.signals = signals
+        self.cancel_event = cancel_event
+
+    def run(self):
+        try:
+            text = self.pdf.next_pages(self.count, self.cancel_event.is_set)
+        except LoadCancelled:
+            return
+        except Exception as e:
+            log.warning(f"提取PDF页面时出错: {e}")
+            text = ''
+        if not self.cancel_event.is_set():
+            self.signals.pages_ready.emit(self.pdf, text)
+
+
+class _PdfCacheTask(QRunnable):
+    """在后台提取PDF的全部页面并写入缓存"""
+
+    def __init__(self, file_path, file_stat, document_reader, document_cache, cancel_event, pending,
+                 pdf=None):
+        """
+        Args:
+            pdf (LazyPdfDocument): 正在阅读的这个PDF，提取完成的页面随即交给它，滚动时不再重复提取
+        """
+        super().__init__()
+        self.file_path = file_path
+        self.file_stat = file_stat
+        self.document_reader = document_reader
+        self.document_cache = document_cache
+        self.cancel_event = cancel_event
+        self.pending = pending
+        self.pdf = pdf
+
+    def run(self):
+        try:
+            pages = self.document_reader.extract_pdf_pages(
+                self.file_path, cancel_check=self.cancel_event.is_set,
+                pages_callback=self.pdf.add_pages if self.pdf else None)
+            self.document_cache.put_pdf_pages(self.file_path, pages, self.file_stat)
+            if self.pdf:
+                # 阅读中的PDF只保留LRU窗口，之后的页面从缓存逐页读取
+                page_table = self.document_cache.get_pdf_page_table(self.file_path)
+                if page_table is not None and len(page_table) == self.pdf.page_count:
+                    self.pdf.page_reader = partial(self.document_cache.get_pdf_page,
+                                                   self.file_path, page_table)
+        except LoadCancelled:
+            pass
+        except Exception as e:
+            log.warning(f"缓存PDF文本时出错: {e}")
+        finally:
+            self.pending.discard(self.file_path)
+            self.pdf = None
+
+
+class _SearchIndexTask(QRunnable):
+    """读取或建立文档的全文搜索索引，新建的索引写入缓存"""
+
+    def __init__(self, file_path, text, document_reader, document_cache, signals, cancel_event):
+        """
+        Args:
+            text (str): 阅读区域中显示的全文，为None时（PDF）使用缓存中提取好的页面
+        """
+        super().__init__()
+        self.file_path = file_path
+        self.text = text
+        self.document_reader = document_reader
+        self.document_cache = document_cache
+        self.signals = signals
+        self.cancel_event = cancel_event
+
+    def run(self):
+        try:
+            index = self._load_index()
+        except LoadCancelled:
+            return
+        except Exception as e:
+            log.warning(f"建立搜索索引时出错: {e}")
+            if not self.cancel_event.is_set():
+                self.signals.search_index_failed.emit(self.file_path, str(e))
+            return
+        finally:
+            self.text = None
+        if not self.cancel_event.is_set():
+            self.signals.search_index.emit(self.file_path, index)
+
+    def _load_index(self):
+        cache = self.document_cache
+        file_stat = DocumentCache.stat(self.file_path)
+        cached = cache.get(self.file_path, 'search-index') if cache else None
+        if cached is not None:
+            index = SearchIndex.loads(cached)
+            if index is not None:
+                return index
+
+        text = self.text
+        if text is None:
+            # PDF的全文由补全缓存的任务提取，它在同一个线程池中先于本任务执行；
+            # 缓存中没有页面时（超过大小上限、已淘汰或提取失败）在这里重新提取
+            pages = cache.get(self.file_path, 'pdf-pages') if cache else None
+            if pages is not None:
+                pages = json.loads(pages)
+            else:
+                pages = self.document_reader.extract_pdf_pages(
+                    self.file_path, cancel_check=self.cancel_event.is_set)
+            text = ''.join(format_pdf_page(page_num, page)
+                           for page_num, page in enumerate(pages))
+
+        index = SearchIndex.build(text, self.cancel_event.is_set)
+        if cache and file_stat:
+            cache.put(self.file_path, 'search-index', index.dumps(), file_stat)
+        return index
+
+
+class _PdfOutlineTask(QRunnable):
+    """读取PDF的书签，结果写入缓存"""
+
+    def __init__(self, file_path, document_reader, document_cache, signals):
+        super().__init__()
+        self.file_path = file_path
+        self.document_reader = document_reader
+        self.document_cache = document_cache
+        self.signals = signals
+
+    def run(self):
+        cache = self.document_cache
+        cached = cache.get(self.file_path, 'pdf-outline') if cache else None
+        if cached is not None:
+            entries = [tuple(entry) for entry in json.loads(cached)]
+        else:
+            file_stat = DocumentCache.stat(self.file_path)
+            try:
+                entries = self.document_reader.read_pdf_outline(self.file_path)
+            except Exception as e:
+                log.warning(f"读取PDF书签时出错: {e}")
+                entries = []
+            if cache and file_stat:
+                cache.put(self.file_path, 'pdf-outline', json.dumps(entries, ensure_ascii=False), file_stat)
+        self.signals.outline.emit(self.file_path, entries)
+
+
+class _ClosePdfTask(QRunnable):
+    """在后台关闭PDF，等待正在进行的页面提取结束而不阻塞GUI线程"""
+
+    def __init__(self, pdf):
+        super().__init__()
+        self.pdf = pdf
+
+    def run(self):
+        self.pdf.close()
+
+
+class DocumentLoader(QObject):
+    """后台文档加载器
+
+    同一时间只有一个有效的加载任务，开始新的加载会取消正在进行的任务，
+    已取消任务发出的信号会被丢弃。
+    """
+
+    load_progress = pyqtSignal(str, int, int)   # 文件路径, 已完成, 总量
+    partial_content = pyqtSignal(str, str)      # 文件路径, 部分内容
+    load_finished = pyqtSignal(object)          # LoadResult
+    load_failed = pyqtSignal(str, str)          # 文件路径, 错误信息
+    pdf_pages_ready = pyqtSignal(object, str)   # LazyPdfDocument, 追加的页面文本
+    line_index_progress = pyqtSignal(object, int, int)  # MappedTextFile, 已索引字节数, 文件大小
+    search_index_ready = pyqtSignal(str, object)        # 文件路径, SearchIndex
+    search_index_failed = pyqtSignal(str, str)          # 文件路径, 错误信息
+    pdf_outline_ready = pyqtSignal(str, object)         # 文件路径, (层级, 标题, 页码) 列表
+
+    def __init__(self, document_reader, document_cache=None, parent=None, prefetched=None):
+        """
+        Args:
+            prefetched (PrefetchStore): 空闲时预取的文档，加载时优先使用
+        """
+        super().__init__(parent)
+        self.document_reader = document_reader
+        self.document_cache = document_cache
+        self.prefetched = prefetched
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(2)
+
+        # 补全PDF缓存的任务单独排队，切换文档时不取消，退出时才停止
+        self.cache_pool = QThreadPool(self)
+        self.cache_pool.setMaxThreadCount(1)
+        self._caching_files = set()
+        self._shutdown_event = threading.Event()
+
+        self._signals = _LoaderSignals(self)
+        self._signals.progress.connect(self._on_progress)
+        self._signals.partial.connect(self._on_partial)
+        self._signals.finished.connect(self._on_finished)
+        self._signals.failed.connect(self._on_failed)
+        self._signals.pages_ready.connect(self.pdf_pages_ready)
+        self._signals.index_progress.connect(self.line_index_progress)
+        self._signals.search_index.connect(self.search_index_ready)
+        self._signals.search_index_failed.connect(self.search_index_failed)
+        self._signals.outline.connect(self.pdf_outline_ready)
+
+        self._next_task_id = 0
+        self._current_task = None
+        self._pages_cancel_event = threading.Event()
+
+    @property
+    def loading_file(self):
+        """正在加载的文件路径，没有时返回None"""
+        return self._current_task.file_path if self._current_task else None
+
+    def load(self, file_path):
+        """开始在后台加载文档，取消正在进行的加载"""
+        self.cancel()
+        self._next_task_id += 1
+        self._current_task = _LoadTask(self._next_task_id, file_path, self.document_reader,
+                                       self.document_cache, self._signals, self.prefetched)
+        self.thread_pool.start(self._current_task)
+
+    def cancel(self):
+        """取消正在进行的加载和页面提取"""
+        if self._current_task:
+            self._current_task.cancel()
+            self._current_task = None
+        self._pages_cancel_event.set()
+        self._pages_cancel_event = threading.Event()
+
+    def fetch_pdf_pages(self, pdf, count):
+        """在后台为按需加载的PDF提取接下来的若干页"""
+        self.thread_pool.start(_PdfPagesTask(pdf, count, self._signals, self._pages_cancel_event))
+
+    def build_search_index(self, file_path, text=None):
+        """
+        在后台读取或建立文档的搜索索引，完成后发出 search_index_ready，失败时发出 search_index_failed
+
+        与补全PDF缓存的任务在同一个线程池中排队，PDF的索引使用其提取好的页面。
+
+        Args:
+            file_path (str): 文档路径
+            text (str): 阅读区域中显示的全文，PDF不需要提供
+        """
+        self.cache_pool.start(_SearchIndexTask(file_path, text, self.document_reader,
+                                               self.document_cache, self._signals,
+                                               self._shutdown_event))
+
+    def load_pdf_outline(self, file_path):
+        """在后台读取PDF的书签，完成后发出 pdf_outline_ready"""
+        self.thread_pool.start(_PdfOutlineTask(file_path, self.document_reader, self.document_cache,
+                                               self._signals))
+
+    def shutdown(self):
+        """停止所有后台任务（程序退出时调用）"""
+        self.cancel()
+        self._shutdown_event.set()
+
+    def release_pdf(self, pdf):
+        """在后台关闭不再使用的PDF"""
+        self.thread_pool.start(_ClosePdfTask(pdf))
+
+    def _is_current(self, task_id):
+        return self._current_task is not None and self._current_task.task_id == task_id
+
+    def _on_progress(self, task_id, done, total):
+        if self._is_current(task_id):
+            self.load_progress.emit(self._current_task.file_path, done, total)
+
+    def _on_partial(self, task_id, text):
+        if self._is_current(task_id):
+            self.partial_content.emit(self._current_task.file_path, text)
+
+    def _on_finished(self, task_id, result):
+        if not self._is_current(task_id):
+            # 已被取消的任务，释放它打开的文件
+            if result.pdf:
+                self.release_pdf(result.pdf)
+            if result.text_file:
+                result.text_file.close()
+            return
+        self._current_task = None
+        if result.text_file:
+            self.thread_pool.start(_LineIndexTask(result.text_file, self._signals, self._pages_cancel_event))
+        if result.file_stat and self.document_cache and result.file_path not in self._caching_files:
+            self._caching_files.add(result.file_path)
+            self.cache_pool.start(_PdfCacheTask(result.file_path, result.file_stat, self.document_reader,
+                                                self.document_cache, self._shutdown_event,
+                                                self._caching_files, result.pdf))
+        self.load_finished.emit(result)
+
+    def _on_failed(self, task_id, message):
+        if self._is_current(task_id):
+            file_path = self._current_task.file_path
+            self._current_task = None
+            self.load_failed.emit(file_path, message)
@@ -5,23 +5,314 @@
 支持PDF、Markdown、TXT格式的文档阅读
 """
 
+import bisect
+import codecs
+import json
 import os
-import PyPDF2
-import markdown
+import threading
+from collections import OrderedDict
+
 from PyQt5.QtCore import QObject
 
+from markdown_engine import MarkdownEngine, split_sections
+from debug_log import get_logger
+
+log = get_logger('document')
+
+# 阅读器版本，提取或渲染结果的格式变化时递增，使旧的缓存失效
+READER_VERSION = 2
+
+# 文本文件分块读取的大小
+READ_CHUNK_SIZE = 1024 * 1024
+
+# 编码检测：文件开头的样本大小，以及大文件中额外抽样的窗口数和窗口大小
+ENCODING_SAMPLE_SIZE = 64 * 1024
+ENCODING_SAMPLE_WINDOWS = 3
+ENCODING_WINDOW_SIZE = 16 * 1024
+
+# 字节顺序标记与对应的编码，UTF-32的标记以UTF-16的标记开头，需要先检查
+TEXT_BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# 无BOM时的候选编码（gb2312是gbk的子集，不必单独尝试）
+CANDIDATE_ENCODINGS = ['utf-8', 'gbk']
+
+# 候选编码的解码错误占非ASCII字节的比例低于此值时仍采用该编码，否则退回latin-1
+ENCODING_ERROR_RATIO = 0.01
+
+
+class LoadCancelled(Exception):
+    """文档加载被取消"""
+
+
+def check_cancelled(cancel_check):
+    """如果加载已被取消则抛出LoadCancelled"""
+    if cancel_check and cancel_check():
+        raise LoadCancelled()
+
+
+def open_pdf_reader(file):
+    """
+    解析已打开的PDF文件
+    
+    PyPDF2在第一次打开PDF时才导入，只阅读文本和Markdown时启动不必加载它。
+    """
+    import PyPDF2
+    return PyPDF2.PdfReader(file)
+
+
+def normalize_newlines(text):
+    """统一换行符（与文本模式打开文件的行为一致）"""
+    if '\r' not in text:
+        return text
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def format_pdf_page(page_num, text):
+    """
+    格式化单页PDF文本
+
+    Args:
+        page_num (int): 页码（从0开始）
+        text (str): 页面提取出的文本
+
+    Returns:
+        str: 带页码分隔符的文本，空白页返回空字符串
+    """
+    if not text or not text.strip():
+        return ''
+    return f"--- 第 {page_num + 1} 页 ---\n{text}\n\n"
+
+
+def pdf_page_table(pages):
+    """
+    把PDF各页文本序列化为缓存内容，同时生成可以逐页读取的页面表
+
+    Args:
+        pages (list): 各页文本
+
+    Returns:
+        tuple: (各页文本的JSON数组, 页面表的JSON)。页面表每项为
+            [该页的JSON字符串在数组中的字节偏移, 字节长度, 格式化后的UTF-16长度, 格式化后的换行数]
+    """
+    parts = [json.dumps(text, ensure_ascii=False) for text in pages]
+    table = []
+    offset = 1  # 跳过开头的 [
+    for page_num, (text, part) in enumerate(zip(pages, parts)):
+        length = len(part.encode('utf-8'))
+        formatted = format_pdf_page(page_num, text)
+        table.append([offset, length, len(formatted.encode('utf-16-le')) // 2, formatted.count('\n')])
+        offset += length + 2  # 分隔符 ", "
+    return '[' + ', '.join(parts) + ']', json.dumps(table)
+
+
+def _trim_sample(data, at_start=False, at_end=False):
+    """
+    把样本截取到完整的行，避免样本边界切断多字节字符
+
+    换行符不会出现在UTF-8和GBK多字节字符的中间，按行截取后样本总能完整解码。
+    样本中没有换行符时原样返回，边界上的个别解码错误由错误比例容忍。
+    """
+    if not at_end:
+        end = data.rfind(b'\n')
+        if end != -1:
+            data = data[:end + 1]
+    if not at_start:
+        start = data.find(b'\n')
+        if start != -1:
+            data = data[start + 1:]
+    return data
+
+
+class LazyPdfDocument:
+    """按需提取页面的PDF文档
+
+    页面文本在首次访问时才取得，已取得的页面保存在一个有上限的LRU窗口中，
+    任何情况下内存中都只有这个窗口内的页面。
+    文档的页面表已在缓存中时由页面表构造：不打开PDF文件，页面由 page_reader 逐页从缓存读取，
+    读取失败（缓存已被淘汰）时才打开PDF提取。否则打开PDF，只解析交叉引用表，逐页提取；
+    后台完整提取（写入缓存）时已完成的页面通过 add_pages() 加入同一个窗口，
+    只保留接下来将要显示的页面，全部写入缓存后设置 page_reader，之后的页面从缓存读取。
+
+    页面索引记录每页在显示文本中的起始位置（UTF-16码元，与QTextDocument一致）和文本块序号，
+    跳转到某页、由可视区域的文本块求当前页码都不需要扫描文本。由页面表构造时
+    一次建立全部页面的索引，否则随页面的提取逐页建立。
+    可以在后台线程中提取页面，对底层文件的访问由锁串行化。
+    """
+
+    def __init__(self, file_path, max_cached_pages=64, page_table=None, page_reader=None):
+        """
+        Args:
+            page_table (list): 缓存中的页面表（见 pdf_page_table()），提供时不解析PDF
+            page_reader (callable): 参数为页码，从缓存读取该页文本，读取失败时返回None
+        """
+        self.file_path = file_path
+        self.max_cached_pages = max_cached_pages
+        self.page_reader = page_reader
+        self._file = None
+        self._reader = None
+        if page_table is not None:
+            self.page_count = len(page_table)
+        else:
+            self._open_reader()
+            self.page_count = len(self._reader.pages)
+        self._closed = False
+        self.page_positions = []  # 第i页的起始位置
+        self.page_blocks = []     # 第i页的起始文本块序号
+        self._index_end = (0, 0)  # 已索引部分的末尾 (位置, 文本块序号)
+        if page_table is not None:
+            for entry in page_table:
+                self._index_length(entry[2], entry[3])
+        self._pages = OrderedDict()
+        self._lock = threading.RLock()
+        # 已经交给阅读区域显示的页数
+        self.loaded_pages = 0
+
+    def _open_reader(self):
+        self._file = open(self.file_path, 'rb')
+        try:
+            self._reader = open_pdf_reader(self._file)
+        except Exception:
+            self._file.close()
+            self._file = None
+            raise
+
+    @property
+    def finished(self):
+        """是否所有页面都已显示"""
+        return self.loaded_pages >= self.page_count
+
+    @property
+    def indexed_pages(self):
+        """已知起始位置的页数"""
+        return len(self.page_blocks)
+
+    def page_start(self, page_num):
+        """
+        页面的起始位置
+
+        Returns:
+            tuple: (位置, 文本块序号)，该页尚未建立索引时返回None
+        """
+        if page_num >= len(self.page_blocks):
+            return None
+        return self.page_positions[page_num], self.page_blocks[page_num]
+
+    def page_at_block(self, block):
+        """文本块所在的页码（从0开始）"""
+        return max(0, bisect.bisect_right(self.page_blocks, block) - 1)
+
+    def _index_length(self, length, newlines):
+        """把一页加入页面索引，参数为格式化后的UTF-16长度和换行数"""
+        position, block = self._index_end
+        self.page_positions.append(position)
+        self.page_blocks.append(block)
+        self._index_end = (position + length, block + newlines)
+
+    def page_text(self, page_num):
+        """获取单页文本，依次从LRU窗口、缓存和PDF中读取"""
+        with self._lock:
+            text = self._pages.get(page_num)
+            if text is not None:
+                self._pages.move_to_end(page_num)
+                return text
+
+            if self.page_reader is not None:
+                text = self.page_reader(page_num)
+            if text is None:
+                if self._reader is None:
+                    # 由页面表打开，但缓存已不可用
+                    self._open_reader()
+                text = self._reader.pages[page_num].extract_text() or ''
+            self._cache_page(page_num, text)
+            return text
+
+    def _cache_page(self, page_num, text):
+        """把页面放入LRU窗口，超出上限时淘汰最久未用的页面"""
+        self._pages[page_num] = text
+        self._pages.move_to_end(page_num)
+        while len(self._pages) > self.max_cached_pages:
+            self._pages.popitem(last=False)
+
+    def add_pages(self, start, pages):
+        """
+        加入在其他地方提取好的连续页面，从start页开始
+
+        已经显示的页面和超出LRU窗口的后续页面不保留，窗口之外的页面显示时再读取
+        """
+        with self._lock:
+            if self._closed:
+                return
+            end = self.loaded_pages + self.max_cached_pages
+            for page_num, text in enumerate(pages, start):
+                if self.loaded_pages <= page_num < end and page_num not in self._pages:
+                    self._cache_page(page_num, text)
+
+    def next_pages(self, count, cancel_check=None):
+        """
+        提取接下来的若干页
+
+        Args:
+            count (int): 页数
+            cancel_check (callable): 返回True时中止提取并抛出LoadCancelled，
+                已提取的页面不计入loaded_pages
+
+        Returns:
+            str: 格式化后的文本
+        """
+        with self._lock:
+            if self._closed:
+                # 文档已关闭（切换到了其他文档）
+                raise LoadCancelled()
+            end = min(self.loaded_pages + count, self.page_count)
+            content = []
+            for page_num in range(self.loaded_pages, end):
+                check_cancelled(cancel_check)
+                content.append(format_pdf_page(page_num, self.page_text(page_num)))
+            for page_num, text in enumerate(content, self.loaded_pages):
+                if page_num >= len(self.page_blocks):
+                    self._index_length(len(text.encode('utf-16-le')) // 2, text.count('\n'))
+            self.loaded_pages = end
+            return ''.join(content)
+
+    def close(self):
+        """关闭底层文件"""
+        with self._lock:
+            self._closed = True
+            self._pages.clear()
+            self.page_reader = None
+            if self._file:
+                self._file.close()
+                self._file = None
+                self._reader = None
+
+
 class DocumentReader(QObject):
     """文档阅读器类"""
     
-    def __init__(self):
+    def __init__(self, pdf_extractor=None):
+        """
+        Args:
+            pdf_extractor (ParallelPdfExtractor): 多进程提取PDF全部页面，为None时在当前线程中逐页提取
+        """
         super().__init__()
+        self.markdown_engine = MarkdownEngine()
+        self.pdf_extractor = pdf_extractor
         
-    def read_document(self, file_path):
+    def read_document(self, file_path, progress_callback=None, cancel_check=None, encoding=None):
         """
         读取文档内容
         
         Args:
             file_path (str): 文档路径
+            progress_callback (callable): 进度回调，参数为(已完成, 总量)
+            cancel_check (callable): 返回True时中止读取并抛出LoadCancelled
+            encoding (str): 已知的文本文件编码，为None时自动检测
             
         Returns:
             str: 文档内容，失败返回None
@@ -33,144 +324,202 @@ class DocumentReader(QObject):
         
         try:
             if file_ext == '.pdf':
-                return self._read_pdf(file_path)
+                return self._read_pdf(file_path, progress_callback, cancel_check)
             elif file_ext == '.md':
                 return self._read_markdown(file_path)
             elif file_ext == '.txt':
-                return self._read_text(file_path)
+                return self._read_text(file_path, progress_callback, cancel_check, encoding)
             else:
                 return None
+        except LoadCancelled:
+            raise
+        except Exception as e:
+            log.warning(f"读取文档时出错: {e}")
+            return None
+
+    def open_pdf(self, file_path, page_table=None, page_reader=None):
+        """
+        以按需加载模式打开PDF
+
+        Args:
+            file_path (str): PDF路径
+            page_table (list): 缓存中的页面表，提供时不再解析PDF
+            page_reader (callable): 参数为页码，从缓存读取该页文本
+
+        Returns:
+            LazyPdfDocument: 按需加载的PDF文档，失败返回None
+        """
+        try:
+            return LazyPdfDocument(file_path, page_table=page_table, page_reader=page_reader)
         except Exception as e:
-            print(f"读取文档时出错: {e}")
+            log.warning(f"打开PDF时出错: {e}")
             return None
             
-    def _read_pdf(self, file_path):
+    def extract_pdf_pages(self, file_path, progress_callback=None, cancel_check=None, pages_callback=None):
+        """
+        提取PDF所有页面的文本
+        
+        Args:
+            pages_callback (callable): 参数为(起始页码, 各页文本)，按页码顺序送出已提取的页面
+        
+        Returns:
+            list: 各页文本（未格式化）
+        """
+        if self.pdf_extractor is not None:
+            return self.pdf_extractor.extract(file_path, progress_callback, cancel_check, pages_callback)
+            
+        with open(file_path, 'rb') as file:
+            pdf_reader = open_pdf_reader(file)
+            pages = []
+            page_count = len(pdf_reader.pages)
+            
+            for page_num in range(page_count):
+                check_cancelled(cancel_check)
+                pages.append(pdf_reader.pages[page_num].extract_text() or '')
+                if pages_callback:
+                    pages_callback(page_num, pages[-1:])
+                if progress_callback:
+                    progress_callback(page_num + 1, page_count)
+                    
+            return pages
+            
+    def read_pdf_outline(self, file_path):
+        """
+        读取PDF自带的书签（大纲）
+        
+        Returns:
+            list: (层级, 标题, 页码) 列表，层级从1开始，页码从0开始，没有书签时为空列表
+        """
+        with open(file_path, 'rb') as file:
+            pdf_reader = open_pdf_reader(file)
+            entries = []
+            
+            def collect(items, level):
+                # 列表表示前一个书签的子书签
+                for item in items:
+                    if isinstance(item, list):
+                        collect(item, level + 1)
+                        continue
+                    try:
+                        page_num = pdf_reader.get_destination_page_number(item)
+                    except Exception:
+                        page_num = None
+                    if page_num is not None and page_num >= 0:
+                        entries.append((level, str(item.title).strip(), page_num))
+                        
+            collect(pdf_reader.outline, 1)
+            return entries
+            
+    def _read_pdf(self, file_path, progress_callback=None, cancel_check=None):
         """读取PDF文件"""
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                content = []
-                
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    text = page.extract_text()
-                    if text.strip():
-                        content.append(f"--- 第 {page_num + 1} 页 ---\n")
-                        content.append(text)
-                        content.append("\n\n")
-                
-                return ''.join(content)
+            pages = self.extract_pdf_pages(file_path, progress_callback, cancel_check)
+            return ''.join(format_pdf_page(page_num, text) for page_num, text in enumerate(pages))
                 
+        except LoadCancelled:
+            raise
         except Exception as e:
             raise Exception(f"PDF读取错误: {e}")
             
-    def _read_markdown(self, file_path):
-        """读取Markdown文件"""
+    def detect_encoding(self, file_path):
+        """
+        检测文本文件的编码
+
+        先检查字节顺序标记，没有时从文件开头和文件中部的几个窗口抽取样本，
+        选择解码错误最少的候选编码。整个检测只读取少量数据。
+
+        Returns:
+            str: 编码名称
+        """
+        with open(file_path, 'rb') as file:
+            head = file.read(ENCODING_SAMPLE_SIZE)
+            for bom, encoding in TEXT_BOMS:
+                if head.startswith(bom):
+                    return encoding
+
+            samples = [_trim_sample(head, at_start=True, at_end=len(head) < ENCODING_SAMPLE_SIZE)]
+            size = os.fstat(file.fileno()).st_size
+            if size > ENCODING_SAMPLE_SIZE * 4:
+                # 窗口均匀分布在文件后部，最后一个窗口位于文件末尾
+                for i in range(1, ENCODING_SAMPLE_WINDOWS + 1):
+                    offset = min(size * i // ENCODING_SAMPLE_WINDOWS, size - ENCODING_WINDOW_SIZE)
+                    file.seek(offset)
+                    samples.append(_trim_sample(file.read(ENCODING_WINDOW_SIZE),
+                                                at_end=offset + ENCODING_WINDOW_SIZE >= size))
+
+        high_bytes = sum(len(sample) - len(sample.translate(None, bytes(range(128))))
+                         for sample in samples)
+        if high_bytes == 0:
+            return 'utf-8'
+
+        best_encoding, best_errors = None, None
+        for encoding in CANDIDATE_ENCODINGS:
+            errors = sum(sample.decode(encoding, errors='replace').count('\ufffd')
+                         for sample in samples)
+            if errors == 0:
+                return encoding
+            if best_errors is None or errors < best_errors:
+                best_encoding, best_errors = encoding, errors
+        if best_errors <= high_bytes * ENCODING_ERROR_RATIO:
+            return best_encoding
+        return 'latin-1'
+        
+    def read_markdown_body(self, file_path, cancel_check=None):
+        """
+        读取Markdown文件并渲染正文，不含样式外壳
+
+        Args:
+            cancel_check (callable): 返回True时中止渲染并抛出LoadCancelled，在每节之间检查
+
+        Returns:
+            str: 正文HTML
+        """
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
                 md_content = file.read()
-                
-            # 转换为HTML并返回纯文本版本
-            html = markdown.markdown(md_content, extensions=['codehilite', 'fenced_code', 'tables'])
-            
-            # 添加基本的CSS样式
-            styled_html = f"""
-            <html>
-            <head>
-                <style>
-                    body {{ 
-                        font-family: 'Microsoft YaHei', Arial, sans-serif; 
-                        line-height: 1.6; 
-                        color: #333; 
-                        max-width: 100%; 
-                        margin: 0;
-                        padding: 20px;
-                        background-color: transparent;
-                    }}
-                    h1, h2, h3, h4, h5, h6 {{ 
-                        color: #2c3e50; 
-                        margin-top: 1.5em;
-                        margin-bottom: 0.5em;
-                    }}
-                    h1 {{ font-size: 1.8em; border-bottom: 2px solid #3498db; padding-bottom: 0.3em; }}
-                    h2 {{ font-size: 1.5em; border-bottom: 1px solid #bdc3c7; padding-bottom: 0.3em; }}
-                    h3 {{ font-size: 1.3em; color: #34495e; }}
-                    code {{ 
-                        background-color: #f8f9fa; 
-                        padding: 2px 4px; 
-                        border-radius: 3px; 
-                        font-family: 'Consolas', 'Monaco', monospace;
-                        color: #e74c3c;
-                    }}
-                    pre {{ 
-                        background-color: #f8f9fa; 
-                        padding: 15px; 
-                        border-radius: 5px; 
-                        overflow-x: auto;
-                        border-left: 4px solid #3498db;
-                    }}
-                    pre code {{ 
-                        background-color: transparent; 
-                        padding: 0;
-                        color: #2c3e50;
-                    }}
-                    blockquote {{ 
-                        border-left: 4px solid #bdc3c7; 
-                        margin: 1.5em 0; 
-                        padding-left: 1em; 
-                        color: #7f8c8d;
-                        font-style: italic;
-                    }}
-                    ul, ol {{ margin: 1em 0; padding-left: 2em; }}
-                    li {{ margin: 0.5em 0; }}
-                    table {{ 
-                        border-collapse: collapse; 
-                        width: 100%; 
-                        margin: 1em 0;
-                    }}
-                    th, td {{ 
-                        border: 1px solid #bdc3c7; 
-                        padding: 8px 12px; 
-                        text-align: left;
-                    }}
-                    th {{ 
-                        background-color: #ecf0f1; 
-                        font-weight: bold;
-                    }}
-                    a {{ color: #3498db; text-decoration: none; }}
-                    a:hover {{ text-decoration: underline; }}
-                    strong {{ color: #2c3e50; }}
-                    em {{ color: #7f8c8d; }}
-                </style>
-            </head>
-            <body>
-                {html}
-            </body>
-            </html>
-            """
-            
-            return styled_html
-            
+            engine = self.markdown_engine
+            if cancel_check is None or not engine.sectioned(md_content):
+                return engine.render_body(md_content)
+            parts = []
+            for index, section in enumerate(split_sections(md_content)):
+                check_cancelled(cancel_check)
+                parts.append(engine.render_sections([section], index))
+            return ''.join(parts)
+        except LoadCancelled:
+            raise
         except Exception as e:
             raise Exception(f"Markdown读取错误: {e}")
             
-    def _read_text(self, file_path):
-        """读取文本文件"""
+    def _read_markdown(self, file_path):
+        """读取Markdown文件，返回使用默认样式的完整HTML"""
+        return self.markdown_engine.render_page(self.read_markdown_body(file_path))
+            
+    def _read_text(self, file_path, progress_callback=None, cancel_check=None, encoding=None):
+        """读取文本文件，一次流式解码，无法解码的字节替换为占位符"""
         try:
-            # 尝试不同的编码
-            encodings = ['utf-8', 'gbk', 'gb2312', 'latin-1']
+            if encoding is None:
+                encoding = self.detect_encoding(file_path)
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
             
-            for encoding in encodings:
-                try:
-                    with open(file_path, 'r', encoding=encoding) as file:
-                        return file.read()
-                except UnicodeDecodeError:
-                    continue
-                    
-            # 如果所有编码都失败，使用错误处理
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-                return file.read()
+            # 分块读取并解码，便于报告进度和中途取消
+            total = os.path.getsize(file_path)
+            parts = []
+            done = 0
+            with open(file_path, 'rb') as file:
+                while True:
+                    check_cancelled(cancel_check)
+                    chunk = file.read(READ_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    parts.append(decoder.decode(chunk))
+                    done += len(chunk)
+                    if progress_callback:
+                        progress_callback(done, total)
+            parts.append(decoder.decode(b'', final=True))
+            return normalize_newlines(''.join(parts))
                 
+        except LoadCancelled:
+            raise
         except Exception as e:
             raise Exception(f"文本文件读取错误: {e}")
             
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档工作区模块
+切换文档时保留最近阅读的几个文档已经排好的 QTextDocument 及其阅读位置，
+换回时直接交给阅读区域，不必重新解析和插入内容。
+保留的文档按最近使用排序，数量或估计的内存占用超出上限时淘汰最久未用的。
+"""
+
+import sys
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtGui import QTextDocument
+
+from debug_log import get_logger
+
+log = get_logger('document')
+
+# 最多保留的文档数（不含正在显示的文档）
+WORKSPACE_DOCUMENTS = 6
+
+# 保留文档的估计内存总量上限（字节）
+WORKSPACE_MEMORY_LIMIT = 96 * 1024 * 1024
+
+# 估计内存占用：每个字符的UTF-16存储，以及每个文本块的块数据和排版结果
+_BYTES_PER_CHARACTER = 2
+_BYTES_PER_BLOCK = 256
+
+
+class WorkspaceDocument:
+    """保留在工作区中的文档"""
+
+    def __init__(self, file_path, file_stat, document, anchor, pdf=None, markdown_body=None,
+                 markdown_style=None, search_index=None):
+        """
+        Args:
+            file_stat (tuple): 文档显示时文件的(大小, 修改时间)，文件改变后不再使用
+            document (QTextDocument): 阅读区域中的文档
+            anchor (ReadingAnchor): 离开时的阅读位置
+            pdf (LazyPdfDocument): 按需加载的PDF，页面继续按需提取
+            markdown_body (str): Markdown正文，样式改变后据此重新套用样式
+            markdown_style (tuple): 显示时使用的 (字体, 文字颜色)
+            search_index (SearchIndex): 已建立的搜索索引
+        """
+        self.file_path = file_path
+        self.file_stat = file_stat
+        self.document = document
+        self.anchor = anchor
+        self.pdf = pdf
+        self.markdown_body = markdown_body
+        self.markdown_style = markdown_style
+        self.search_index = search_index
+        self.size = (document.characterCount() * _BYTES_PER_CHARACTER
+                     + document.blockCount() * _BYTES_PER_BLOCK
+                     + (sys.getsizeof(markdown_body) if markdown_body is not None else 0))
+
+
+class DocumentWorkspace(QObject):
+    """文档工作区
+
+    阅读区域显示的文档都由 new_document() 创建，归工作区所有，
+    阅读区域换用其他文档时不会删除它；淘汰时发出 document_evicted，
+    接收者释放其中的PDF等资源后，文档由工作区删除。
+    """
+
+    document_evicted = pyqtSignal(object)  # WorkspaceDocument
+
+    def __init__(self, parent=None, max_documents=WORKSPACE_DOCUMENTS, memory_limit=WORKSPACE_MEMORY_LIMIT):
+        super().__init__(parent)
+        self.max_documents = max_documents
+        self.memory_limit = memory_limit
+        self.size = 0
+        self._entries = OrderedDict()  # 文件路径 -> WorkspaceDocument，最近使用的在后
+
+    def new_document(self, font):
+        """创建供阅读区域使用的空文档"""
+        document = QTextDocument(self)
+        # 只读显示，不需要撤销记录（追加PDF页面时会不断累积）
+        document.setUndoRedoEnabled(False)
+        document.setDefaultFont(font)
+        return document
+
+    def owns(self, document):
+        """文档是否由工作区创建"""
+        return document.parent() is self
+
+    def retain(self, entry):
+        """保留文档，超出上限时淘汰最久未用的文档"""
+        self._evict(entry.file_path)
+        self._entries[entry.file_path] = entry
+        self.size += entry.size
+        while self._entries and (len(self._entries) > self.max_documents or self.size > self.memory_limit):
+            self._evict(next(iter(self._entries)))
+        log.debug(f"工作区保留 {len(self._entries)} 个文档，约 {self.size // 1024} KB")
+
+    def take(self, file_path, file_stat):
+        """
+        取出保留的文档，准备重新显示
+
+        Returns:
+            WorkspaceDocument: 没有保留或文件已改变时返回None
+        """
+        entry = self._entries.get(file_path)
+        if entry is None:
+            return None
+        if entry.file_stat != file_stat:
+            self._evict(file_path)
+            return None
+        del self._entries[file_path]
+        self.size -= entry.size
+        return entry
+
+    def release(self, document):
+        """删除不再显示也不保留的文档"""
+        if self.owns(document):
+            document.deleteLater()
+
+    def clear(self):
+        """淘汰所有保留的文档"""
+        for file_path in list(self._entries):
+            self._evict(file_path)
+
+    def _evict(self, file_path):
+        entry = self._entries.pop(file_path, None)
+        if entry is None:
+            return
+        self.size -= entry.size
+        self.document_evicted.emit(entry)
+        entry.document.deleteLater()
+        entry.document = None
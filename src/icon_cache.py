@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图标缓存模块
+logo.png 是1.6MB的大图，每次启动解码它只为显示16～32像素的托盘和窗口图标。
+第一次启动时把它缩放为几种常用尺寸的小PNG保存在配置目录中，之后的启动只读取小图标；
+图标按尺寸登记在QIcon中，系统实际用到某个尺寸时才读取对应的文件。
+"""
+
+import json
+import os
+
+from PyQt5.QtCore import QSize, Qt
+from PyQt5.QtGui import QIcon, QImage, QPixmap
+
+from persistence import atomic_write
+from debug_log import get_logger
+
+log = get_logger('init')
+
+# 应用图标的原图
+LOGO_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logo.png")
+
+# 预先缩放的尺寸：托盘、标题栏、任务栏和窗口切换时用到的大小
+ICON_SIZES = (16, 24, 32, 48, 64, 128, 256)
+
+# 图标缓存格式版本，缩放方式或文件命名改变时增加
+ICON_CACHE_VERSION = 1
+
+
+class IconCache:
+    """预缩放图标缓存
+
+    缓存目录中的 icons.json 记录原图的(大小, 修改时间)，原图改变后重新生成；
+    它最后写入，生成中途退出时下次启动会重新生成。
+    """
+
+    def __init__(self, cache_dir, source_path=LOGO_PATH, sizes=ICON_SIZES):
+        self.cache_dir = cache_dir
+        self.source_path = source_path
+        self.sizes = sizes
+        self.stamp_path = os.path.join(cache_dir, "icons.json")
+        self._icon = None
+
+    def icon(self):
+        """
+        应用图标
+
+        Returns:
+            QIcon: 原图不存在时返回None
+        """
+        if self._icon is None:
+            self._icon = self._load()
+        return self._icon
+
+    def pixmap(self, size):
+        """
+        指定大小的图标，只读取这个尺寸的缓存文件
+
+        Returns:
+            QPixmap: 原图不存在时返回None
+        """
+        icon = self.icon()
+        if icon is None:
+            return None
+        return icon.pixmap(size, size)
+
+    def icon_path(self, size):
+        """某个尺寸的缓存文件路径"""
+        name = os.path.splitext(os.path.basename(self.source_path))[0]
+        return os.path.join(self.cache_dir, f"{name}-{size}.png")
+
+    def _load(self):
+        source_stat = self._source_stat()
+        if source_stat is None:
+            return None
+        if not self._is_fresh(source_stat):
+            images = self._rebuild(source_stat)
+            if images is None:
+                return None
+            if not self._is_fresh(source_stat):
+                # 无法写入缓存目录，直接使用内存中缩放好的图标
+                icon = QIcon()
+                for image in images:
+                    icon.addPixmap(QPixmap.fromImage(image))
+                return icon
+
+        icon = QIcon()
+        for size in self.sizes:
+            icon.addFile(self.icon_path(size), QSize(size, size))
+        return icon
+
+    def _source_stat(self):
+        try:
+            st = os.stat(self.source_path)
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns, ICON_CACHE_VERSION, list(self.sizes)]
+
+    def _is_fresh(self, source_stat):
+        try:
+            with open(self.stamp_path, 'r', encoding='utf-8') as f:
+                if json.load(f) != source_stat:
+                    return False
+        except (OSError, ValueError):
+            return False
+        return all(os.path.exists(self.icon_path(size)) for size in self.sizes)
+
+    def _rebuild(self, source_stat):
+        """解码原图一次，缩放为各个尺寸并写入缓存，返回缩放后的图像"""
+        image = QImage(self.source_path)
+        if image.isNull():
+            log.warning(f"无法读取图标: {self.source_path}")
+            return None
+        images = [image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                  for size in self.sizes]
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if os.path.exists(self.stamp_path):
+                os.remove(self.stamp_path)
+            for size, scaled in zip(self.sizes, images):
+                if not scaled.save(self.icon_path(size), 'PNG'):
+                    raise OSError(f"无法写入 {self.icon_path(size)}")
+            atomic_write(self.stamp_path, json.dumps(source_stat))
+            log.info(f"已生成 {len(self.sizes)} 种尺寸的图标缓存")
+        except OSError as e:
+            log.warning(f"写入图标缓存时出错: {e}")
+        return images
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档库搜索对话框模块
+在所有已知文档中搜索，结果按匹配数排序，随后台索引的建立陆续加入
+"""
+
+import os
+
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtWidgets import (QDialog, QLabel, QLineEdit, QListWidget, QListWidgetItem,
+                             QVBoxLayout)
+
+from library_search import LIBRARY_HIT_LIMIT
+from search_panel import SEARCH_DELAY_MS
+
+# 结果项中保存分数的数据角色
+SCORE_ROLE = Qt.UserRole + 1
+
+
+class _ResultItem(QListWidgetItem):
+    """按分数从高到低、分数相同时按文件名排序的结果项"""
+
+    def __lt__(self, other):
+        score, other_score = self.data(SCORE_ROLE), other.data(SCORE_ROLE)
+        if score != other_score:
+            return score > other_score
+        return self.text() < other.text()
+
+
+class LibrarySearchDialog(QDialog):
+    """文档库搜索对话框"""
+
+    # 打开文档并在其中搜索：文件路径, 搜索词
+    document_requested = pyqtSignal(str, str)
+
+    def __init__(self, library_search, file_provider, parent=None):
+        """
+        Args:
+            library_search (LibrarySearch): 后台搜索引擎
+            file_provider (callable): 返回要搜索的文档路径列表
+        """
+        super().__init__(parent)
+        self.library_search = library_search
+        self.file_provider = file_provider
+        self._search_id = None
+        self._query = ""
+
+        self.setWindowTitle("搜索全部文档")
+        self.resize(520, 420)
+
+        layout = QVBoxLayout(self)
+
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("在全部文档中查找...")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(self._on_text_changed)
+        self.search_edit.returnPressed.connect(self.search)
+        layout.addWidget(self.search_edit)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        self.result_list = QListWidget()
+        self.result_list.setSortingEnabled(True)
+        self.result_list.itemActivated.connect(self._on_item_activated)
+        layout.addWidget(self.result_list)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(SEARCH_DELAY_MS)
+        self._timer.timeout.connect(self.search)
+
+        library_search.result_found.connect(self._on_result_found)
+        library_search.search_progress.connect(self._on_search_progress)
+        library_search.search_finished.connect(self._on_search_finished)
+
+    def showEvent(self, event):
+        """打开对话框时在后台更新缺少和过期的索引，之后的搜索更快"""
+        super().showEvent(event)
+        self.search_edit.setFocus()
+        self.search_edit.selectAll()
+        self.search()
+
+    def search(self):
+        """按搜索框中的文字搜索，为空时只更新索引"""
+        self._timer.stop()
+        self._query = self.search_edit.text().strip()
+        self.result_list.clear()
+        file_paths = self.file_provider()
+        self._search_id = self.library_search.search(self._query, file_paths)
+        self.status_label.setText(f"正在搜索 {len(file_paths)} 个文档..." if self._query
+                                  else f"正在更新 {len(file_paths)} 个文档的索引...")
+
+    def _on_text_changed(self, text):
+        self._timer.start()
+
+    def _on_result_found(self, search_id, file_path, score, hits):
+        if search_id != self._search_id:
+            return
+        count = f"{hits}+" if hits >= LIBRARY_HIT_LIMIT else str(hits)
+        item = _ResultItem(f"{os.path.basename(file_path)}    {count} 处")
+        item.setData(Qt.UserRole, file_path)
+        item.setData(SCORE_ROLE, score)
+        item.setToolTip(file_path)
+        self.result_list.addItem(item)
+
+    def _on_search_progress(self, search_id, done, total):
+        if search_id == self._search_id and self._query:
+            self.status_label.setText(f"已搜索 {done} / {total} 个文档，"
+                                      f"{self.result_list.count()} 个文档包含匹配")
+
+    def _on_search_finished(self, search_id):
+        if search_id != self._search_id:
+            return
+        if not self._query:
+            self.status_label.setText("索引已更新")
+        elif self.result_list.count():
+            self.status_label.setText(f"{self.result_list.count()} 个文档包含匹配")
+        else:
+            self.status_label.setText("无结果")
+
+    def _on_item_activated(self, item):
+        self.document_requested.emit(item.data(Qt.UserRole), self._query)
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档库搜索模块
+在阅读器记录的所有文档（文档列表、最近文档、有阅读进度的文档）中搜索
+
+每个文档的搜索索引与单文档搜索共用文档缓存，缺少或已过期（文件大小、修改时间改变）
+的索引由进程池在多个CPU核心上并行建立；已有索引的文档立即给出结果，
+其余文档的结果在索引建立后陆续送出。
+"""
+
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, wait
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from document_cache import DocumentCache
+from document_loader import VIRTUAL_TEXT_THRESHOLD
+from document_reader import DocumentReader, format_pdf_page, normalize_newlines
+from search_index import SearchIndex
+from debug_log import get_logger
+
+log = get_logger('document')
+
+# 建立索引的进程数，留一个核心给界面
+LIBRARY_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# 内存中保留的文档索引数，超出后按最近最少使用淘汰，需要时再从磁盘缓存读取
+LIBRARY_MEMORY_INDEXES = 32
+
+# 每个文档计数的最多匹配数
+LIBRARY_HIT_LIMIT = 1000
+
+# 文件名包含搜索词时额外加的分数，排在只有正文匹配的文档之前
+LIBRARY_NAME_BONUS = LIBRARY_HIT_LIMIT + 1
+
+# 等待子进程结果时检查取消的间隔（秒）
+_WAIT_INTERVAL = 0.2
+
+
+def _build_document_index(file_path, encoding):
+    """
+    在子进程中读取文档并建立索引
+
+    PDF和文本文件的索引与阅读区域中显示的全文一致，与单文档搜索共用；
+    Markdown文档直接索引源文件。
+
+    Returns:
+        tuple: (序列化的索引, PDF各页文本，其他格式为None)
+    """
+    reader = DocumentReader()
+    file_ext = os.path.splitext(file_path)[1].lower()
+    pages = None
+    if file_ext == '.pdf':
+        pages = reader.extract_pdf_pages(file_path)
+        text = ''.join(format_pdf_page(page_num, page) for page_num, page in enumerate(pages))
+    elif file_ext == '.md':
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            text = normalize_newlines(f.read())
+    else:
+        text = reader.read_document(file_path, encoding=encoding)
+    return SearchIndex.build(text or '').dumps(), pages
+
+
+def _index_kind(file_path):
+    """文档的索引在缓存中的内容类型"""
+    if file_path.lower().endswith('.md'):
+        # 单文档搜索索引的是渲染后的正文，与源文件的位置不同，分开保存
+        return 'library-index'
+    return 'search-index'
+
+
+class _LibrarySignals(QObject):
+    """后台搜索任务的信号"""
+    result = pyqtSignal(int, str, int, int)  # 搜索ID, 文件路径, 分数, 匹配数
+    progress = pyqtSignal(int, int, int)     # 搜索ID, 已完成文档数, 文档总数
+    finished = pyqtSignal(int)               # 搜索ID
+
+
+class _LibrarySearchTask(QRunnable):
+    """在文档库中搜索，已有索引的文档先出结果，其余文档等待子进程建立索引"""
+
+    def __init__(self, search_id, query, file_paths, library, signals, cancel_event):
+        """
+        Args:
+            query (str): 搜索词，为空时只建立缺少的索引
+        """
+        super().__init__()
+        self.search_id = search_id
+        self.query = query
+        self.file_paths = file_paths
+        self.library = library
+        self.signals = signals
+        self.cancel_event = cancel_event
+        self._done = 0
+
+    def run(self):
+        try:
+            self._search()
+        except Exception as e:
+            log.warning(f"搜索文档库时出错: {e}")
+        if not self.cancel_event.is_set():
+            self.signals.finished.emit(self.search_id)
+
+    def _search(self):
+        pending = {}
+        for file_path in self.file_paths:
+            if self.cancel_event.is_set():
+                return
+            index = self.library.cached_index(file_path)
+            if index is not None:
+                self._report(file_path, index)
+                continue
+            future = self.library.submit(file_path)
+            if future is None:
+                self._report(file_path, None)
+            else:
+                pending[future] = file_path
+
+        while pending:
+            done, _ = wait(pending, timeout=_WAIT_INTERVAL, return_when=FIRST_COMPLETED)
+            if self.cancel_event.is_set():
+                # 已提交的索引继续建立，由之后的搜索使用
+                return
+            for future in done:
+                file_path = pending.pop(future)
+                self._report(file_path, self.library.collect(file_path, future))
+
+    def _report(self, file_path, index):
+        self._done += 1
+        if index is not None and self.query:
+            hits = len(index.search(self.query, LIBRARY_HIT_LIMIT))
+            if hits:
+                score = hits
+                if self.query.casefold() in os.path.basename(file_path).casefold():
+                    score += LIBRARY_NAME_BONUS
+                self.signals.result.emit(self.search_id, file_path, score, hits)
+        self.signals.progress.emit(self.search_id, self._done, len(self.file_paths))
+
+
+class LibrarySearch(QObject):
+    """文档库搜索
+
+    搜索在后台线程中进行，结果通过 result_found 按文档陆续送出，由界面排序。
+    新的搜索开始时旧的搜索停止送出结果，但已提交给进程池的索引会继续建立，
+    下次搜索时直接使用。
+    """
+
+    result_found = pyqtSignal(int, str, int, int)  # 搜索ID, 文件路径, 分数, 匹配数
+    search_progress = pyqtSignal(int, int, int)    # 搜索ID, 已完成文档数, 文档总数
+    search_finished = pyqtSignal(int)              # 搜索ID
+
+    def __init__(self, document_cache, parent=None):
+        super().__init__(parent)
+        self.document_cache = document_cache
+        self._lock = threading.Lock()
+        self._indexes = OrderedDict()  # 文件路径 -> ((大小, 修改时间), SearchIndex)
+        self._futures = {}             # 文件路径 -> ((大小, 修改时间), Future)
+        self._failed = {}              # 文件路径 -> 建立索引失败时的(大小, 修改时间)，文件改变前不再重试
+        self._executor = None
+        self._closed = False
+
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+
+        self._signals = _LibrarySignals()
+        self._signals.result.connect(self.result_found)
+        self._signals.progress.connect(self.search_progress)
+        self._signals.finished.connect(self.search_finished)
+
+        self._search_id = 0
+        self._cancel_event = threading.Event()
+
+    def search(self, query, file_paths):
+        """
+        开始搜索，停止之前的搜索
+
+        Args:
+            query (str): 搜索词，为空时只在后台建立缺少和过期的索引
+            file_paths (list): 要搜索的文档
+
+        Returns:
+            int: 搜索ID，与信号中的ID对应
+        """
+        self._cancel_event.set()
+        self._cancel_event = threading.Event()
+        self._search_id += 1
+        self.thread_pool.start(_LibrarySearchTask(self._search_id, query, list(file_paths), self,
+                                                  self._signals, self._cancel_event))
+        return self._search_id
+
+    def shutdown(self):
+        """停止搜索并关闭进程池（程序退出时调用）"""
+        self._cancel_event.set()
+        with self._lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def cached_index(self, file_path):
+        """
+        内存或磁盘缓存中的索引
+
+        Returns:
+            SearchIndex: 没有或文件已改变时返回None
+        """
+        file_stat = DocumentCache.stat(file_path)
+        if file_stat is None:
+            return None
+        with self._lock:
+            entry = self._indexes.get(file_path)
+            if entry is not None and entry[0] == file_stat:
+                self._indexes.move_to_end(file_path)
+                return entry[1]
+
+        content = self.document_cache.get(file_path, _index_kind(file_path))
+        index = SearchIndex.loads(content) if content is not None else None
+        if index is not None:
+            self._remember(file_path, file_stat, index)
+        return index
+
+    def submit(self, file_path):
+        """
+        提交给进程池建立索引，同一文件正在建立时返回已有的任务
+
+        Returns:
+            Future: 文件不存在、格式不支持或进程池已关闭时返回None
+        """
+        file_stat = DocumentCache.stat(file_path)
+        if file_stat is None or not self._indexable(file_path, file_stat):
+            return None
+        with self._lock:
+            if self._closed or self._failed.get(file_path) == file_stat:
+                return None
+            entry = self._futures.get(file_path)
+            if entry is not None and entry[0] == file_stat:
+                return entry[1]
+
+        # 读取缓存不持有锁，退出时关闭进程池不必等待磁盘
+        encoding = self._text_encoding(file_path)
+        with self._lock:
+            # 读取期间可能已关闭，或已由其他搜索提交
+            if self._closed:
+                return None
+            entry = self._futures.get(file_path)
+            if entry is not None and entry[0] == file_stat:
+                return entry[1]
+            if self._executor is None:
+                # 进程池模块在第一次建立索引时才导入
+                from concurrent.futures import ProcessPoolExecutor
+                self._executor = ProcessPoolExecutor(
+                    LIBRARY_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+            try:
+                future = self._executor.submit(_build_document_index, file_path, encoding)
+            except (BrokenExecutor, RuntimeError) as e:
+                # 子进程异常退出后进程池不可再用，下次提交时重新创建
+                log.warning(f"提交索引任务时出错: {e}")
+                self._executor = None
+                return None
+            self._futures[file_path] = (file_stat, future)
+            return future
+
+    def collect(self, file_path, future):
+        """
+        取得子进程建立的索引并写入缓存
+
+        Returns:
+            SearchIndex: 建立失败时返回None
+        """
+        with self._lock:
+            entry = self._futures.get(file_path)
+            if entry is not None and entry[1] is future:
+                del self._futures[file_path]
+                file_stat = entry[0]
+            else:
+                file_stat = DocumentCache.stat(file_path)
+        try:
+            content, pages = future.result()
+        except Exception as e:
+            log.warning(f"建立文档索引时出错: {file_path}, {e}")
+            if file_stat is not None and not isinstance(e, BrokenExecutor):
+                with self._lock:
+                    self._failed[file_path] = file_stat
+            return None
+
+        index = SearchIndex.loads(content)
+        if index is None or file_stat is None:
+            return index
+        self.document_cache.put(file_path, _index_kind(file_path), content, file_stat)
+        if pages is not None:
+            # 顺便缓存PDF的页面文本，之后打开这个文档时不必再提取
+            self.document_cache.put_pdf_pages(file_path, pages, file_stat)
+        self._remember(file_path, file_stat, index)
+        return index
+
+    def _remember(self, file_path, file_stat, index):
+        with self._lock:
+            self._indexes[file_path] = (file_stat, index)
+            self._indexes.move_to_end(file_path)
+            while len(self._indexes) > LIBRARY_MEMORY_INDEXES:
+                self._indexes.popitem(last=False)
+
+    def _indexable(self, file_path, file_stat):
+        """超大文本以虚拟视图显示，不建立索引"""
+        file_ext = os.path.splitext(file_path)[1].lower()
+        if file_ext == '.txt':
+            return file_stat[0] < VIRTUAL_TEXT_THRESHOLD
+        return file_ext in ('.pdf', '.md')
+
+    def _text_encoding(self, file_path):
+        """缓存中记录的文本编码，没有时由子进程检测"""
+        if not file_path.lower().endswith('.txt'):
+            return None
+        return self.document_cache.get(file_path, 'encoding')
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Markdown自动重新加载模块
+监视正在阅读的Markdown文件，文件保存后只重新渲染改变的节并替换到阅读区域中
+"""
+
+import os
+
+from PyQt5.QtCore import QFileSystemWatcher, QObject, QPoint, QTimer, pyqtSignal
+from PyQt5.QtGui import QTextCursor, QTextDocument, QTextDocumentFragment, QTextFormat
+
+from markdown_engine import SECTION_ANCHOR_PREFIX, split_sections
+from debug_log import get_logger
+
+log = get_logger('document')
+
+# 文件改变后等待的毫秒数，编辑器保存时往往连续写入几次
+RELOAD_DELAY_MS = 300
+
+
+class MarkdownLiveReload(QObject):
+    """Markdown自动重新加载
+
+    阅读区域中每一节以 sec-N 锚点开头。文件改变后比较新旧两版的各节源文本，
+    去掉相同的开头和结尾部分，只把中间改变的节重新渲染并替换进文档，
+    可视区域顶部的内容保持在原来的位置。
+    """
+
+    reloaded = pyqtSignal(str)  # 新的正文HTML
+
+    def __init__(self, text_edit, markdown_engine, page_builder, parent=None):
+        """
+        Args:
+            text_edit (QTextEdit): 显示Markdown的阅读区域
+            markdown_engine (MarkdownEngine): 渲染引擎
+            page_builder (callable): 把正文HTML套上当前样式外壳，返回完整页面
+        """
+        super().__init__(parent)
+        self.text_edit = text_edit
+        self.markdown_engine = markdown_engine
+        self.page_builder = page_builder
+        self.file_path = None
+        self._sections = []
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_file_changed)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(RELOAD_DELAY_MS)
+        self._timer.timeout.connect(self.reload)
+
+    def watch(self, file_path):
+        """开始监视文件，阅读区域中应已显示该文件当前的内容"""
+        self.stop()
+        source = self._read_source(file_path)
+        if source is None:
+            return
+        self.file_path = file_path
+        self._sections = split_sections(source)
+        self._watcher.addPath(file_path)
+
+    def stop(self):
+        """停止监视"""
+        self._timer.stop()
+        if self._watcher.files():
+            self._watcher.removePaths(self._watcher.files())
+        self.file_path = None
+        self._sections = []
+
+    def _on_file_changed(self, path):
+        # 编辑器以替换文件的方式保存时，原路径会从监视列表中移除
+        if path not in self._watcher.files() and os.path.exists(path):
+            self._watcher.addPath(path)
+        self._timer.start()
+
+    def reload(self):
+        """重新读取文件，把改变的节替换到阅读区域中"""
+        if not self.file_path:
+            return
+        if self.file_path not in self._watcher.files() and os.path.exists(self.file_path):
+            self._watcher.addPath(self.file_path)
+        source = self._read_source(self.file_path)
+        if source is None:
+            return
+
+        try:
+            new_sections = split_sections(source)
+            old_sections = self._sections
+            if new_sections == old_sections:
+                return
+
+            # 未改变的节直接取自渲染缓存
+            body = self.markdown_engine.render_body(source)
+            if not (self.markdown_engine.sectioned(source)
+                    and self._patch(old_sections, new_sections)):
+                self._replace_all(body)
+            self._sections = new_sections
+            self.reloaded.emit(body)
+        except Exception as e:
+            log.warning(f"重新加载Markdown时出错: {e}")
+
+    def _patch(self, old_sections, new_sections):
+        """只替换改变的节，文档结构与旧版本对不上时返回False"""
+        document = self.text_edit.document()
+        anchors = self._section_positions(document)
+        if len(anchors) != len(old_sections) or not new_sections:
+            return False
+        if old_sections == new_sections:
+            return True
+
+        # 相同的开头和结尾部分不需要改动
+        first = 0
+        limit = min(len(old_sections), len(new_sections))
+        while first < limit and old_sections[first] == new_sections[first]:
+            first += 1
+        tail = 0
+        while (tail < limit - first
+               and old_sections[-1 - tail] == new_sections[-1 - tail]):
+            tail += 1
+        old_end = len(old_sections) - tail
+        new_end = len(new_sections) - tail
+
+        last = document.characterCount() - 1
+        fragment_doc = None
+        if new_end > first:
+            fragment_doc = QTextDocument()
+            fragment_doc.setDefaultFont(document.defaultFont())
+            fragment_doc.setHtml(self.page_builder(
+                self.markdown_engine.render_sections(new_sections[first:new_end], first)))
+            if fragment_doc.begin().textList() is not None:
+                # 列表开头的节插入后无法恢复列表结构
+                return False
+            block_format = fragment_doc.begin().blockFormat()
+
+        # 被替换范围：从第一处改变的节的开头，到其后第一个未改变的节之前的块末尾
+        insert_only = old_end == first
+        if insert_only:
+            # 只插入了新节，在前一节的末尾另起一块，插入第一节之前时在开头另起一块
+            start = end = anchors[first] - 1 if first < len(anchors) else last
+        elif fragment_doc is not None:
+            start = anchors[first]
+            end = anchors[old_end] - 1 if old_end < len(anchors) else last
+        elif old_end < len(anchors):
+            # 删除中间的节，后一节的第一块并入被删除范围的开头，沿用它自己的块格式
+            start, end = anchors[first], anchors[old_end]
+            block_format = document.findBlock(end).blockFormat()
+        else:
+            # 删除末尾的节，连同前面的段落分隔一起删除，保留前一块原来的格式
+            start, end = max(anchors[first] - 1, 0), last
+            block_format = document.findBlock(start).blockFormat()
+
+        top_position, top_y = self._top_of_viewport()
+        old_length = document.characterCount()
+
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        if insert_only and start < 0:
+            start = end = 0
+            cursor.insertBlock()
+            cursor.setPosition(0)
+        else:
+            cursor.setPosition(start)
+            cursor.setPosition(end, QTextCursor.KeepAnchor)
+            cursor.removeSelectedText()
+            if insert_only:
+                cursor.insertBlock()
+        block_start = cursor.position()
+        if fragment_doc is not None:
+            cursor.insertFragment(QTextDocumentFragment(fragment_doc))
+        # 合并后的块沿用了被删除部分的格式，需要恢复它自己的块格式
+        block_cursor = QTextCursor(document)
+        block_cursor.setPosition(block_start)
+        block_cursor.setBlockFormat(block_format)
+        text_list = block_cursor.block().textList()
+        if text_list is not None and not block_format.hasProperty(QTextFormat.ObjectIndex):
+            text_list.remove(block_cursor.block())
+        cursor.endEditBlock()
+
+        # 可视区域顶部在改动范围之后时，按长度变化平移
+        if top_position >= end:
+            top_position += document.characterCount() - old_length
+        elif top_position > start:
+            top_position = start
+        self._restore_top(top_position, top_y)
+        return True
+
+    def _replace_all(self, body):
+        """整篇替换，保持可视区域顶部的相对位置"""
+        scroll_bar = self.text_edit.verticalScrollBar()
+        fraction = scroll_bar.value() / scroll_bar.maximum() if scroll_bar.maximum() > 0 else 0
+        self.text_edit.setHtml(self.page_builder(body))
+        scroll_bar.setValue(round(fraction * scroll_bar.maximum()))
+
+    def _section_positions(self, document):
+        """按文档顺序列出各节锚点所在块的起始位置"""
+        positions = []
+        block = document.begin()
+        while block.isValid():
+            it = block.begin()
+            while not it.atEnd():
+                fragment = it.fragment()
+                if any(name.startswith(SECTION_ANCHOR_PREFIX)
+                       for name in fragment.charFormat().anchorNames()):
+                    positions.append(block.position())
+                    break
+                it += 1
+            block = block.next()
+        return positions
+
+    def _top_of_viewport(self):
+        cursor = self.text_edit.cursorForPosition(QPoint(0, 0))
+        return cursor.position(), self.text_edit.cursorRect(cursor).top()
+
+    def _restore_top(self, position, y):
+        cursor = QTextCursor(self.text_edit.document())
+        cursor.setPosition(min(position, self.text_edit.document().characterCount() - 1))
+        scroll_bar = self.text_edit.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.value() + self.text_edit.cursorRect(cursor).top() - y)
+
+    def _read_source(self, file_path):
+        try:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                return file.read()
+        except (OSError, UnicodeDecodeError) as e:
+            log.warning(f"读取Markdown文件时出错: {e}")
+            return None
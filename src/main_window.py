@@ -5,20 +5,68 @@
 """
 
 import os
+import re
 import sys
+from collections import OrderedDict
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QMenuBar, QMenu, QAction, QFileDialog, QTextBrowser,
                              QLabel, QStatusBar, QSplitter, QListWidget, 
                              QMessageBox, QFrame, QPushButton, QShortcut, QApplication,
-                             QDesktopWidget)  # 添加QDesktopWidget导入
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal
-from PyQt5.QtGui import QIcon, QFont, QPalette, QColor, QKeySequence, QWheelEvent, QCursor, QPixmap
+                             QDesktopWidget, QInputDialog)  # 添加QDesktopWidget导入
+from PyQt5.QtCore import Qt, QTimer, QEvent, QPoint, pyqtSignal
+from PyQt5.QtGui import QFont, QPalette, QColor, QKeySequence, QWheelEvent, QCursor, QTextCursor
 
 from document_reader import DocumentReader
+from pdf_extractor import ParallelPdfExtractor
+from document_loader import DocumentLoader
+from document_cache import DocumentCache
+from text_inserter import ChunkedTextInserter, INSERT_CHUNK_SIZE
+from progress_store import ReadingAnchor
+from virtual_text_view import VirtualTextView
+from search_index import utf16_len
+from search_panel import SearchPanel
+from library_search import LibrarySearch
+from outline_panel import OutlinePanel, OutlineEntry
+from live_reload import MarkdownLiveReload
+from icon_cache import IconCache
+from prefetcher import Prefetcher, PrefetchStore, PrefetchedDocument
+from document_workspace import DocumentWorkspace, WorkspaceDocument, WORKSPACE_DOCUMENTS
 from settings_manager import SettingsManager
 from tray_manager import TrayManager
-from settings_dialog import SettingsDialog
 from mode_manager import ModeManager
+from window_border import BorderHitTester, REGION_CURSORS
+from theme_engine import ThemeEngine, STATUS_BAR_STYLE, TITLE_BAR_STYLE, READING_PANEL_STYLE
+from debug_log import get_logger, trace_enabled
+
+init_log = get_logger('init')
+mouse_log = get_logger('mouse')
+cursor_log = get_logger('cursor')
+border_log = get_logger('border')
+document_log = get_logger('document')
+settings_log = get_logger('settings')
+
+# 热路径上的跟踪开关，导入时确定，关闭时鼠标事件中不做任何格式化
+TRACE_MOUSE = trace_enabled('mouse')
+TRACE_CURSOR = trace_enabled('cursor')
+TRACE_BORDER = trace_enabled('border')
+
+# PDF按需加载：滚动接近末尾时每次追加的页数
+PDF_PAGES_PER_FETCH = 5
+
+# 滚动时更新状态栏页码的最短间隔（毫秒），滚动事件本身只检查定时器是否在运行
+PAGE_STATUS_INTERVAL_MS = 100
+
+# 超过这个长度的文本分块插入阅读区域
+CHUNKED_INSERT_THRESHOLD = 512 * 1024
+
+# 比较搜索结果与原文时视为空格的字符
+WHITESPACE_RE = re.compile(r'\s')
+
+# 从子控件转给主窗口处理的鼠标事件
+FORWARDED_MOUSE_EVENTS = frozenset((QEvent.MouseMove, QEvent.MouseButtonPress, QEvent.MouseButtonRelease))
+
+# 表示用户正在操作、需要暂停空闲预取的事件（另外还有按住按键的鼠标移动）
+ACTIVITY_EVENTS = frozenset((QEvent.KeyPress, QEvent.MouseButtonPress, QEvent.Wheel))
 
 class MainWindow(QMainWindow):
     """主窗口类"""
@@ -28,13 +76,38 @@ class MainWindow(QMainWindow):
         
         # 初始化管理器
         self.settings_manager = SettingsManager()
-        self.document_reader = DocumentReader()
+        self.pdf_extractor = ParallelPdfExtractor()  # 多进程提取PDF全部页面
+        self.document_reader = DocumentReader(self.pdf_extractor)
+        self.document_cache = DocumentCache(os.path.join(self.settings_manager.config_dir, "cache"))
+        self.prefetch_store = PrefetchStore()  # 空闲时预取的最近文档
+        self.document_loader = DocumentLoader(self.document_reader, self.document_cache, self,
+                                              prefetched=self.prefetch_store)
+        self.prefetcher = Prefetcher(self.document_reader, self.document_cache, self.prefetch_store, self)
+        self.workspace = DocumentWorkspace(self)  # 最近阅读过的文档，换回时不必重新加载
+        self.workspace.document_evicted.connect(self.on_workspace_evicted)
+        self.library_search = LibrarySearch(self.document_cache, self)
+        self.library_dialog = None  # 文档库搜索对话框，第一次使用时创建
+        self.icon_cache = IconCache(os.path.join(self.settings_manager.config_dir, "icons"))
         self.tray_manager = TrayManager(self)
         self.mode_manager = ModeManager(self)
+        self.theme = ThemeEngine()  # 样式表缓存
         
         # 当前文档相关
         self.current_file = None
         self.recent_files = []
+        self.lazy_pdf = None  # 当前按需加载的PDF文档
+        self._pdf_fetch_pending = False  # 是否有正在后台提取的PDF页面
+        self._pending_anchor = None  # 等待PDF页面提取完成后恢复的阅读位置
+        self._pending_page = None  # 等待PDF页面提取完成后跳转的页码
+        self._content_started = False  # 正在加载的文档是否已开始显示
+        self._retain_current = False  # 新文档开始显示时，是否把当前文档保留在工作区中
+        self.mapped_text = None  # 当前以虚拟视图显示的内存映射文本文件
+        self._pending_line = None  # 等待行索引建立后恢复的阅读行号
+        self.markdown_body = None  # 当前Markdown文档的正文HTML，换字体或颜色时重新套用样式
+        self._pending_selection = None  # 等待内容显示后选中的搜索结果 (位置, 长度)
+        # 文件路径 -> ((大小, 修改时间), 目录条目)，目录面板显示时才建立，只保留最近的 WORKSPACE_DOCUMENTS 个
+        self._outlines = OrderedDict()
+        self.text_color = None
         
         # 窗口拖拽相关
         self.drag_position = None
@@ -46,9 +119,12 @@ class MainWindow(QMainWindow):
         
         # 窗口边框调整大小相关
         self._resize_border_width = 7  # 边框宽度，设置为7px以减少边框粗细
-        print(f"[初始化] resize_border_width设置为: {self._resize_border_width}")
+        init_log.debug(f"resize_border_width设置为: {self._resize_border_width}")
         self._last_border_width_set_reason = "初始化"
         self._border_width_history = [("初始化", self._resize_border_width)]
+        self.border_hit = BorderHitTester(self._resize_border_width)  # 边框命中测试，边界随窗口大小预先计算
+        self._cursor_region = None  # 当前光标对应的边框区域
+        self._forwarded_widgets = frozenset()  # 鼠标事件转给主窗口处理的子控件
         self.resizing = False
         self.resize_direction = None
         self.resize_start_pos = None  # 初始化调整开始位置
@@ -59,6 +135,33 @@ class MainWindow(QMainWindow):
         self.init_shortcuts()
         self.load_settings()
         
+        # 之后的设置改变只更新受影响的部分
+        self.settings_manager.settings_changed.connect(self.on_settings_changed)
+        self.settings_manager.settings_changed.connect(self.mode_manager.on_settings_changed)
+        
+        # 后台加载信号
+        self.document_loader.load_progress.connect(self.on_load_progress)
+        self.document_loader.partial_content.connect(self.on_partial_content)
+        self.document_loader.load_finished.connect(self.on_load_finished)
+        self.document_loader.load_failed.connect(self.on_load_failed)
+        self.document_loader.pdf_pages_ready.connect(self.on_pdf_pages_ready)
+        self.document_loader.line_index_progress.connect(self.on_line_index_progress)
+        self.document_loader.search_index_ready.connect(self.on_search_index_ready)
+        self.document_loader.search_index_failed.connect(self.on_search_index_failed)
+        self.document_loader.pdf_outline_ready.connect(self.on_pdf_outline_ready)
+        QApplication.instance().aboutToQuit.connect(self.prefetcher.stop)
+        QApplication.instance().aboutToQuit.connect(self.document_loader.shutdown)
+        QApplication.instance().aboutToQuit.connect(self.library_search.shutdown)
+        QApplication.instance().aboutToQuit.connect(self.pdf_extractor.shutdown)
+        QApplication.instance().aboutToQuit.connect(self.document_cache.flush)
+        QApplication.instance().aboutToQuit.connect(self.settings_manager.flush)
+        
+        # 窗口显示后在空闲时预取最近的文档，第一次打开它们时不必再解析；
+        # 滚动（滚轮、拖动滚动条、翻页键）和阅读区域的按键使预取暂停
+        self.reading_area.verticalScrollBar().valueChanged.connect(self.prefetcher.notify_activity)
+        self.virtual_view.verticalScrollBar().valueChanged.connect(self.prefetcher.notify_activity)
+        self.prefetcher.start(self.recent_files, skip=self.is_document_open)
+        
         # 老板键定时器
         self.boss_key_timer = QTimer()
         self.boss_key_timer.timeout.connect(self.show_window)
@@ -69,27 +172,26 @@ class MainWindow(QMainWindow):
         self.auto_save_timer.start(30000)  # 每30秒自动保存一次
         
         # 重要：确保鼠标跟踪在所有组件初始化完成后启用
-        print("[主程序启动] 开始配置鼠标跟踪和事件过滤器...")
+        init_log.debug("开始配置鼠标跟踪和事件过滤器")
         self.setup_mouse_tracking()
         
     @property
     def resize_border_width(self):
-        print(f"[属性获取] resize_border_width当前值: {self._resize_border_width}")
         return self._resize_border_width
     
     @resize_border_width.setter
     def resize_border_width(self, value):
-        import traceback
-        stack = traceback.format_stack()
-        reason = stack[-2].split('\n')[0] if stack else '未知'
         self._resize_border_width = value
-        self._border_width_history.append((reason, value))
-        print(f"[属性设置] resize_border_width设置为: {value}, 原因: {reason}")
-        # 打印最近的几次设置历史
-        if len(self._border_width_history) > 1:
-            print(f"[属性设置历史] 最近5次设置:")
+        self.border_hit.set_border_width(value)
+        if TRACE_BORDER:
+            # 只在跟踪时记录调用位置，获取调用栈的开销较大
+            import traceback
+            stack = traceback.format_stack()
+            reason = stack[-2].split('\n')[0] if stack else '未知'
+            self._border_width_history.append((reason, value))
+            border_log.debug(f"resize_border_width设置为: {value}, 原因: {reason}")
             for i, (r, v) in enumerate(self._border_width_history[-5:]):
-                print(f"  {i+1}. 值={v}, 原因={r}")
+                border_log.debug(f"  最近第{i+1}次设置: 值={v}, 原因={r}")
         
     def init_ui(self):
         """初始化用户界面"""
@@ -97,9 +199,9 @@ class MainWindow(QMainWindow):
         self.setGeometry(100, 100, 1000, 700)
         
         # 设置窗口图标
-        icon_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logo.png")
-        if os.path.exists(icon_path):
-            self.setWindowIcon(QIcon(icon_path))
+        icon = self.icon_cache.icon()
+        if icon is not None:
+            self.setWindowIcon(icon)
         
         # 设置窗口属性，实现背景透明
         self.setAttribute(Qt.WA_TranslucentBackground, True)
@@ -107,7 +209,7 @@ class MainWindow(QMainWindow):
         
         # 启用鼠标跟踪，确保能接收到鼠标移动事件 - 关键修复
         self.setMouseTracking(True)
-        print("[初始化] 主窗口鼠标跟踪已启用")
+        init_log.debug("主窗口鼠标跟踪已启用")
         
         # 创建中央部件
         central_widget = QWidget()
@@ -120,7 +222,7 @@ class MainWindow(QMainWindow):
         # 为中央部件启用鼠标跟踪和事件过滤器 - 关键修复
         central_widget.setMouseTracking(True)
         central_widget.installEventFilter(self)
-        print("[初始化] 中央部件鼠标跟踪和事件过滤器已配置")
+        init_log.debug("中央部件鼠标跟踪和事件过滤器已配置")
         self.setCentralWidget(central_widget)
         
         # 创建主布局
@@ -141,7 +243,7 @@ class MainWindow(QMainWindow):
         # 为分割器启用鼠标跟踪和事件过滤器 - 关键修复
         self.splitter.setMouseTracking(True)
         self.splitter.installEventFilter(self)
-        print("[初始化] 分割器鼠标跟踪和事件过滤器已配置")
+        init_log.debug("分割器鼠标跟踪和事件过滤器已配置")
         main_layout.addWidget(self.splitter)
         
         # 左侧文档列表
@@ -171,7 +273,7 @@ class MainWindow(QMainWindow):
         self.file_panel.setMouseTracking(True)
         # 为文件面板安装事件过滤器确保鼠标事件传播 - 关键修复
         self.file_panel.installEventFilter(self)
-        print("[初始化] 文件面板鼠标跟踪和事件过滤器已配置")
+        init_log.debug("文件面板鼠标跟踪和事件过滤器已配置")
         self.file_panel.setStyleSheet("""
             QFrame {
                 background-color: rgba(240, 240, 240, 200);
@@ -244,32 +346,30 @@ class MainWindow(QMainWindow):
         # 为文件列表启用鼠标跟踪和事件过滤器 - 关键修复
         self.file_list.setMouseTracking(True)
         self.file_list.installEventFilter(self)
-        print("[初始化] 文件列表鼠标跟踪和事件过滤器已配置")
+        init_log.debug("文件列表鼠标跟踪和事件过滤器已配置")
         layout.addWidget(self.file_list)
         
+        # 当前文档的目录，按F4显示
+        self.outline_panel = OutlinePanel()
+        self.outline_panel.entry_activated.connect(self.on_outline_activated)
+        self.outline_panel.hide()
+        layout.addWidget(self.outline_panel)
+        
         parent.addWidget(self.file_panel)
         
     def create_title_bar(self, layout):
         """创建自定义标题栏"""
         self.title_bar = QWidget()  # 保存为实例属性以便在极简模式中隐藏
         self.title_bar.setFixedHeight(25)  # 进一步优化：减小标题栏高度
-        self.title_bar.setStyleSheet("""
-            QWidget {
-                background-color: rgba(70, 130, 180, 255);  /* 完全不透明 */
-                border-radius: 1px 1px 0 0;  /* 进一步优化：减小圆角到1px */
-            }
-        """)
+        self.theme.apply(self.title_bar, TITLE_BAR_STYLE)
         
         title_layout = QHBoxLayout(self.title_bar)
         title_layout.setContentsMargins(5, 0, 5, 0)  # 进一步优化：减小边距
         
         # 应用图标
         self.title_icon = QLabel()
-        icon_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logo.png")
-        if os.path.exists(icon_path):
-            pixmap = QPixmap(icon_path)
-            # 调整图标大小以适应标题栏
-            pixmap = pixmap.scaled(16, 16, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        pixmap = self.icon_cache.pixmap(16)  # 标题栏大小的预缩放图标
+        if pixmap is not None:
             self.title_icon.setPixmap(pixmap)
         title_layout.addWidget(self.title_icon)
         
@@ -382,12 +482,7 @@ class MainWindow(QMainWindow):
     def create_reading_panel(self, parent):
         """创建阅读面板"""
         reading_panel = QFrame()
-        reading_panel.setStyleSheet("""
-            QFrame {
-                background-color: rgba(255, 255, 255, 0);
-                border: none;
-            }
-        """)
+        self.theme.apply(reading_panel, READING_PANEL_STYLE)
         layout = QVBoxLayout(reading_panel)
         layout.setContentsMargins(5, 5, 5, 5)  # 进一步优化：减小边距
         
@@ -405,44 +500,44 @@ class MainWindow(QMainWindow):
         """)
         layout.addWidget(self.doc_title)
         
+        # 全文搜索面板，按Ctrl+F显示
+        self.search_panel = SearchPanel(self.search_snippet, self.verify_search_results)
+        self.search_panel.result_activated.connect(self.show_search_result)
+        self.search_panel.closed.connect(self.reading_area_focus)
+        self.search_panel.hide()
+        layout.addWidget(self.search_panel)
+        
         # 阅读区域
         self.reading_area = QTextBrowser()
         # 禁用横向滚动条，启用自动换行
         self.reading_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.reading_area.setLineWrapMode(QTextBrowser.WidgetWidth)
         self.reading_area.setWordWrapMode(1)  # 1 = WordWrap
-        self.reading_area.setStyleSheet("""
-            QTextEdit {
-                background-color: rgba(255, 255, 255, 255);  /* 完全不透明 */
-                border: 1px solid rgba(200, 200, 200, 100);  /* 进一步优化：减小边框透明度 */
-                border-radius: 1px;  /* 进一步优化：减小圆角到1px */
-                padding: 10px;  # 进一步优化：减小内边距
-                font-family: 'Microsoft YaHei';
-                font-size: 12px;
-                color: #333333;
-            }
-            QScrollBar:vertical {
-                background-color: rgba(240, 240, 240, 150);  /* 进一步优化：调整透明度 */
-                width: 8px;  /* 进一步优化：减小滚动条宽度到8px */
-                border-radius: 4px;  /* 调整圆角以匹配新宽度 */
-            }
-            QScrollBar::handle:vertical {
-                background-color: rgba(180, 180, 180, 150);  /* 进一步优化：调整透明度 */
-                border-radius: 4px;  /* 调整圆角以匹配新宽度 */
-                min-height: 15px;  # 调整最小高度
-            }
-            QScrollBar:horizontal {
-                height: 0px;
-            }
-        """)
+        self.theme.apply_reading_area(self.reading_area, 'compact', 'Microsoft YaHei', 12)
         self.reading_area.setPlainText("请选择要阅读的文档...\n\n支持的格式：\n- PDF文件 (.pdf)\n- Markdown文件 (.md)\n- 文本文件 (.txt)")
         
+        # 阅读区域只读，关闭撤销记录，避免追加内容时保存撤销数据
+        self.reading_area.setUndoRedoEnabled(False)
+        
+        # 滚动接近末尾时按需追加PDF页面
+        self.reading_area.verticalScrollBar().valueChanged.connect(self.on_reading_scrolled)
+        
+        # 大文本分块插入
+        self.text_inserter = ChunkedTextInserter(self.reading_area, parent=self)
+        self.text_inserter.progress.connect(self.on_insert_progress)
+        self.text_inserter.finished.connect(self.on_insert_finished)
+        
+        # Markdown文件改变后自动重新加载
+        self.markdown_reload = MarkdownLiveReload(self.reading_area, self.document_reader.markdown_engine,
+                                                  self.markdown_page, self)
+        self.markdown_reload.reloaded.connect(self.on_markdown_reloaded)
+        
         # 为阅读区域安装事件过滤器支持Ctrl+滚轮缩放
         self.reading_area.installEventFilter(self)
         
         # 启用鼠标跟踪，确保边框拖拽功能正常 - 关键修复
         self.reading_area.setMouseTracking(True)
-        print("[初始化] 阅读区域鼠标跟踪已启用")
+        init_log.debug("阅读区域鼠标跟踪已启用")
         
         # 设置右键菜单策略
         self.reading_area.setContextMenuPolicy(Qt.CustomContextMenu)
@@ -454,10 +549,17 @@ class MainWindow(QMainWindow):
         
         # 为阅读区域安装事件过滤器，确保鼠标事件能传播到主窗口 - 关键修复
         self.reading_area.installEventFilter(self)
-        print("[初始化] 阅读区域事件过滤器已安装")
+        init_log.debug("阅读区域事件过滤器已安装")
         
         layout.addWidget(self.reading_area)
         
+        # 超大文本文件使用的虚拟视图，与阅读区域互相替换显示
+        self.virtual_view = VirtualTextView()
+        self.virtual_view.setMouseTracking(True)
+        self.virtual_view.viewport().setMouseTracking(True)
+        self.virtual_view.hide()
+        layout.addWidget(self.virtual_view)
+        
         parent.addWidget(reading_panel)
         
     def create_menu_bar(self):
@@ -508,6 +610,11 @@ class MainWindow(QMainWindow):
         open_action.triggered.connect(self.open_document)
         menu.addAction(open_action)
         
+        library_search_action = QAction("搜索全部文档(&S)", self)
+        library_search_action.setShortcut("Ctrl+Shift+F")
+        library_search_action.triggered.connect(self.open_library_search)
+        menu.addAction(library_search_action)
+        
         menu.addSeparator()
         
         recent_menu = menu.addMenu("最近文档(&R)")
@@ -540,11 +647,28 @@ class MainWindow(QMainWindow):
         toggle_file_list_action.triggered.connect(self.toggle_file_list)
         menu.addAction(toggle_file_list_action)
         
+        outline_action = QAction("目录(&C)", self)
+        outline_action.setCheckable(True)
+        outline_action.setShortcut("F4")
+        outline_action.triggered.connect(self.toggle_outline)
+        menu.addAction(outline_action)
+        self.outline_action = outline_action
+        
         minimal_mode_action = QAction("极简模式(&M)", self)
         minimal_mode_action.setShortcut("F3")
         minimal_mode_action.triggered.connect(self.toggle_minimal_mode)
         menu.addAction(minimal_mode_action)
         
+        search_action = QAction("全文搜索(&S)", self)
+        search_action.setShortcut(QKeySequence.Find)
+        search_action.triggered.connect(self.open_search)
+        menu.addAction(search_action)
+        
+        goto_page_action = QAction("跳转到页(&G)...", self)
+        goto_page_action.setShortcut("Ctrl+G")
+        goto_page_action.triggered.connect(self.open_goto_page)
+        menu.addAction(goto_page_action)
+        
         menu.addSeparator()
         
         fullscreen_action = QAction("全屏(&F)", self)
@@ -552,6 +676,15 @@ class MainWindow(QMainWindow):
         fullscreen_action.triggered.connect(self.toggle_fullscreen)
         menu.addAction(fullscreen_action)
         
+        menu.addSeparator()
+        
+        live_reload_action = QAction("自动重新加载(&R)", self)
+        live_reload_action.setCheckable(True)
+        live_reload_action.setChecked(True)
+        live_reload_action.triggered.connect(self.toggle_live_reload)
+        menu.addAction(live_reload_action)
+        self.live_reload_action = live_reload_action
+        
         return menu
         
     def create_settings_menu(self):
@@ -577,23 +710,22 @@ class MainWindow(QMainWindow):
     def create_status_bar(self):
         """创建状态栏"""
         self.status_bar = QStatusBar()
-        self.status_bar.setStyleSheet("""
-            QStatusBar {
-                background-color: rgba(240, 240, 240, 255);
-                border-top: 1px solid rgba(200, 200, 200, 100);  /* 进一步优化：减小边框透明度 */
-                border-radius: 0 0 1px 1px;  /* 进一步优化：减小圆角到1px */
-                padding: 1px;  # 进一步优化：减小内边距
-                height: 18px;  # 进一步优化：减小高度
-                color: #333333;
-                font-size: 10px;  # 进一步优化：减小字体大小
-            }
-        """)
+        self.theme.apply(self.status_bar, STATUS_BAR_STYLE)
         # 为状态栏启用鼠标跟踪和事件过滤器，确保下边框拖拽正常工作 - 关键修复
         self.status_bar.setMouseTracking(True)
         self.status_bar.installEventFilter(self)
-        print("[初始化] 状态栏鼠标跟踪和事件过滤器已配置")
+        init_log.debug("状态栏鼠标跟踪和事件过滤器已配置")
         self.setStatusBar(self.status_bar)
         
+        # PDF当前页码，滚动停顿后更新
+        self.page_label = QLabel()
+        self.page_label.hide()
+        self.status_bar.addPermanentWidget(self.page_label)
+        self.page_status_timer = QTimer(self)
+        self.page_status_timer.setSingleShot(True)
+        self.page_status_timer.setInterval(PAGE_STATUS_INTERVAL_MS)
+        self.page_status_timer.timeout.connect(self.update_page_status)
+        
         # 显示就绪状态
         self.status_bar.showMessage("就绪")
         
@@ -637,46 +769,639 @@ class MainWindow(QMainWindow):
         if file_path:
             self.load_document(file_path)
             
+    def is_document_open(self, file_path):
+        """文档是否正在显示或加载"""
+        return file_path in (self.current_file, self.document_loader.loading_file)
+        
+    def open_files(self, file_paths):
+        """
+        打开命令行传入或其他实例转发来的文档
+        
+        所有文档加入文档列表，最后一个在后台加载；没有文档时只显示窗口。
+        """
+        file_paths = [path for path in file_paths
+                      if path.lower().endswith(('.pdf', '.md', '.txt')) and os.path.isfile(path)]
+        for file_path in file_paths[:-1]:
+            self.add_to_file_list(file_path)
+        if file_paths and file_paths[-1] != self.current_file:
+            self.load_document(file_paths[-1])
+        self.tray_manager.show_main_window()
+        
     def load_document(self, file_path):
-        """加载文档"""
-        try:
-            # 先保存当前文档的阅读进度
-            if self.current_file:
-                self.save_reading_progress_on_change()
+        """加载文档，解析在后台线程中进行"""
+        self.prefetcher.notify_activity()
+        
+        # 先保存当前文档的阅读进度
+        if self.current_file:
+            self.save_reading_progress_on_change()
             
-            # 读取文档内容
-            content = self.document_reader.read_document(file_path)
+        # 在取消正在提取的PDF页面之前判断当前文档能否保留
+        self._retain_current = self.can_retain_document(file_path)
+        
+        # 最近阅读过的文档直接换回
+        if self.switch_to_retained(file_path):
+            return
+            
+        # 开始新的加载会取消正在进行的加载和页面提取
+        self._content_started = False
+        self._pdf_fetch_pending = False
+        self.document_loader.load(file_path)
+        self.status_bar.showMessage(f"正在加载: {os.path.basename(file_path)}")
+        
+    def on_load_progress(self, file_path, done, total):
+        """加载进度"""
+        if total > 0:
+            percent = done * 100 // total
+            self.status_bar.showMessage(f"正在加载: {os.path.basename(file_path)} {percent}%")
             
-            if content is not None:
-                self.current_file = file_path
+    def on_partial_content(self, file_path, text):
+        """收到部分内容（PDF的前几页），立即显示"""
+        if not self._content_started:
+            self.begin_document(file_path)
+        self.append_text(text)
+        
+    def on_load_finished(self, result):
+        """文档加载完成"""
+        try:
+            if not self._content_started:
+                self.begin_document(result.file_path)
                 
-                # 根据文件类型设置内容
-                file_ext = os.path.splitext(file_path)[1].lower()
-                if file_ext == '.md':
-                    # Markdown文件使用HTML显示
-                    self.reading_area.setHtml(content)
-                else:
-                    # 其他文件使用纯文本显示
-                    self.reading_area.setPlainText(content)
-                    
-                self.doc_title.setText(os.path.basename(file_path))
+            # 根据文件类型设置内容
+            if result.kind == 'pdf':
+                # PDF的前几页已经分段显示，其余页面滚动时再提取；索引使用后台缓存的全部页面
+                self.lazy_pdf = result.pdf
+                self.update_page_status()
+                self.document_loader.build_search_index(result.file_path)
+            elif result.kind == 'html':
+                # Markdown文件使用HTML显示
+                self.markdown_body = result.content
+                self.show_markdown()
+                self.document_loader.build_search_index(result.file_path,
+                                                        self.reading_area.document().toPlainText())
+                if self.live_reload_action.isChecked():
+                    self.markdown_reload.watch(result.file_path)
+            elif result.kind == 'mapped':
+                # 超大文本使用虚拟视图，只排版可视区域内的行，不建立搜索索引
+                self.show_mapped_text(result.text_file)
+                self.search_panel.set_index(None, "超大文本不支持全文搜索")
+                self.on_document_shown(result.file_path)
+                return
+            elif (len(result.content) > CHUNKED_INSERT_THRESHOLD
+                  or self.settings_manager.get_reading_position(result.file_path) > INSERT_CHUNK_SIZE):
+                # 大文本或阅读位置靠后的文本从阅读位置开始分块插入，
+                # 先显示并排版可视区域，之前的内容稍后补齐
+                position = self.settings_manager.get_reading_position(result.file_path)
+                self.text_inserter.start(result.content, position)
+                self.document_loader.build_search_index(result.file_path, result.content)
+                self.on_document_shown(result.file_path, restore_progress=False)
+                return
+            else:
+                # 其他文件使用纯文本显示
+                self.reading_area.setPlainText(result.content)
+                self.document_loader.build_search_index(result.file_path, result.content)
                 
-                # 添加到文档列表
-                self.add_to_file_list(file_path)
+            self.on_document_shown(result.file_path)
+            self.continue_pdf_loading()
+            
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"加载文档时出错: {str(e)}")
+            
+    def on_load_failed(self, file_path, message):
+        """文档加载失败"""
+        document_log.warning(f"加载文档失败: {file_path}, {message}")
+        self.status_bar.showMessage("就绪")
+        QMessageBox.warning(self, "错误", "无法读取文档内容")
+        
+    def begin_document(self, file_path):
+        """开始显示新文档，替换阅读区域的内容"""
+        self._content_started = True
+        # 加载期间又开始提取的PDF页面会被丢弃，此时不保留
+        self.detach_document(self._retain_current and not self._pdf_fetch_pending)
+        self._retain_current = False
+        self.search_panel.set_index(None, "正在建立索引...")
+        self.current_file = file_path
+        
+    def can_retain_document(self, next_file):
+        """切换到另一个文档时，当前文档是否完整显示、可以保留在工作区中"""
+        return (self.current_file is not None and self.current_file != next_file
+                and self.workspace.owns(self.reading_area.document())
+                and self.document_loader.loading_file != self.current_file
+                and not self.mapped_text and not self.text_inserter.active
+                and not self._pdf_fetch_pending)
                 
-                # 添加到最近文档
-                self.add_to_recent_files(file_path)
+    def markdown_style(self):
+        """Markdown正文当前套用的样式：(字体, 文字颜色)"""
+        return self.reading_area.font().family(), self.text_color
+        
+    def detach_document(self, retain, document=None):
+        """
+        从阅读区域取下当前文档
+        
+        Args:
+            retain (bool): 是否把当前文档保留在工作区中
+            document (QTextDocument): 接下来显示的文档，为None时换上新的空文档
+        """
+        current = self.reading_area.document()
+        if retain:
+            self.workspace.retain(WorkspaceDocument(
+                self.current_file, DocumentCache.stat(self.current_file), current,
+                self.current_reading_anchor(), self.lazy_pdf, self.markdown_body,
+                self.markdown_style(), self.search_panel.index))
+            # PDF随文档保留，换回后继续按需提取
+            self.lazy_pdf = None
+        self.close_lazy_pdf()
+        self.close_mapped_text()
+        self.text_inserter.stop()
+        self.markdown_reload.stop()
+        self.markdown_body = None
+        self._pending_selection = None
+        
+        if document is None:
+            document = self.workspace.new_document(self.reading_area.font())
+        # 阅读区域自带的初始文档在换下时由它自己删除，只有工作区的文档需要释放
+        release = not retain and self.workspace.owns(current)
+        self.reading_area.setDocument(document)
+        if release:
+            self.workspace.release(current)
+        # 后续在末尾追加内容时，阅读区域的光标留在文档开头
+        cursor = self.reading_area.textCursor()
+        cursor.setKeepPositionOnInsert(True)
+        self.reading_area.setTextCursor(cursor)
+        
+    def switch_to_retained(self, file_path):
+        """
+        换回保留在工作区中的文档，不需要重新解析和排入内容
+        
+        Returns:
+            bool: 文档不在工作区中或文件已改变时返回False，需要重新加载
+        """
+        entry = self.workspace.take(file_path, DocumentCache.stat(file_path))
+        if entry is None:
+            return False
+        # 取消正在进行的其他文档的加载
+        self.document_loader.cancel()
+        self._content_started = False
+        self.detach_document(self._retain_current, entry.document)
+        self._retain_current = False
+        self._pdf_fetch_pending = False
+        self.current_file = file_path
+        
+        # 保留期间阅读区域的字体或颜色可能已改变
+        font = self.reading_area.font()
+        if entry.document.defaultFont() != font:
+            entry.document.setDefaultFont(font)
+        self.lazy_pdf = entry.pdf
+        self.markdown_body = entry.markdown_body
+        if self.markdown_body is not None:
+            if entry.markdown_style != self.markdown_style():
+                self.show_markdown()
+            if self.live_reload_action.isChecked():
+                self.markdown_reload.watch(file_path)
                 
-                # 恢复阅读进度
-                self.restore_reading_progress()
+        if entry.search_index is not None:
+            self.search_panel.set_index(entry.search_index)
+        else:
+            # 离开时索引尚未就绪，重新读取（通常已在缓存中）
+            self.search_panel.set_index(None, "正在建立索引...")
+            self.document_loader.build_search_index(
+                file_path, None if self.lazy_pdf else entry.document.toPlainText())
                 
-                self.status_bar.showMessage(f"已加载: {os.path.basename(file_path)}")
+        self.on_document_shown(file_path, restore_progress=False)
+        self.scroll_to_anchor(entry.anchor)
+        if self.lazy_pdf:
+            self.update_page_status()
+            self.continue_pdf_loading()
+        return True
+        
+    def on_workspace_evicted(self, entry):
+        """工作区淘汰了一个文档：释放PDF，Markdown留下解析好的正文，再次打开时只需重新排版"""
+        if entry.pdf:
+            self.document_loader.release_pdf(entry.pdf)
+        if entry.markdown_body is not None:
+            self.prefetch_store.put(entry.file_path, PrefetchedDocument(
+                entry.file_stat, 'html', entry.markdown_body, sys.getsizeof(entry.markdown_body)))
+        
+    def on_document_shown(self, file_path, restore_progress=True):
+        """文档内容显示后的公共处理"""
+        self.doc_title.setText(os.path.basename(file_path))
+        
+        # 添加到文档列表
+        self.add_to_file_list(file_path)
+        
+        # 添加到最近文档
+        self.add_to_recent_files(file_path)
+        
+        # 恢复阅读进度
+        if restore_progress:
+            self.restore_reading_progress()
+            
+        self.refresh_outline()
+        
+        if not self.text_inserter.active:
+            self.status_bar.showMessage(f"已加载: {os.path.basename(file_path)}")
+        
+    def on_insert_progress(self, inserted, total):
+        """分块插入进度"""
+        if total > 0 and self.current_file:
+            percent = inserted * 100 // total
+            self.status_bar.showMessage(f"正在显示: {os.path.basename(self.current_file)} {percent}%")
+            
+    def on_insert_finished(self):
+        """分块插入完成"""
+        if self.current_file:
+            self.status_bar.showMessage(f"已加载: {os.path.basename(self.current_file)}")
+        if self._pending_selection is not None:
+            self.show_search_result(*self._pending_selection)
+        
+    def markdown_page(self, body):
+        """把Markdown正文套上当前字体和文字颜色的样式外壳"""
+        return self.document_reader.markdown_engine.render_page(
+            body, self.reading_area.font().family(), self.text_color)
+        
+    def show_markdown(self):
+        """按当前字体和文字颜色显示Markdown正文"""
+        self.reading_area.setHtml(self.markdown_page(self.markdown_body))
+        
+    def restyle_markdown(self):
+        """字体或颜色改变后重新套用样式，正文不需要重新解析"""
+        if self.markdown_body is None:
+            return
+        anchor = self.current_reading_anchor()
+        self.show_markdown()
+        self.scroll_to_anchor(anchor)
+        
+    def on_markdown_reloaded(self, body):
+        """Markdown文件在外部被修改，已重新加载"""
+        self.markdown_body = body
+        if self.current_file:
+            self.status_bar.showMessage(f"已重新加载: {os.path.basename(self.current_file)}")
+            self._outlines.pop(self.current_file, None)
+            self.refresh_outline()
+            self.document_loader.build_search_index(self.current_file,
+                                                    self.reading_area.document().toPlainText())
+            
+    def toggle_live_reload(self, checked):
+        """切换Markdown自动重新加载"""
+        if not checked:
+            self.markdown_reload.stop()
+        elif self.markdown_body is not None and self.current_file:
+            # 关闭期间文件可能已经改变，重新加载一次，加载完成后开始监视
+            self.load_document(self.current_file)
+            
+    def show_mapped_text(self, text_file):
+        """切换到虚拟视图显示内存映射的文本文件"""
+        self.mapped_text = text_file
+        self.virtual_view.setFont(self.reading_area.font())
+        self.virtual_view.setPalette(self.reading_area.palette())
+        self.virtual_view.set_text_file(text_file)
+        self.reading_area.hide()
+        self.virtual_view.show()
+        
+    def close_mapped_text(self):
+        """关闭虚拟视图中的文件，恢复普通阅读区域"""
+        self._pending_line = None
+        if self.mapped_text:
+            self.virtual_view.set_text_file(None)
+            self.mapped_text.close()
+            self.mapped_text = None
+            self.virtual_view.hide()
+            self.reading_area.show()
+            
+    def on_line_index_progress(self, text_file, done, total):
+        """行索引建立进度，随索引增长扩展滚动条范围"""
+        if text_file is not self.mapped_text:
+            return
+        self.virtual_view.update_line_count()
+        if self._pending_line is not None and (text_file.index_complete
+                                               or text_file.line_count > self._pending_line):
+            self.virtual_view.scroll_to_line(min(self._pending_line, text_file.line_count - 1))
+            self._pending_line = None
+        if text_file.index_complete:
+            self.status_bar.showMessage(f"已加载: {os.path.basename(text_file.file_path)}")
+        elif total > 0:
+            self.status_bar.showMessage(f"正在建立行索引: {done * 100 // total}%")
+            
+    def close_lazy_pdf(self):
+        """释放当前按需加载的PDF"""
+        if self.lazy_pdf:
+            self.document_loader.release_pdf(self.lazy_pdf)
+            self.lazy_pdf = None
+        self._pdf_fetch_pending = False
+        self._pending_anchor = None
+        self._pending_page = None
+        self.page_label.hide()
+        
+    def append_text(self, text):
+        """在阅读区域末尾追加文本，不影响当前滚动位置"""
+        cursor = QTextCursor(self.reading_area.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        
+    def request_pdf_pages(self):
+        """请求后台提取接下来的PDF页面"""
+        if self.lazy_pdf and not self.lazy_pdf.finished and not self._pdf_fetch_pending:
+            self._pdf_fetch_pending = True
+            self.document_loader.fetch_pdf_pages(self.lazy_pdf, PDF_PAGES_PER_FETCH)
+            
+    def on_pdf_pages_ready(self, pdf, text):
+        """后台提取的PDF页面就绪"""
+        if pdf is not self.lazy_pdf:
+            return
+        self._pdf_fetch_pending = False
+        if text:
+            self.append_text(text)
+        if pdf.finished:
+            self.status_bar.showMessage(f"已加载全部 {pdf.page_count} 页")
+        self.continue_pdf_loading()
+        self.page_status_timer.start()
+        
+    def continue_pdf_loading(self):
+        """根据待恢复的阅读位置和可视区域决定是否继续提取PDF页面"""
+        if not self.lazy_pdf:
+            return
+            
+        if self._pending_page is not None:
+            # 等待要跳转的页面
+            if self.lazy_pdf.finished or self.lazy_pdf.indexed_pages > self._pending_page:
+                self.goto_page(min(self._pending_page, self.lazy_pdf.page_count - 1))
+            else:
+                self.request_pdf_pages()
+            return
+            
+        if self._pending_selection is not None:
+            # 等待搜索结果所在的页面
+            start, length = self._pending_selection
+            if self.lazy_pdf.finished or self.reading_area.document().characterCount() > start + length:
+                self.show_search_result(start, length)
+            else:
+                self.request_pdf_pages()
+            return
+            
+        if self._pending_anchor is not None:
+            anchor = self._pending_anchor
+            if self.lazy_pdf.finished or self.anchor_loaded(anchor) and self.scroll_to_anchor(anchor):
+                self._pending_anchor = None
+                if self.lazy_pdf.finished:
+                    self.scroll_to_anchor(anchor)
             else:
-                QMessageBox.warning(self, "错误", "无法读取文档内容")
+                self.request_pdf_pages()
+                return
                 
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"加载文档时出错: {str(e)}")
+        # 页面内容不足以继续滚动时追加，保证滚动条可用
+        bar = self.reading_area.verticalScrollBar()
+        if bar.maximum() - bar.value() < bar.pageStep() * 2:
+            self.request_pdf_pages()
+            
+    def on_reading_scrolled(self, value):
+        """阅读区域滚动事件，接近末尾时追加PDF页面"""
+        if self.lazy_pdf:
+            if not self.page_status_timer.isActive():
+                self.page_status_timer.start()
+            if not self.lazy_pdf.finished:
+                bar = self.reading_area.verticalScrollBar()
+                if bar.maximum() - value < bar.pageStep() * 2:
+                    self.request_pdf_pages()
+                    
+    def update_page_status(self):
+        """在状态栏显示可视区域顶部所在的PDF页码"""
+        pdf = self.lazy_pdf
+        if not pdf or not pdf.page_count:
+            self.page_label.hide()
+            return
+        block = self.reading_area.cursorForPosition(QPoint(0, 1)).blockNumber()
+        text = f"第 {pdf.page_at_block(block) + 1} / {pdf.page_count} 页"
+        if self.page_label.text() != text:
+            self.page_label.setText(text)
+        self.page_label.show()
+        
+    def open_goto_page(self):
+        """询问页码并跳转"""
+        pdf = self.lazy_pdf
+        if not pdf or not pdf.page_count:
+            self.status_bar.showMessage("只有PDF文档可以按页码跳转")
+            return
+        block = self.reading_area.cursorForPosition(QPoint(0, 1)).blockNumber()
+        page, ok = QInputDialog.getInt(self, "跳转到页", f"页码 (1-{pdf.page_count}):",
+                                       pdf.page_at_block(block) + 1, 1, pdf.page_count)
+        if ok:
+            self.goto_page(page - 1)
+            
+    def goto_page(self, page_num):
+        """
+        把PDF第page_num页（从0开始）的开头滚动到可视区域顶部
+        
+        页面的起始位置由页面索引直接得到；尚未提取的页面先在后台提取，之后再跳转。
+        """
+        pdf = self.lazy_pdf
+        if not pdf:
+            return
+        self._pending_anchor = None
+        self._pending_selection = None
+        start = pdf.page_start(page_num)
+        if start is None:
+            self._pending_page = page_num
+            self.status_bar.showMessage(f"正在加载第 {page_num + 1} 页...")
+            self.request_pdf_pages()
+            return
+        self._pending_page = None
+        anchor = ReadingAnchor(start[0], start[1], 0, 0.0)
+        if not (self.anchor_loaded(anchor) and self.scroll_to_anchor(anchor)) and not pdf.finished:
+            # 之后的内容不足一屏，继续提取后再滚动到顶部
+            self._pending_anchor = anchor
+            self.continue_pdf_loading()
+        self.update_page_status()
+                
+    def open_search(self):
+        """显示全文搜索面板"""
+        if self.current_file:
+            self.search_panel.open_panel()
+            
+    def reading_area_focus(self):
+        """搜索面板关闭后焦点回到阅读区域"""
+        self._pending_selection = None
+        if self.mapped_text:
+            self.virtual_view.setFocus()
+        else:
+            self.reading_area.setFocus()
+            
+    def toggle_outline(self, checked):
+        """显示或隐藏目录面板，第一次显示某个文档的目录时才建立"""
+        if checked and not self.file_list_visible:
+            self.toggle_file_list()
+        if checked and self.file_panel.width() <= 50:
+            # 文档列表收缩时先展开，展开时会按菜单项的状态显示目录
+            self.toggle_file_list_collapse()
+            return
+        self.outline_panel.setVisible(checked)
+        self.refresh_outline()
+        
+    def refresh_outline(self):
+        """按当前文档更新目录面板，面板隐藏时不做任何事"""
+        if not self.outline_panel.isVisible():
+            return
+        file_path = self.current_file
+        if not file_path:
+            self.outline_panel.clear()
+            return
+        file_stat = DocumentCache.stat(file_path)
+        cached = self._outlines.get(file_path)
+        if cached is not None and cached[0] == file_stat:
+            self._outlines.move_to_end(file_path)
+            self.outline_panel.set_entries(cached[1])
+        elif self.lazy_pdf:
+            self.outline_panel.clear("正在读取目录...")
+            self.document_loader.load_pdf_outline(file_path)
+        elif self.markdown_body is not None:
+            entries = self.markdown_outline()
+            self.remember_outline(file_path, file_stat, entries)
+            self.outline_panel.set_entries(entries)
+        else:
+            self.outline_panel.clear("此文档没有目录")
+            
+    def markdown_outline(self):
+        """
+        Markdown文档的目录
+        
+        HTML中的标题在导入阅读区域时保留了层级，遍历一次文本块即可得到各标题所在的块，
+        跳转时直接定位到块，不需要搜索文本。文本块序号在排版后才有，所以不在解析Markdown时收集标题。
+        """
+        entries = []
+        block = self.reading_area.document().begin()
+        while block.isValid():
+            level = block.blockFormat().headingLevel()
+            if level > 0:
+                title = block.text().strip()
+                if title:
+                    entries.append(OutlineEntry(level, title, 'block', block.blockNumber()))
+            block = block.next()
+        return entries
+        
+    def on_pdf_outline_ready(self, file_path, entries):
+        """后台读取的PDF书签就绪"""
+        outline = [OutlineEntry(level, title, 'page', page_num) for level, title, page_num in entries]
+        self.remember_outline(file_path, DocumentCache.stat(file_path), outline)
+        if file_path == self.current_file:
+            self.outline_panel.set_entries(outline, "此PDF没有书签")
+            
+    def remember_outline(self, file_path, file_stat, entries):
+        """缓存文档的目录，超过 WORKSPACE_DOCUMENTS 个时丢弃最久未用的"""
+        self._outlines[file_path] = (file_stat, entries)
+        self._outlines.move_to_end(file_path)
+        while len(self._outlines) > WORKSPACE_DOCUMENTS:
+            self._outlines.popitem(last=False)
+            
+    def on_outline_activated(self, kind, target):
+        """点击目录条目，跳转到对应的页面或文本块"""
+        if kind == 'page':
+            self.goto_page(target)
+            return
+        block = self.reading_area.document().findBlockByNumber(target)
+        if block.isValid():
+            self.scroll_to_anchor(ReadingAnchor(block.position(), target, 0, 0.0))
+            
+    def open_library_search(self):
+        """显示文档库搜索对话框"""
+        if self.library_dialog is None:
+            from library_dialog import LibrarySearchDialog
+            self.library_dialog = LibrarySearchDialog(self.library_search, self.library_files, self)
+            self.library_dialog.document_requested.connect(self.open_library_result)
+        self.library_dialog.show()
+        self.library_dialog.raise_()
+        self.library_dialog.activateWindow()
+        
+    def library_files(self):
+        """文档库：文档列表、最近文档和有阅读进度的文档，去掉重复和已不存在的文件"""
+        file_paths = [self.file_list.item(i).data(Qt.UserRole) for i in range(self.file_list.count())]
+        file_paths += self.recent_files
+        file_paths += self.settings_manager.get_progress_files()
+        return [file_path for file_path in dict.fromkeys(file_paths)
+                if file_path and self.document_reader.is_supported_format(file_path)
+                and os.path.isfile(file_path)]
+                
+    def open_library_result(self, file_path, query):
+        """打开文档库搜索结果中的文档，并在其中搜索同一个词"""
+        if file_path != self.current_file:
+            self.load_document(file_path)
+        self.search_panel.search_edit.setText(query)
+        self.search_panel.open_panel()
+        if file_path == self.current_file:
+            self.search_panel.search()
+            
+    def on_search_index_ready(self, file_path, index):
+        """后台建立或从缓存读取的搜索索引就绪"""
+        if file_path == self.current_file and not self.mapped_text:
+            self.search_panel.set_index(index)
+            document_log.debug(f"搜索索引就绪: {file_path}, {index.term_count} 个词项")
+            
+    def on_search_index_failed(self, file_path, message):
+        """搜索索引建立失败"""
+        document_log.warning(f"建立搜索索引失败: {file_path}, {message}")
+        if file_path == self.current_file and not self.mapped_text:
+            self.search_panel.set_index(None, "无法建立搜索索引")
             
+    def document_text(self, position, length):
+        """
+        阅读区域中全文位置处的文本
+        
+        Returns:
+            str: 段落分隔符替换为换行符的文本，该位置尚未显示时返回None
+        """
+        start = self.text_inserter.document_position(position)
+        if start is None:
+            return None
+        document = self.reading_area.document()
+        end = min(start + length, document.characterCount() - 1)
+        if end <= start:
+            return None
+        cursor = QTextCursor(document)
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        return cursor.selectedText().replace('\u2029', '\n')
+        
+    def verify_search_results(self, positions, query):
+        """
+        按阅读区域中的原文过滤索引找到的位置
+        
+        索引忽略标点并按前缀匹配单词，已显示的位置与搜索词逐字比较（不区分大小写，
+        空白字符都视为空格），尚未显示的位置（PDF后面的页面）保留。
+        """
+        folded = WHITESPACE_RE.sub(' ', query).casefold()
+        length = utf16_len(query)
+        results = []
+        for position in positions:
+            text = self.document_text(position, length)
+            if text is None or WHITESPACE_RE.sub(' ', text).casefold() == folded:
+                results.append(position)
+        return results
+        
+    def search_snippet(self, position, length, before, after):
+        """搜索结果的上下文，显示在结果列表中"""
+        start = max(0, position - before)
+        if self.text_inserter.document_position(start) is None:
+            start = position
+        text = self.document_text(start, position - start + length + after)
+        if text is None:
+            return None
+        return ' '.join(text.split())
+        
+    def show_search_result(self, position, length):
+        """选中搜索结果并滚动到可视区域，尚未显示的内容显示后再选中"""
+        start = self.text_inserter.document_position(position)
+        document = self.reading_area.document()
+        if start is None or start + length >= document.characterCount():
+            if self.text_inserter.active or (self.lazy_pdf and not self.lazy_pdf.finished):
+                self._pending_selection = (position, length)
+                self.status_bar.showMessage("正在加载搜索结果所在的内容...")
+                self.continue_pdf_loading()
+            return
+        self._pending_selection = None
+        cursor = QTextCursor(document)
+        cursor.setPosition(start)
+        cursor.setPosition(start + length, QTextCursor.KeepAnchor)
+        cursor.setKeepPositionOnInsert(True)
+        self.reading_area.setTextCursor(cursor)
+        self.reading_area.ensureCursorVisible()
+        
     def add_to_file_list(self, file_path):
         """添加到文件列表"""
         file_name = os.path.basename(file_path)
@@ -684,13 +1409,13 @@ class MainWindow(QMainWindow):
         # 检查是否已存在
         for i in range(self.file_list.count()):
             if self.file_list.item(i).data(Qt.UserRole) == file_path:
-                print(f"文档已存在于列表中: {file_name}")
+                document_log.debug(f"文档已存在于列表中: {file_name}")
                 return
                 
         # 添加新项目
         item = self.file_list.addItem(file_name)
         self.file_list.item(self.file_list.count() - 1).setData(Qt.UserRole, file_path)
-        print(f"添加文档到列表: {file_name}")
+        document_log.debug(f"添加文档到列表: {file_name}")
         
     def add_to_recent_files(self, file_path):
         """添加到最近文档"""
@@ -705,11 +1430,9 @@ class MainWindow(QMainWindow):
             
         self.update_recent_menu()
         
-        # 立即保存最近文档列表到设置中
-        current_settings = self.settings_manager.load_settings()
-        current_settings['recent_files'] = self.recent_files
-        self.settings_manager.save_settings(current_settings)
-        print(f"保存最近文档列表: {len(self.recent_files)} 个文档")
+        # 更新设置中的最近文档列表，稍后在后台写入磁盘
+        self.settings_manager.save_settings({'recent_files': self.recent_files})
+        document_log.debug(f"保存最近文档列表: {len(self.recent_files)} 个文档")
         
     def update_recent_menu(self):
         """更新最近文档菜单"""
@@ -787,6 +1510,8 @@ class MainWindow(QMainWindow):
     def open_preferences(self):
         """打开偏好设置"""
         try:
+            # 设置对话框很少打开，用到时才导入
+            from settings_dialog import SettingsDialog
             dialog = SettingsDialog(self, self.settings_manager.load_settings())
             dialog.settings_changed.connect(self.apply_new_settings)
             dialog.exec_()
@@ -794,118 +1519,51 @@ class MainWindow(QMainWindow):
             QMessageBox.critical(self, "错误", f"打开设置对话框时出错: {str(e)}")
             
     def apply_new_settings(self, settings):
-        """应用新设置"""
+        """保存偏好设置，界面只按改变了的设置项更新（见 on_settings_changed）"""
         try:
-            # 应用透明度
-            opacity = settings.get('opacity', 1.0)
-            if isinstance(opacity, str):
-                opacity = float(opacity)
-            self.setWindowOpacity(opacity)
-            
-            # 应用字体设置
-            font_family = settings.get('font_family', 'Microsoft YaHei')
-            font_size = settings.get('font_size', 12)
-            
-            # 处理字体大小的类型转换和验证
-            if isinstance(font_size, str):
+            settings = dict(settings)
+            font_size = settings.get('font_size')
+            if font_size is not None:
+                # 处理字体大小的类型转换和验证
                 try:
                     font_size = int(font_size)
                 except (ValueError, TypeError):
                     font_size = 12
-            
-            # 验证字体大小的有效性
-            if font_size <= 0 or font_size > 72:
-                font_size = 12
+                if font_size <= 0 or font_size > 72:
+                    font_size = 12
+                settings['font_size'] = font_size
                 
-            print(f"应用字体设置: {font_family}, 大小: {font_size}")
+            self.settings_manager.save_settings(settings)
+            self.status_bar.showMessage("设置已应用")
             
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"应用设置时出错: {str(e)}")
+            
+    def on_settings_changed(self, changed):
+        """设置改变后只更新受影响的部分，阅读区域的样式表由 ModeManager 更新"""
+        if 'opacity' in changed:
+            self.setWindowOpacity(max(0.1, min(1.0, changed['opacity'])))
+            
+        font_changed = 'font_family' in changed or 'font_size' in changed
+        if font_changed:
+            font_family = self.settings_manager.get('font_family')
+            font_size = self.settings_manager.get('font_size')
+            settings_log.debug(f"应用字体设置: {font_family}, 大小: {font_size}")
             font = QFont(font_family, font_size)
             self.reading_area.setFont(font)
+            self.virtual_view.setFont(font)
             self.current_font_size = font_size
             
-            # 在极简模式下也需要更新字体大小
-            if self.minimal_mode:
-                # 更新极简模式下的字体大小 - 使用0-100%范围
-                ui_opacity_percent = settings.get('minimal_ui_opacity', 20)
-                text_opacity_percent = settings.get('minimal_text_opacity', 80)
-                
-                # 确保透明度值在有效范围内
-                ui_opacity_percent = max(0, min(100, int(ui_opacity_percent) if ui_opacity_percent else 20))
-                text_opacity_percent = max(0, min(100, int(text_opacity_percent) if text_opacity_percent else 80))
-                
-                # 转换为255范围的alpha值
-                ui_alpha = int(ui_opacity_percent * 255 / 100)
-                text_alpha = int(text_opacity_percent * 255 / 100)
-                
-                # 重新应用极简模式样式（包含新的字体大小），并禁用横向滚动条
-                self.reading_area.setStyleSheet(f"""
-                    QTextEdit {{
-                        background-color: rgba(255, 255, 255, {text_alpha});
-                        border: none;
-                        border-radius: 8px;
-                        padding: 15px;
-                        font-family: '{font_family}';
-                        font-size: {font_size}px;
-                        color: rgba(51, 51, 51, {min(255, text_alpha + 55)};
-                    }}
-                    QScrollBar:vertical {{
-                        background-color: rgba(240, 240, 240, {ui_alpha});
-                        width: 8px;
-                        border-radius: 4px;
-                    }}
-                    QScrollBar::handle:vertical {{
-                        background-color: rgba(180, 180, 180, {min(255, ui_alpha + 50)};
-                        border-radius: 4px;
-                        min-height: 20px;
-                    }}
-                    QScrollBar:horizontal {{
-                        height: 0px;
-                    }}
-                """)
-            else:
-                # 正常模式下更新字体大小，并禁用横向滚动条
-                self.reading_area.setStyleSheet(f"""
-                    QTextEdit {{
-                        background-color: rgba(255, 255, 255, 220);
-                        border: 1px solid rgba(200, 200, 200, 100);
-                        border-radius: 8px;
-                        padding: 15px;
-                        font-family: '{font_family}';
-                        font-size: {font_size}px;
-                        color: #333333;
-                    }}
-                    QScrollBar:vertical {{
-                        background-color: rgba(240, 240, 240, 150);
-                        width: 12px;
-                        border-radius: 6px;
-                    }}
-                    QScrollBar::handle:vertical {{
-                        background-color: rgba(180, 180, 180, 200);
-                        border-radius: 6px;
-                        min-height: 20px;
-                    }}
-                    QScrollBar:horizontal {{
-                        height: 0px;
-                    }}
-                """)
-            
-            # 应用颜色设置
-            bg_color = settings.get('bg_color', '#ffffff')
-            text_color = settings.get('text_color', '#000000')
-            self.apply_colors(bg_color, text_color)
-            
-            # 应用置顶设置
-            stay_on_top = settings.get('stay_on_top', False)
-            self.stay_on_top_action.setChecked(stay_on_top)
-            self.toggle_stay_on_top(stay_on_top)
-            
-            # 保存设置
-            self.settings_manager.save_settings(settings)
-            
-            self.status_bar.showMessage("设置已应用")
+        if 'bg_color' in changed or 'text_color' in changed:
+            # 同时按新的字体和颜色重新套用Markdown样式
+            self.apply_colors(self.settings_manager.get('bg_color'), self.settings_manager.get('text_color'))
+        elif font_changed:
+            # Markdown样式外壳中写入了字体，需要重新套用
+            self.restyle_markdown()
             
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"应用设置时出错: {str(e)}")
+        if 'stay_on_top' in changed:
+            self.stay_on_top_action.setChecked(changed['stay_on_top'])
+            self.toggle_stay_on_top(changed['stay_on_top'])
         
     def show_about(self):
         """显示关于对话框"""
@@ -945,7 +1603,7 @@ class MainWindow(QMainWindow):
         if font_size <= 0 or font_size > 72:
             font_size = 16  # 安全默认值
             
-        print(f"设置字体: {font_family}, 大小: {font_size}")
+        settings_log.debug(f"设置字体: {font_family}, 大小: {font_size}")
         
         # 立即设置字体对象，使用setPointSize确保正确设置
         font = QFont(font_family)
@@ -955,36 +1613,16 @@ class MainWindow(QMainWindow):
         
         # 立即应用字体设置到样式中，确保在所有模式下都生效，并禁用横向滚动条
         # 总是先应用正常模式的样式，因为初始化时不在极简模式
-        self.reading_area.setStyleSheet(f"""
-            QTextEdit {{
-                background-color: rgba(255, 255, 255, 220);
-                border: 1px solid rgba(200, 200, 200, 100);
-                border-radius: 8px;
-                padding: 15px;
-                font-family: '{font_family}';
-                font-size: {font_size}px;
-                color: #333333;
-            }}
-            QScrollBar:vertical {{
-                background-color: rgba(240, 240, 240, 150);
-                width: 12px;
-                border-radius: 6px;
-            }}
-            QScrollBar::handle:vertical {{
-                background-color: rgba(180, 180, 180, 200);
-                border-radius: 6px;
-                min-height: 20px;
-            }}
-            QScrollBar:horizontal {{
-                height: 0px;
-            }}
-        """)
+        self.theme.apply_reading_area(self.reading_area, 'normal', font_family, font_size)
         
         # 应用颜色设置
         bg_color = settings.get('bg_color', '#ffffff')
         text_color = settings.get('text_color', '#000000')
         self.apply_colors(bg_color, text_color)
         
+        # Markdown自动重新加载
+        self.live_reload_action.setChecked(settings.get('live_reload', True))
+        
         # 加载最近文档
         self.recent_files = settings.get('recent_files', [])
         self.update_recent_menu()
@@ -998,6 +1636,9 @@ class MainWindow(QMainWindow):
         palette.setColor(QPalette.Base, QColor(bg_color))
         palette.setColor(QPalette.Text, QColor(text_color))
         self.reading_area.setPalette(palette)
+        self.virtual_view.setPalette(palette)
+        self.text_color = text_color
+        self.restyle_markdown()
         
     def save_settings(self):
         """保存设置"""
@@ -1019,25 +1660,72 @@ class MainWindow(QMainWindow):
             'font_family': current_font.family(),
             'font_size': current_font_size,
             'recent_files': self.recent_files,
+            'live_reload': self.live_reload_action.isChecked(),
             'window_geometry': [self.x(), self.y(), self.width(), self.height()]
         }
         
         if self.current_file:
             settings['current_file'] = self.current_file
             # 保存阅读进度
-            cursor = self.reading_area.textCursor()
-            settings['reading_position'] = cursor.position()
+            settings['reading_position'] = self.current_reading_position()
             
         self.settings_manager.save_settings(settings)
         
     def restore_reading_progress(self):
         """恢复阅读进度"""
         if self.current_file:
-            position = self.settings_manager.get_reading_position(self.current_file)
-            if position:
-                cursor = self.reading_area.textCursor()
-                cursor.setPosition(position)
-                self.reading_area.setTextCursor(cursor)
+            anchor = self.settings_manager.get_reading_progress(self.current_file)
+            if not anchor:
+                return
+            if self.mapped_text:
+                # 虚拟视图中的阅读进度是顶部行号，行索引尚未建立到这一行时稍后恢复
+                line = anchor.position
+                if line < self.mapped_text.line_count:
+                    self.virtual_view.scroll_to_line(line)
+                elif line:
+                    self._pending_line = line
+                return
+            # 按需加载的PDF需要先在后台提取到进度所在的页面，以及其后足够滚动到顶部的内容
+            if self.lazy_pdf and not self.lazy_pdf.finished:
+                if not (self.anchor_loaded(anchor) and self.scroll_to_anchor(anchor)):
+                    self._pending_anchor = anchor
+                return
+            self.scroll_to_anchor(anchor)
+
+    def anchor_loaded(self, anchor):
+        """锚点所在的内容是否已经显示在阅读区域中"""
+        document = self.reading_area.document()
+        if anchor.block >= 0:
+            return document.blockCount() > anchor.block
+        return document.characterCount() > anchor.position
+
+    def scroll_to_anchor(self, anchor):
+        """
+        把锚点所在的行滚动到可视区域顶部
+
+        文本块序号直接定位到块，不需要从文档开头数字符；块中的位置与保存时的字符位置不一致，
+        说明文档内容已经改变，此时按相对位置滚动。
+
+        Returns:
+            bool: 锚点是否到达了可视区域顶部，之后的内容不足一屏时为False
+        """
+        document = self.reading_area.document()
+        block = document.findBlockByNumber(anchor.block) if anchor.block >= 0 else None
+        if block is not None and block.isValid() and anchor.offset < block.length():
+            position = block.position() + anchor.offset
+            if position != anchor.position:
+                bar = self.reading_area.verticalScrollBar()
+                bar.setValue(round(anchor.fraction * bar.maximum()))
+                return True
+        else:
+            position = min(anchor.position, document.characterCount() - 1)
+
+        cursor = QTextCursor(document)
+        cursor.setPosition(position)
+        self.reading_area.setTextCursor(cursor)
+        bar = self.reading_area.verticalScrollBar()
+        bar.setValue(bar.value() + self.reading_area.cursorRect(cursor).top())
+        return self.reading_area.cursorRect(cursor).top() <= 0
                 
     def closeEvent(self, event):
         """关闭事件处理"""
@@ -1069,259 +1757,131 @@ class MainWindow(QMainWindow):
     def mousePressEvent(self, event):
         """鼠标按下事件，用于窗口拖拽和调整大小"""
         if event.button() == Qt.LeftButton:
-            # 检查是否在边框区域
-            pos = event.pos()
-            rect = self.rect()
-            
-            # 判断鼠标位置是否在边框
-            border_width = self.resize_border_width
-            
-            # 计算边框检测区域
-            left_boundary = border_width
-            right_boundary = rect.width() - border_width
-            bottom_boundary = rect.height() - border_width
-            top_boundary = border_width
-            
-            on_left = pos.x() <= left_boundary
-            on_right = pos.x() >= right_boundary
-            on_top = pos.y() <= top_boundary
-            on_bottom = pos.y() >= bottom_boundary
+            self.handle_mouse_press(event.pos(), event.globalPos())
+            event.accept()
             
-            # 添加调试信息
+    def handle_mouse_press(self, pos, global_pos):
+        """左键按下：上边框移动窗口，其他边框和角落调整大小，其余位置拖拽窗口"""
+        region = self.border_hit.hit(pos.x(), pos.y())
+        if TRACE_MOUSE:
             mode_str = "极简模式" if self.minimal_mode else "普通模式"
-            print(f"[{mode_str}鼠标按下] 位置=({pos.x()}, {pos.y()}), 窗口大小=({rect.width()}, {rect.height()})")
-            print(f"[边框检测] 左={on_left}, 右={on_right}, 上={on_top}, 下={on_bottom}")
-            print(f"[边框数值] 左边界<={left_boundary}, 右边界>={right_boundary}, 上边界<={top_boundary}, 下边界>={bottom_boundary}")
-            print(f"[详细坐标] 鼠标X={pos.x()}, 左边界={left_boundary}, 右边界={right_boundary}")
-            print(f"[窗口边缘检测] 窗口左边缘={rect.left()}, 窗口右边缘={rect.right()}, 窗口下边缘={rect.bottom()}")
-            print(f"[鼠标相对位置] 鼠标相对于窗口左边缘={pos.x()}, 鼠标相对于窗口右边缘={rect.width() - pos.x()}, 鼠标相对于窗口下边缘={rect.height() - pos.y()}")
-            
-            # 上边框：移动窗口
-            if on_top and not (on_left or on_right):
-                # 上边框拖拽：移动窗口
-                self.drag_position = event.globalPos() - self.frameGeometry().topLeft()
-                self.resizing = False
-                print("[拖拽模式] 开始移动窗口")
+            mouse_log.debug(f"[{mode_str}鼠标按下] 位置=({pos.x()}, {pos.y()}), "
+                            f"窗口大小={self.width()}x{self.height()}, 边框区域={region}")
+            
+        if region is None or region == 'top':
+            # 上边框或非边框区域：移动窗口
+            self.drag_position = global_pos - self.frameGeometry().topLeft()
+            self.resizing = False
+        else:
             # 左、右、下边框和角落：调整大小
-            elif on_left or on_right or on_bottom or (on_left and on_top) or (on_right and on_top):
-                # 在边框区域，启动调整大小模式
-                self.resizing = True
-                self.resize_start_pos = event.globalPos()
-                self.resize_start_geometry = self.geometry()
-                
-                # 确定调整方向
-                if on_left and on_top:
-                    self.resize_direction = 'top-left'
-                elif on_right and on_top:
-                    self.resize_direction = 'top-right'
-                elif on_left and on_bottom:
-                    self.resize_direction = 'bottom-left'
-                elif on_right and on_bottom:
-                    self.resize_direction = 'bottom-right'
-                elif on_left:
-                    self.resize_direction = 'left'
-                elif on_right:
-                    self.resize_direction = 'right'
-                elif on_bottom:
-                    self.resize_direction = 'bottom'
-                else:
-                    # 如果不在明确的调整区域，回退到普通拖拽
-                    self.drag_position = event.globalPos() - self.frameGeometry().topLeft()
-                    self.resizing = False
-                    
-                print(f"[拖拽模式] 开始调整大小: 方向={self.resize_direction}")
-            else:
-                # 不在边框区域，普通拖拽
-                self.drag_position = event.globalPos() - self.frameGeometry().topLeft()
-                self.resizing = False
-                print("[拖拽模式] 开始普通拖拽")
-            event.accept()
+            self.resizing = True
+            self.resize_direction = region
+            self.resize_start_pos = global_pos
+            self.resize_start_geometry = self.geometry()
             
     def mouseMoveEvent(self, event):
         """鼠标移动事件，用于窗口拖拽和调整大小"""
-        pos = event.pos()
-        rect = self.rect()
-        
-        # 确保使用正确的resize_border_width值
-        border_width = self.resize_border_width
-        
-        # 添加更多调试信息
-        mode_str = "极简模式" if self.minimal_mode else "普通模式"
-        print(f"[调试信息] 当前模式: {mode_str}")
-        print(f"[调试信息] resize_border_width当前值={border_width}")
-        print(f"[调试信息] 窗口位置: ({self.x()}, {self.y()}), 窗口大小: {self.width()}x{self.height()}")
-        print(f"[调试信息] 鼠标位置: ({pos.x()}, {pos.y()})")
-        
-        # 计算边框检测区域
-        left_boundary = border_width
-        right_boundary = rect.width() - border_width
-        bottom_boundary = rect.height() - border_width
-        
-        on_left = pos.x() <= left_boundary
-        on_right = pos.x() >= right_boundary
-        on_bottom = pos.y() >= bottom_boundary
-        
-        # 显示所有鼠标位置的调试信息
-        print(f"[鼠标移动] 位置=({pos.x()}, {pos.y()}), 窗口大小={rect.width()}x{rect.height()}")
-        print(f"[边框数值] 左边界<={left_boundary}, 右边界>={right_boundary}, 下边界>={bottom_boundary}")
-        print(f"[边框检测] 左={on_left}, 右={on_right}, 下={on_bottom}")
-        
-        # 强制调用光标更新
-        self.update_cursor(pos)
-        
-        # 先处理窗口调整大小
-        if self.resizing and event.buttons() == Qt.LeftButton and self.resize_start_geometry:
-            # 调整窗口大小 - 修复计算逻辑
-            diff = event.globalPos() - self.resize_start_pos
-            # 使用起始几何信息作为基础来计算新的尺寸，确保计算正确
-            start_geo = self.resize_start_geometry
-            new_x = start_geo.x()
-            new_y = start_geo.y()
-            new_width = start_geo.width()
-            new_height = start_geo.height()
-            
-            if self.resize_direction == 'right':
-                # 向右调整大小，只改变宽度
-                new_width = start_geo.width() + diff.x()
-            elif self.resize_direction == 'bottom':
-                # 向下调整大小，只改变高度
-                new_height = start_geo.height() + diff.y()
-            elif self.resize_direction == 'left':
-                # 向左调整大小，需要同时调整x位置和宽度
-                new_x = start_geo.x() + diff.x()
-                new_width = start_geo.width() - diff.x()
-            elif self.resize_direction == 'bottom-right':
-                # 向右下调整大小，同时改变宽度和高度
-                new_width = start_geo.width() + diff.x()
-                new_height = start_geo.height() + diff.y()
-            elif self.resize_direction == 'bottom-left':
-                # 向左下调整大小，需要同时调整x位置、宽度和高度
-                new_x = start_geo.x() + diff.x()
-                new_width = start_geo.width() - diff.x()
-                new_height = start_geo.height() + diff.y()
-            elif self.resize_direction == 'top-right':
-                # 向右上调整大小，需要同时调整y位置、宽度和高度
-                new_y = start_geo.y() + diff.y()
-                new_width = start_geo.width() + diff.x()
-                new_height = start_geo.height() - diff.y()
-            elif self.resize_direction == 'top-left':
-                # 向左上调整大小，需要同时调整x位置、y位置、宽度和高度
-                new_x = start_geo.x() + diff.x()
-                new_y = start_geo.y() + diff.y()
-                new_width = start_geo.width() - diff.x()
-                new_height = start_geo.height() - diff.y()
-            
-            # 设置最小尺寸
-            if new_width < 300:
-                new_width = 300
-            if new_height < 200:
-                new_height = 200
-            
-            self.setGeometry(new_x, new_y, new_width, new_height)
-            event.accept()
-            return
-            
-        # 处理普通窗口拖拽
-        elif event.buttons() == Qt.LeftButton and self.drag_position:
-            # 普通拖拽
-            self.move(event.globalPos() - self.drag_position)
-            event.accept()
-            return
+        self.handle_mouse_move(event.pos(), event.globalPos(), event.buttons())
+        event.accept()
         
-        # 如果在边框区域，直接处理调整大小逻辑
-        if on_left or on_right or on_bottom:
-            # 阻止事件传播到子控件
-            event.accept()
-            return
+    def handle_mouse_move(self, pos, global_pos, buttons):
+        """鼠标移动：按住左键时调整大小或移动窗口，否则更新边框光标"""
+        if TRACE_MOUSE:
+            mouse_log.debug(f"鼠标移动: 位置=({pos.x()}, {pos.y()}), 调整大小={self.resizing}")
             
-        # 无论是否按下鼠标，都要更新光标样式
-        print(f"[调试信息] 更新光标样式")
-        self.update_cursor(event.pos())
-        event.accept()
+        if buttons == Qt.LeftButton:
+            if self.resizing and self.resize_start_geometry:
+                self.resize_window(global_pos)
+                return
+            if self.drag_position:
+                self.move(global_pos - self.drag_position)
+                return
+                
+        self.update_cursor(pos, buttons)
+        
+    def resize_window(self, global_pos):
+        """按调整方向和鼠标的位移计算窗口的新位置和大小"""
+        # 调整窗口大小 - 修复计算逻辑
+        diff = global_pos - self.resize_start_pos
+        # 使用起始几何信息作为基础来计算新的尺寸，确保计算正确
+        start_geo = self.resize_start_geometry
+        new_x = start_geo.x()
+        new_y = start_geo.y()
+        new_width = start_geo.width()
+        new_height = start_geo.height()
+        
+        if self.resize_direction == 'right':
+            # 向右调整大小，只改变宽度
+            new_width = start_geo.width() + diff.x()
+        elif self.resize_direction == 'bottom':
+            # 向下调整大小，只改变高度
+            new_height = start_geo.height() + diff.y()
+        elif self.resize_direction == 'left':
+            # 向左调整大小，需要同时调整x位置和宽度
+            new_x = start_geo.x() + diff.x()
+            new_width = start_geo.width() - diff.x()
+        elif self.resize_direction == 'bottom-right':
+            # 向右下调整大小，同时改变宽度和高度
+            new_width = start_geo.width() + diff.x()
+            new_height = start_geo.height() + diff.y()
+        elif self.resize_direction == 'bottom-left':
+            # 向左下调整大小，需要同时调整x位置、宽度和高度
+            new_x = start_geo.x() + diff.x()
+            new_width = start_geo.width() - diff.x()
+            new_height = start_geo.height() + diff.y()
+        elif self.resize_direction == 'top-right':
+            # 向右上调整大小，需要同时调整y位置、宽度和高度
+            new_y = start_geo.y() + diff.y()
+            new_width = start_geo.width() + diff.x()
+            new_height = start_geo.height() - diff.y()
+        elif self.resize_direction == 'top-left':
+            # 向左上调整大小，需要同时调整x位置、y位置、宽度和高度
+            new_x = start_geo.x() + diff.x()
+            new_y = start_geo.y() + diff.y()
+            new_width = start_geo.width() - diff.x()
+            new_height = start_geo.height() - diff.y()
+        
+        # 设置最小尺寸
+        if new_width < 300:
+            new_width = 300
+        if new_height < 200:
+            new_height = 200
+        
+        self.setGeometry(new_x, new_y, new_width, new_height)
             
     def mouseReleaseEvent(self, event):
         """鼠标释放事件"""
         if event.button() == Qt.LeftButton:
-            self.resizing = False
-            self.resize_direction = None
-            self.drag_position = None
+            self.handle_mouse_release()
         event.accept()
         
-    def update_cursor(self, pos):
-        """根据鼠标位置更新光标样式 - 在极简模式和正常模式下都工作"""
-        # 添加详细调试
-        mode_str = "极简模式" if self.minimal_mode else "普通模式"
-        print(f"[光标更新] 开始处理 - 模式={mode_str}, 位置=({pos.x()}, {pos.y()})")
-        print(f"[光标更新] resize_border_width={self.resize_border_width}")
-        print(f"[光标更新] resizing状态={self.resizing}")
-        
-        # 在极简模式和正常模式下都允许边框调整
-        # 只有在鼠标左键按下且正在调整大小时才跳过光标更新
-        if self.resizing and QApplication.mouseButtons() & Qt.LeftButton:
-            print(f"[光标更新] 正在调整大小中，跳过光标更新")
-            return
+    def handle_mouse_release(self):
+        """左键释放，结束拖拽和调整大小"""
+        self.resizing = False
+        self.resize_direction = None
+        self.drag_position = None
         
-        # 重置resizing状态，确保在没有鼠标按键时能正确更新光标
-        # 添加安全检查，确保QApplication可用
-        try:
-            if not (QApplication.mouseButtons() & Qt.LeftButton):
-                self.resizing = False
-                self.resize_direction = None
-        except:
-            # 如果QApplication不可用，直接重置状态
+    def update_cursor(self, pos, buttons=None):
+        """根据鼠标位置更新光标样式 - 在极简模式和正常模式下都工作"""
+        if buttons is None:
+            buttons = QApplication.mouseButtons()
+        if buttons & Qt.LeftButton:
+            # 正在调整大小时保持光标不变
+            if self.resizing:
+                return
+        else:
+            # 没有按下鼠标时重置调整状态
             self.resizing = False
             self.resize_direction = None
             
-        rect = self.rect()
-        # 使用局部变量确保一致性
-        border_width = self.resize_border_width
-        
-        # 计算边框检测区域
-        left_boundary = border_width
-        right_boundary = rect.width() - border_width
-        bottom_boundary = rect.height() - border_width
-        top_boundary = border_width
-        
-        on_left = pos.x() <= left_boundary
-        on_right = pos.x() >= right_boundary
-        on_top = pos.y() <= top_boundary
-        on_bottom = pos.y() >= bottom_boundary
-        
-        # 添加调试信息
-        print(f"[光标更新调试] 边框检测: 左={on_left}, 右={on_right}, 上={on_top}, 下={on_bottom}")
-        print(f"[光标更新调试] 窗口大小: {rect.width()}x{rect.height()}")
-        print(f"[光标更新调试] 边框阈值: 左<={left_boundary}, 右>={right_boundary}, 上<={top_boundary}, 下>={bottom_boundary}")
-        print(f"[窗口边缘检测] 窗口左边缘={rect.left()}, 窗口右边缘={rect.right()}, 窗口下边缘={rect.bottom()}")
-        print(f"[鼠标相对位置] 鼠标相对于窗口左边缘={pos.x()}, 鼠标相对于窗口右边缘={rect.width() - pos.x()}, 鼠标相对于窗口下边缘={rect.height() - pos.y()}")
-        
-        # 上边框：移动光标（只有上边，不包含角落）
-        if on_top and not (on_left or on_right):
-            self.setCursor(Qt.SizeAllCursor)  # 移动光标
-            print("[光标] 设置为移动光标 - SizeAllCursor")
-        # 角落拖拽：调整大小
-        elif on_left and on_top or on_right and on_bottom:
-            self.setCursor(Qt.SizeFDiagCursor)  # 斜对角箭头
-            print("[光标] 设置为斜对角调整光标 - SizeFDiagCursor")
-        elif on_right and on_top or on_left and on_bottom:
-            self.setCursor(Qt.SizeBDiagCursor)  # 斜对角箭头
-            print("[光标] 设置为斜对角调整光标 - SizeBDiagCursor")
-        # 左右边框：水平调整
-        elif on_left or on_right:
-            print(f"[光标设置] 检测到水平边框, 左={on_left}, 右={on_right}")
-            self.setCursor(Qt.SizeHorCursor)    # 水平箭头
-            print("[光标] 设置为水平调整光标 - SizeHorCursor")
-            # 强制刷新光标显示
-            self.update()
-        # 下边框：垂直调整
-        elif on_bottom:
-            print(f"[光标设置] 检测到垂直边框, 下={on_bottom}")
-            self.setCursor(Qt.SizeVerCursor)    # 垂直到箭头
-            print("[光标] 设置为垂直调整光标 - SizeVerCursor")
-            # 强制刷新光标显示
-            self.update()
-        else:
-            self.setCursor(Qt.ArrowCursor)      # 普通箭头
-            print("[光标] 设置为普通箭头 - ArrowCursor")
+        region = self.border_hit.hit(pos.x(), pos.y())
+        if region == self._cursor_region:
+            # 区域没有变化，不重复设置光标
+            return
+        self._cursor_region = region
+        if TRACE_CURSOR:
+            cursor_log.debug(f"位置=({pos.x()}, {pos.y()}), 边框区域={region}")
+        self.setCursor(REGION_CURSORS[region])
             
     def mouseDoubleClickEvent(self, event):
         """鼠标双击事件，切换最大化状态"""
@@ -1335,117 +1895,97 @@ class MainWindow(QMainWindow):
             event.accept()
             
     def eventFilter(self, obj, event):
-        """事件过滤器，主要用于处理阅读区域的滚轮事件和鼠标事件传播"""
-        from PyQt5.QtCore import QEvent
-        from PyQt5.QtGui import QWheelEvent, QMouseEvent
-        
-        # 处理鼠标移动事件，从子控件传播到主窗口
-        # 关键修复：确保边框检测区域不被子控件拦截
-        child_widgets = []
-        if hasattr(self, 'reading_area') and self.reading_area:
-            child_widgets.append(self.reading_area)
-        if hasattr(self, 'file_panel') and self.file_panel:
-            child_widgets.append(self.file_panel)
-        if hasattr(self, 'splitter') and self.splitter:
-            child_widgets.append(self.splitter)
-        if hasattr(self, 'file_list') and self.file_list:
-            child_widgets.append(self.file_list)
-        if hasattr(self, 'status_bar') and self.status_bar:
-            child_widgets.append(self.status_bar)
-        if self.centralWidget():
-            child_widgets.append(self.centralWidget())
-            
-        if event.type() == QEvent.MouseMove and obj in child_widgets:
-            # 将子控件的鼠标移动事件映射到主窗口坐标系
-            child_pos = event.pos()
-            global_pos = obj.mapToGlobal(child_pos)
-            main_window_pos = self.mapFromGlobal(global_pos)
-            
-            # 手动调用主窗口的鼠标移动事件处理
-            mouse_event = QMouseEvent(event.type(), main_window_pos, global_pos, 
-                                    event.button(), event.buttons(), event.modifiers())
-            self.mouseMoveEvent(mouse_event)
-            
-            # 让事件继续传播给子控件
-            return False
-        elif event.type() == QEvent.MouseButtonPress and obj in child_widgets:
-            # 将子控件的鼠标按下事件映射到主窗口坐标系
-            child_pos = event.pos()
-            global_pos = obj.mapToGlobal(child_pos)
-            main_window_pos = self.mapFromGlobal(global_pos)
-            
-            # 手动调用主窗口的鼠标按下事件处理
-            mouse_event = QMouseEvent(event.type(), main_window_pos, global_pos, 
-                                    event.button(), event.buttons(), event.modifiers())
-            self.mousePressEvent(mouse_event)
-            
-            # 让事件继续传播给子控件
-            return False
-        elif event.type() == QEvent.MouseButtonRelease and obj in child_widgets:
-            # 将子控件的鼠标释放事件映射到主窗口坐标系
-            child_pos = event.pos()
-            global_pos = obj.mapToGlobal(child_pos)
-            main_window_pos = self.mapFromGlobal(global_pos)
-            
-            # 手动调用主窗口的鼠标释放事件处理
-            mouse_event = QMouseEvent(event.type(), main_window_pos, global_pos, 
-                                    event.button(), event.buttons(), event.modifiers())
-            self.mouseReleaseEvent(mouse_event)
-            
+        """事件过滤器，把子控件上的鼠标事件转给主窗口做边框检测和拖拽"""
+        event_type = event.type()
+        if event_type in ACTIVITY_EVENTS or (event_type == QEvent.MouseMove
+                                             and event.buttons() != Qt.NoButton):
+            # 用户正在操作，暂停空闲预取
+            self.prefetcher.notify_activity()
+        if event_type in FORWARDED_MOUSE_EVENTS and obj in self._forwarded_widgets:
+            # 关键修复：确保边框检测区域不被子控件拦截
+            if event_type == QEvent.MouseMove:
+                buttons = event.buttons()
+                if buttons == Qt.NoButton and self._cursor_region is None:
+                    # 远离边框的普通移动只做一次命中测试
+                    pos = obj.mapTo(self, event.pos())
+                    if self.border_hit.hit(pos.x(), pos.y()) is None:
+                        return False
+                    self.update_cursor(pos, buttons)
+                else:
+                    self.handle_mouse_move(obj.mapTo(self, event.pos()), event.globalPos(), buttons)
+            elif event.button() == Qt.LeftButton:
+                if event_type == QEvent.MouseButtonPress:
+                    self.handle_mouse_press(obj.mapTo(self, event.pos()), event.globalPos())
+                else:
+                    self.handle_mouse_release()
             # 让事件继续传播给子控件
             return False
             
         # 按照用户要求，字体大小调整必须在偏好设置中进行，不再支持Ctrl+滚轮动态调整
-        # 这里保留事件过滤器的结构，但不处理缩放操作
         
         return super().eventFilter(obj, event)
             
     def setup_mouse_tracking(self):
         """配置所有组件的鼠标跟踪和事件过滤器 - 关键修复"""
-        print("[鼠标跟踪配置] 开始配置所有组件的鼠标跟踪...")
+        init_log.debug("开始配置所有组件的鼠标跟踪...")
         
         # 1. 主窗口鼠标跟踪
         self.setMouseTracking(True)
-        print("[鼠标跟踪配置] 主窗口鼠标跟踪已启用")
+        init_log.debug("主窗口鼠标跟踪已启用")
         
         # 2. 中央部件鼠标跟踪
         central_widget = self.centralWidget()
         if central_widget:
             central_widget.setMouseTracking(True)
             central_widget.installEventFilter(self)
-            print("[鼠标跟踪配置] 中央部件鼠标跟踪已启用")
+            init_log.debug("中央部件鼠标跟踪已启用")
         
         # 3. 阅读区域鼠标跟踪
         if hasattr(self, 'reading_area') and self.reading_area:
             self.reading_area.setMouseTracking(True)
             self.reading_area.installEventFilter(self)
-            print("[鼠标跟踪配置] 阅读区域鼠标跟踪已启用")
+            # 鼠标按键和滚轮事件发给视口，只用于暂停空闲预取，不转给主窗口
+            self.reading_area.viewport().installEventFilter(self)
+            init_log.debug("阅读区域鼠标跟踪已启用")
+            
+        # 虚拟视图鼠标跟踪
+        if hasattr(self, 'virtual_view') and self.virtual_view:
+            self.virtual_view.viewport().setMouseTracking(True)
+            self.virtual_view.viewport().installEventFilter(self)
         
         # 4. 文件面板鼠标跟踪
         if hasattr(self, 'file_panel') and self.file_panel:
             self.file_panel.setMouseTracking(True)
             self.file_panel.installEventFilter(self)
-            print("[鼠标跟踪配置] 文件面板鼠标跟踪已启用")
+            init_log.debug("文件面板鼠标跟踪已启用")
         
         # 5. 文件列表鼠标跟踪
         if hasattr(self, 'file_list') and self.file_list:
             self.file_list.setMouseTracking(True)
             self.file_list.installEventFilter(self)
-            print("[鼠标跟踪配置] 文件列表鼠标跟踪已启用")
+            init_log.debug("文件列表鼠标跟踪已启用")
         
         # 6. 分割器鼠标跟踪
         if hasattr(self, 'splitter') and self.splitter:
             self.splitter.setMouseTracking(True)
             self.splitter.installEventFilter(self)
-            print("[鼠标跟踪配置] 分割器鼠标跟踪已启用")
+            init_log.debug("分割器鼠标跟踪已启用")
         
         # 7. 状态栏鼠标跟踪
         if hasattr(self, 'status_bar') and self.status_bar:
             self.status_bar.setMouseTracking(True)
             self.status_bar.installEventFilter(self)
-            print("[鼠标跟踪配置] 状态栏鼠标跟踪已启用")
+            init_log.debug("状态栏鼠标跟踪已启用")
         
-        print("[鼠标跟踪配置] 所有组件鼠标跟踪配置完成")
+        # 鼠标事件转给主窗口处理的子控件，事件过滤器中只做一次集合查找
+        forwarded = [self.centralWidget(), getattr(self, 'reading_area', None), getattr(self, 'file_panel', None),
+                     getattr(self, 'splitter', None), getattr(self, 'file_list', None),
+                     getattr(self, 'status_bar', None)]
+        if getattr(self, 'virtual_view', None):
+            forwarded.append(self.virtual_view.viewport())
+        self._forwarded_widgets = frozenset(widget for widget in forwarded if widget is not None)
+        
+        init_log.debug("所有组件鼠标跟踪配置完成")
             
     def minimize_to_tray(self):
         """最小化到托盘"""
@@ -1463,6 +2003,7 @@ class MainWindow(QMainWindow):
             self.file_panel.setMaximumWidth(40)
             self.file_panel.setMinimumWidth(40)
             self.file_list.hide()
+            self.outline_panel.hide()
             self.collapse_btn.setText("»")
             self.collapse_btn.setToolTip("展开文档列表")
         else:  # 当前是收缩状态
@@ -1470,6 +2011,8 @@ class MainWindow(QMainWindow):
             self.file_panel.setMaximumWidth(250)
             self.file_panel.setMinimumWidth(150)
             self.file_list.show()
+            self.outline_panel.setVisible(self.outline_action.isChecked())
+            self.refresh_outline()
             self.collapse_btn.setText("«")
             self.collapse_btn.setToolTip("收缩文档列表")
         
@@ -1492,34 +2035,52 @@ class MainWindow(QMainWindow):
     def restore_file_list(self):
         """恢复文档列表"""
         try:
-            print(f"恢复文档列表，最近文档数量: {len(self.recent_files)}")
+            document_log.debug(f"恢复文档列表，最近文档数量: {len(self.recent_files)}")
             # 清空现有列表
             self.file_list.clear()
             
             # 添加最近文档到列表
             for file_path in self.recent_files:
                 if os.path.exists(file_path):
-                    print(f"添加文档到列表: {os.path.basename(file_path)}")
+                    document_log.debug(f"添加文档到列表: {os.path.basename(file_path)}")
                     self.add_to_file_list(file_path)
                 else:
-                    print(f"文档不存在，跳过: {file_path}")
+                    document_log.debug(f"文档不存在，跳过: {file_path}")
         except Exception as e:
-            print(f"恢复文档列表时出错: {e}")
+            document_log.warning(f"恢复文档列表时出错: {e}")
             
+    def current_reading_anchor(self):
+        """当前阅读位置：可视区域顶部的锚点，只滚动不移动光标时也会改变"""
+        if self.mapped_text:
+            line = self.virtual_view.top_line()
+            return ReadingAnchor(line, line, 0, line / max(self.mapped_text.line_count, 1))
+        # 可视区域最上方一像素正好是上一行与这一行的分界，往下取一像素才落在顶部这一行
+        cursor = self.reading_area.cursorForPosition(QPoint(0, 1))
+        block = cursor.block()
+        bar = self.reading_area.verticalScrollBar()
+        fraction = bar.value() / bar.maximum() if bar.maximum() > 0 else 0.0
+        # 分块插入尚未补齐开头时，换算为完整文档中的位置和块序号
+        return ReadingAnchor(self.text_inserter.source_position(cursor.position()),
+                             self.text_inserter.source_block(block.position(), block.blockNumber()),
+                             cursor.position() - block.position(),
+                             round(fraction, 4))
+
+    def current_reading_position(self):
+        """当前阅读位置（可视区域顶部在完整文档中的字符位置，虚拟视图中为顶部行号）"""
+        return self.current_reading_anchor().position
+        
     def save_reading_progress_on_change(self):
         """在文档切换时保存阅读进度"""
         if self.current_file:
-            cursor = self.reading_area.textCursor()
-            position = cursor.position()
-            self.settings_manager.save_reading_progress(self.current_file, position)
-            print(f"保存阅读进度: {os.path.basename(self.current_file)} -> 位置 {position}")
+            anchor = self.current_reading_anchor()
+            self.settings_manager.save_reading_progress(self.current_file, anchor)
+            document_log.debug(f"保存阅读进度: {os.path.basename(self.current_file)} -> {anchor}")
             
     def auto_save_reading_progress(self):
         """自动保存阅读进度"""
         if self.current_file:
-            cursor = self.reading_area.textCursor()
-            position = cursor.position()
-            self.settings_manager.save_reading_progress(self.current_file, position)
+            anchor = self.current_reading_anchor()
+            self.settings_manager.save_reading_progress(self.current_file, anchor)
             # 不显示日志，避免干扰
             
     def show_context_menu(self, position):
@@ -1554,17 +2115,7 @@ class MainWindow(QMainWindow):
             if hasattr(self, 'status_bar') and self.status_bar:
                 self.status_bar.setVisible(True)
                 # 确保状态栏背景完全不透明
-                self.status_bar.setStyleSheet("""
-                    QStatusBar {
-                        background-color: rgba(240, 240, 240, 255);
-                        border-top: 1px solid rgba(200, 200, 200, 100);
-                        border-radius: 0 0 1px 1px;
-                        padding: 1px;
-                        height: 18px;
-                        color: #333333;
-                        font-size: 10px;
-                    }
-                """)
+                self.theme.apply(self.status_bar, STATUS_BAR_STYLE)
                 # 强制更新状态栏布局
                 self.status_bar.updateGeometry()
                 # 确保状态栏在最前面
@@ -1573,19 +2124,8 @@ class MainWindow(QMainWindow):
 
     def resizeEvent(self, event):
         """处理窗口大小变化事件"""
-        # 确保状态栏在窗口大小变化后仍然正确显示
+        self.border_hit.update_geometry(self.width(), self.height())
+        # 确保状态栏在窗口大小变化后仍然正确显示，样式表创建时已设置，拖动调整大小时不再重复设置
         if hasattr(self, 'status_bar') and self.status_bar:
             self.status_bar.setVisible(True)
-            # 确保状态栏背景完全不透明
-            self.status_bar.setStyleSheet("""
-                QStatusBar {
-                    background-color: rgba(240, 240, 240, 255);
-                    border-top: 1px solid rgba(200, 200, 200, 100);
-                    border-radius: 0 0 1px 1px;
-                    padding: 1px;
-                    height: 18px;
-                    color: #333333;
-                    font-size: 10px;
-                }
-            """)
         super().resizeEvent(event)
\ No newline at end of file
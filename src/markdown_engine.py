@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Markdown渲染模块
+复用同一个Markdown转换器，按标题分节缓存渲染结果，样式外壳预先编译
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from string import Template
+
+# 使用的Markdown扩展
+MARKDOWN_EXTENSIONS = ['codehilite', 'fenced_code', 'tables']
+
+# 分节渲染结果的缓存数量
+SECTION_CACHE_SIZE = 4096
+
+# 分节锚点的名称前缀，锚点位于每一节的开头
+SECTION_ANCHOR_PREFIX = 'sec-'
+
+# 以表格开头的节：表格外包一层div会在表格前多出一个空块，改为在表格之前放一个独立的锚点，
+# Qt把它附在表格第一个单元格的文字上
+_TABLE_START_RE = re.compile(r'^\s*<table\b')
+
+# ATX标题行（行首的#）开始新的一节
+_HEADING_RE = re.compile(r'^#{1,6}(\s|$)')
+
+# 围栏代码块的开始和结束：最多缩进3个空格，至少3个相同的字符，
+# 结束的围栏与开始的字符相同、长度不短于开始的围栏，且后面没有其他内容
+_FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})(.*)$')
+
+# 引用式链接、脚注等定义可能被文档其他位置引用，出现时不能分节渲染
+_REFERENCE_RE = re.compile(r'^ {0,3}\[[^\]]+\]:', re.MULTILINE)
+
+# 样式外壳模板，字体和文字颜色随阅读设置变化；设置了文字颜色时标题和加粗文字也使用它
+PAGE_TEMPLATE = Template("""
+<html>
+<head>
+    <style>
+        body {
+            font-family: '$font_family', 'Microsoft YaHei', Arial, sans-serif;
+            line-height: 1.6;
+            color: $text_color;
+            max-width: 100%;
+            margin: 0;
+            padding: 20px;
+            background-color: transparent;
+        }
+        h1, h2, h3, h4, h5, h6 {
+            color: $heading_color;
+            margin-top: 1.5em;
+            margin-bottom: 0.5em;
+        }
+        h1 { font-size: 1.8em; border-bottom: 2px solid #3498db; padding-bottom: 0.3em; }
+        h2 { font-size: 1.5em; border-bottom: 1px solid #bdc3c7; padding-bottom: 0.3em; }
+        h3 { font-size: 1.3em; color: $subheading_color; }
+        code {
+            background-color: #f8f9fa;
+            padding: 2px 4px;
+            border-radius: 3px;
+            font-family: 'Consolas', 'Monaco', monospace;
+            color: #e74c3c;
+        }
+        pre {
+            background-color: #f8f9fa;
+            padding: 15px;
+            border-radius: 5px;
+            overflow-x: auto;
+            border-left: 4px solid #3498db;
+        }
+        pre code {
+            background-color: transparent;
+            padding: 0;
+            color: #2c3e50;
+        }
+        blockquote {
+            border-left: 4px solid #bdc3c7;
+            margin: 1.5em 0;
+            padding-left: 1em;
+            color: #7f8c8d;
+            font-style: italic;
+        }
+        ul, ol { margin: 1em 0; padding-left: 2em; }
+        li { margin: 0.5em 0; }
+        table {
+            border-collapse: collapse;
+            width: 100%;
+            margin: 1em 0;
+        }
+        th, td {
+            border: 1px solid #bdc3c7;
+            padding: 8px 12px;
+            text-align: left;
+        }
+        th {
+            background-color: #ecf0f1;
+            font-weight: bold;
+        }
+        a { color: #3498db; text-decoration: none; }
+        a:hover { text-decoration: underline; }
+        strong { color: $heading_color; }
+        em { color: #7f8c8d; }
+    </style>
+</head>
+<body>
+""")
+
+# 正文之后不能有空白，否则文档末尾会多出一个空格
+PAGE_END = "</body></html>"
+
+# 未指定时使用的样式，与原来固定的样式一致
+DEFAULT_FONT_FAMILY = 'Microsoft YaHei'
+DEFAULT_TEXT_COLOR = '#333'
+DEFAULT_HEADING_COLOR = '#2c3e50'
+DEFAULT_SUBHEADING_COLOR = '#34495e'
+
+
+def split_sections(source):
+    """
+    按ATX标题把Markdown源文本分成若干节，围栏代码块中的#不算标题
+
+    Returns:
+        list: 各节的源文本，拼接后与原文相同
+    """
+    sections = []
+    current = []
+    fence = None  # 当前所在代码块开始的围栏
+    for line in source.splitlines(keepends=True):
+        match = _FENCE_RE.match(line.rstrip('\r\n'))
+        if match:
+            marker, rest = match.groups()
+            if fence is None:
+                if not (marker[0] == '`' and '`' in rest):
+                    fence = marker
+            elif marker[0] == fence[0] and len(marker) >= len(fence) and not rest.strip():
+                fence = None
+        elif fence is None and current and _HEADING_RE.match(line):
+            # 第一个标题之前只有空行时不单独成节，保证每一节都有内容
+            if sections or ''.join(current).strip():
+                sections.append(''.join(current))
+                current = []
+        current.append(line)
+    if current:
+        sections.append(''.join(current))
+    return sections
+
+
+def section_anchor(index):
+    """第index节开头的锚点名称"""
+    return f"{SECTION_ANCHOR_PREFIX}{index}"
+
+
+class MarkdownEngine:
+    """Markdown渲染引擎
+
+    转换器只创建一次，每次使用前reset()。文档按标题分节渲染，
+    每节的结果以源文本为键缓存，未改变的节不会再次解析。
+    """
+
+    def __init__(self, max_cached_sections=SECTION_CACHE_SIZE):
+        self.max_cached_sections = max_cached_sections
+        self._converter = None
+        self._lock = threading.Lock()  # 转换器不是线程安全的
+        self._sections = OrderedDict()
+        self._pages = {}  # (字体, 文字颜色) -> 样式外壳
+
+    def sectioned(self, source):
+        """文档能否分节渲染，引用式定义可能被其他节引用，出现时只能整篇渲染"""
+        return not _REFERENCE_RE.search(source)
+
+    def render_body(self, source):
+        """
+        渲染Markdown正文
+
+        Args:
+            source (str): Markdown源文本
+
+        Returns:
+            str: 正文HTML，可以分节渲染时每节的第一个块带有名为 sec-N 的锚点
+        """
+        if not self.sectioned(source):
+            return self._render_section(source)
+        return self.render_sections(split_sections(source))
+
+    def render_sections(self, sections, first_index=0):
+        """
+        渲染若干连续的节
+
+        Args:
+            sections (list): 各节的源文本
+            first_index (int): 第一节在文档中的序号，用于锚点名称
+
+        Returns:
+            str: 各节HTML依次拼接的结果
+        """
+        parts = []
+        for index, section in enumerate(sections, first_index):
+            name = section_anchor(index)
+            html = self._render_section(section)
+            if _TABLE_START_RE.match(html):
+                parts.append(f'<a name="{name}"></a>{html}')
+            else:
+                # 锚点作为外层元素的id，落在这一节第一个块的开头，不进入列表、代码等内部
+                parts.append(f'<div id="{name}">{html}</div>')
+        return ''.join(parts)
+
+    def render_page(self, body, font_family=None, text_color=None):
+        """
+        把正文HTML套入样式外壳
+
+        Args:
+            body (str): render_body() 的结果
+            font_family (str): 正文字体
+            text_color (str): 正文和标题的颜色，为None时使用默认样式中各自的颜色
+
+        Returns:
+            str: 完整的HTML页面
+        """
+        key = (font_family or DEFAULT_FONT_FAMILY, text_color)
+        head = self._pages.get(key)
+        if head is None:
+            head = PAGE_TEMPLATE.substitute(
+                font_family=key[0],
+                text_color=text_color or DEFAULT_TEXT_COLOR,
+                heading_color=text_color or DEFAULT_HEADING_COLOR,
+                subheading_color=text_color or DEFAULT_SUBHEADING_COLOR)
+            self._pages[key] = head
+        return head + body + PAGE_END
+
+    def render(self, source, font_family=None, text_color=None):
+        """渲染完整的HTML页面"""
+        return self.render_page(self.render_body(source), font_family, text_color)
+
+    def _render_section(self, section):
+        with self._lock:
+            html = self._sections.get(section)
+            if html is not None:
+                self._sections.move_to_end(section)
+                return html
+
+            if self._converter is None:
+                # 第一次渲染时才导入markdown及其扩展，不打开Markdown文档时启动不必加载
+                import markdown
+                self._converter = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+            html = self._converter.reset().convert(section)
+
+            self._sections[section] = html
+            while len(self._sections) > self.max_cached_sections:
+                self._sections.popitem(last=False)
+            return html
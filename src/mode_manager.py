@@ -11,6 +11,14 @@ from typing import Any
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QCursor
 from PyQt5.QtWidgets import QTextBrowser, QMenu, QAction
+from theme_engine import (MINIMAL_CENTRAL_STYLE, NORMAL_CENTRAL_STYLE, TITLE_BAR_STYLE,
+                          MENU_CONTAINER_STYLE, READING_PANEL_STYLE)
+from debug_log import get_logger
+
+log = get_logger('mode')
+
+# 影响阅读区域样式表的设置项
+READING_STYLE_KEYS = frozenset(('font_family', 'font_size', 'minimal_ui_opacity', 'minimal_text_opacity'))
 
 class ModeManager:
     """模式管理器"""
@@ -28,10 +36,30 @@ class ModeManager:
         else:
             self._exit_minimal_mode()
             
+    def on_settings_changed(self, changed):
+        """字体或极简模式透明度改变时重新设置阅读区域的样式表，其他设置项与样式无关"""
+        if READING_STYLE_KEYS.isdisjoint(changed):
+            return
+        settings_manager = self.main_window.settings_manager
+        font_family = settings_manager.get('font_family')
+        font_size = settings_manager.get('font_size')
+        if self.minimal_mode:
+            # 极简模式透明度为0-100%，转换为255范围的alpha值
+            ui_opacity_percent = max(0, min(100, settings_manager.get('minimal_ui_opacity')))
+            text_opacity_percent = max(0, min(100, settings_manager.get('minimal_text_opacity')))
+            self.main_window.theme.apply_reading_area(
+                self.main_window.reading_area, 'translucent', font_family, font_size,
+                int(ui_opacity_percent * 255 / 100), int(text_opacity_percent * 255 / 100))
+        elif 'font_family' in changed or 'font_size' in changed:
+            # 正常模式下只有字体影响样式表
+            self.main_window.theme.apply_reading_area(
+                self.main_window.reading_area, 'normal', font_family, font_size)
+            
     def _enter_minimal_mode(self):
         """进入极简模式"""
-        print("进入极简模式")
+        log.info("进入极简模式")
         main_window = self.main_window
+        theme = main_window.theme
         
         # 隐藏所有界面元素，只保留阅读区域
         main_window.title_bar.hide()
@@ -56,13 +84,7 @@ class ModeManager:
         
         # 设置主窗口中央部件样式 - 移除所有边框和圆角
         central_widget = main_window.centralWidget()
-        central_widget.setStyleSheet("""
-            QWidget {
-                background-color: transparent;
-                border: none;
-                border-radius: 0px;
-            }
-        """)
+        theme.apply(central_widget, MINIMAL_CENTRAL_STYLE)
         
         # 设置阅读区域样式 - 移除边框，只保留基本样式
         font_family = settings.get('font_family', 'Microsoft YaHei')
@@ -70,48 +92,13 @@ class ModeManager:
         if not isinstance(font_size, int) or font_size <= 0:
             font_size = 16
             
-        main_window.reading_area.setStyleSheet(f"""
-            QTextEdit {{
-                background-color: rgba(255, 255, 255, 200);
-                border: none;
-                border-radius: 0px;
-                padding: 5px;
-                font-family: '{font_family}';
-                font-size: {font_size}px;
-                color: #333333;
-            }}
-            /* 修改垂直滚动条 */
-            QTextEdit QScrollBar:vertical {{
-                width: 8px;                /* 滚动条宽度 */
-                background: transparent;
-                border-radius: 4px;
-            }}
-        
-            QTextEdit QScrollBar::handle:vertical {{
-                background: #a0a0a0;       /* 滑块颜色 */
-                border-radius: 4px;
-                min-height: 20px;
-            }}
-        
-            QTextEdit QScrollBar::handle:vertical:hover {{
-                background: #707070;       /* 鼠标悬停时颜色 */
-            }}
-        
-            /* 可选：隐藏滚动条边框和箭头按钮 */
-            QTextEdit QScrollBar::add-line:vertical, 
-            QTextEdit QScrollBar::sub-line:vertical {{
-                height: 0px;
-                background: none;
-            }}
-            
-            
-            
-        """)
+        theme.apply_reading_area(main_window.reading_area, 'minimal', font_family, font_size)
         
     def _exit_minimal_mode(self):
         """退出极简模式"""
-        print("退出极简模式")
+        log.info("退出极简模式")
         main_window = self.main_window
+        theme = main_window.theme
         
         # 恢复显示所有界面元素
         main_window.title_bar.show()
@@ -123,28 +110,13 @@ class ModeManager:
         
         # 恢复正常透明度 - 确保标题栏和菜单栏完全不透明
         central_widget = main_window.centralWidget()
-        central_widget.setStyleSheet("""
-            QWidget {
-                background-color: rgba(255, 255, 255, 255);  /* 完全不透明 */
-                border-radius: 2px;  /* 进一步优化：匹配主窗口圆角 */
-            }
-        """)
+        theme.apply(central_widget, NORMAL_CENTRAL_STYLE)
         
         # 恢复标题栏样式 - 完全不透明
-        main_window.title_bar.setStyleSheet("""
-            QWidget {
-                background-color: rgba(70, 130, 180, 255);  /* 完全不透明 */
-                border-radius: 1px 1px 0 0;  /* 进一步优化：减小圆角到1px */
-            }
-        """)
+        theme.apply(main_window.title_bar, TITLE_BAR_STYLE)
         
         # 恢复菜单容器样式 - 完全不透明
-        main_window.menu_container.setStyleSheet("""
-            QWidget {
-                background-color: rgba(240, 240, 240, 255);  /* 完全不透明 */
-                border-radius: 0px;
-            }
-        """)
+        theme.apply(main_window.menu_container, MENU_CONTAINER_STYLE)
         
         # 恢复阅读面板容器样式
         # 通过遍历splitter的子部件找到阅读面板容器并恢复样式
@@ -154,12 +126,7 @@ class ModeManager:
                 reading_area = widget.findChild(QTextBrowser)
                 if reading_area == main_window.reading_area:
                     # 这是阅读面板容器
-                    widget.setStyleSheet("""
-                        QFrame {
-                            background-color: rgba(255, 255, 255, 0);
-                            border: none;
-                        }
-                    """)
+                    theme.apply(widget, READING_PANEL_STYLE)
                     break
         
         # 恢复阅读区域样式（带字体大小），并保持禁用横向滚动条
@@ -169,30 +136,7 @@ class ModeManager:
         if not isinstance(font_size, int) or font_size <= 0:
             font_size = 16
             
-        main_window.reading_area.setStyleSheet(f"""
-            QTextEdit {{
-                background-color: rgba(255, 255, 255, 255);  /* 完全不透明 */
-                border: 1px solid rgba(200, 200, 200, 100);  /* 进一步优化：减小边框透明度 */
-                border-radius: 1px;  /* 进一步优化：减小圆角到1px */
-                padding: 10px;  # 进一步优化：减小内边距
-                font-family: '{font_family}';
-                font-size: {font_size}px;
-                color: #333333;
-            }}
-            QScrollBar:vertical {{
-                background-color: rgba(240, 240, 240, 150);  /* 进一步优化：调整透明度 */
-                width: 8px;  /* 进一步优化：减小滚动条宽度到8px */
-                border-radius: 4px;  /* 调整圆角以匹配新宽度 */
-            }}
-            QScrollBar::handle:vertical {{
-                background-color: rgba(180, 180, 180, 150);  /* 进一步优化：调整透明度 */
-                border-radius: 4px;  /* 调整圆角以匹配新宽度 */
-                min-height: 15px;  # 调整最小高度
-            }}
-            QScrollBar:horizontal {{
-                height: 0px;
-            }}
-        """)
+        theme.apply_reading_area(main_window.reading_area, 'compact', font_family, font_size)
         
         # 确保在普通模式下正确设置鼠标跟踪
         main_window.setMouseTracking(True)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目录面板模块
+显示PDF书签或Markdown标题组成的目录，点击条目跳转到对应的页面或文本块
+"""
+
+from collections import namedtuple
+
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtWidgets import QFrame, QLabel, QTreeWidget, QTreeWidgetItem, QVBoxLayout
+
+# 目录条目：
+#   level   层级，从1开始
+#   title   标题
+#   kind    跳转目标的类型，'page' 为PDF页码（从0开始），'block' 为文本块序号
+#   target  页码或文本块序号
+OutlineEntry = namedtuple('OutlineEntry', ['level', 'title', 'kind', 'target'])
+
+# 条目中保存跳转目标的数据角色
+TARGET_ROLE = Qt.UserRole
+
+
+class OutlinePanel(QFrame):
+    """目录面板"""
+
+    entry_activated = pyqtSignal(str, int)  # 目标类型, 页码或文本块序号
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(3)
+
+        title_label = QLabel("目录")
+        title_label.setStyleSheet("""
+            QLabel {
+                font-weight: bold;
+                padding: 3px;
+                background-color: rgba(255, 255, 255, 0);
+                color: #333333;
+            }
+        """)
+        layout.addWidget(title_label)
+
+        self.message_label = QLabel()
+        self.message_label.setWordWrap(True)
+        self.message_label.setStyleSheet("QLabel { color: #666666; padding: 3px; }")
+        layout.addWidget(self.message_label)
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderHidden(True)
+        self.tree.setStyleSheet("""
+            QTreeWidget {
+                background-color: rgba(255, 255, 255, 150);
+                border: 1px solid rgba(200, 200, 200, 100);
+                border-radius: 1px;
+            }
+            QTreeWidget::item:selected {
+                background-color: rgba(70, 130, 180, 150);
+                color: white;
+            }
+        """)
+        self.tree.itemClicked.connect(self._on_item_clicked)
+        self.tree.itemActivated.connect(self._on_item_clicked)
+        layout.addWidget(self.tree)
+
+    def set_entries(self, entries, empty_message="此文档没有目录"):
+        """
+        显示目录
+
+        Args:
+            entries (list): OutlineEntry 列表，按在文档中的顺序排列
+            empty_message (str): 没有条目时显示的说明
+        """
+        self.tree.clear()
+        parents = []  # 各层级当前的父条目
+        items = []
+        for entry in entries:
+            while parents and parents[-1][0] >= entry.level:
+                parents.pop()
+            item = QTreeWidgetItem([entry.title])
+            item.setToolTip(0, entry.title)
+            item.setData(0, TARGET_ROLE, (entry.kind, entry.target))
+            if parents:
+                parents[-1][1].addChild(item)
+            else:
+                items.append(item)
+            parents.append((entry.level, item))
+        self.tree.addTopLevelItems(items)
+        self.tree.expandToDepth(0)
+        self.set_message("" if entries else empty_message)
+
+    def set_message(self, message):
+        """显示说明文字，如正在读取目录"""
+        self.message_label.setText(message)
+        self.message_label.setVisible(bool(message))
+
+    def clear(self, message=""):
+        """清空目录"""
+        self.tree.clear()
+        self.set_message(message)
+
+    def _on_item_clicked(self, item, column=0):
+        kind, target = item.data(0, TARGET_ROLE)
+        self.entry_activated.emit(kind, target)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF并行提取模块
+PyPDF2是纯Python实现，提取文本受GIL限制只能使用一个CPU核心。
+页数较多的PDF按页码分成若干段，由进程池中的多个子进程同时提取，再按页码顺序拼接；
+各段按页码顺序提交，前面的页面先完成，可以边提取边送出。
+"""
+
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, wait
+
+from document_reader import check_cancelled, open_pdf_reader
+from debug_log import get_logger
+
+log = get_logger('document')
+
+# 提取的进程数，留一个核心给界面
+PDF_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# 每个子进程任务提取的页数
+PDF_CHUNK_PAGES = 8
+
+# 少于这个页数的PDF在当前进程中提取，启动子进程不划算
+PDF_PARALLEL_MIN_PAGES = 32
+
+# 等待子进程结果时检查取消的间隔（秒）
+_WAIT_INTERVAL = 0.2
+
+# 子进程中打开的PDF：(文件路径, 修改时间, PdfReader)，同一文件的后续分段不必重新解析。
+# 文件内容读入内存后立即关闭文件，子进程不占用文件句柄，Windows上阅读过的PDF仍可删除、改名或覆盖
+_worker_pdf = None
+
+
+def _extract_page_range(file_path, start, end):
+    """在子进程中提取 [start, end) 页的文本"""
+    global _worker_pdf
+    mtime = os.stat(file_path).st_mtime_ns
+    if _worker_pdf is None or _worker_pdf[:2] != (file_path, mtime):
+        _worker_pdf = None
+        with open(file_path, 'rb') as file:
+            data = io.BytesIO(file.read())
+        _worker_pdf = (file_path, mtime, open_pdf_reader(data))
+    reader = _worker_pdf[2]
+    return [reader.pages[page_num].extract_text() or '' for page_num in range(start, end)]
+
+
+class ParallelPdfExtractor:
+    """PDF并行提取器
+
+    进程池在第一次使用时创建，之后一直保留，shutdown() 时关闭。
+    子进程异常退出使进程池不可用时，本次提取改为在当前进程中完成，下次使用时重新创建进程池。
+    """
+
+    def __init__(self, workers=PDF_WORKERS, chunk_pages=PDF_CHUNK_PAGES):
+        self.workers = workers
+        self.chunk_pages = chunk_pages
+        self._executor = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def extract(self, file_path, progress_callback=None, cancel_check=None, pages_callback=None):
+        """
+        提取PDF所有页面的文本
+
+        Args:
+            file_path (str): PDF路径
+            progress_callback (callable): 进度回调，参数为(已完成页数, 总页数)
+            cancel_check (callable): 返回True时中止提取并抛出LoadCancelled
+            pages_callback (callable): 参数为(起始页码, 各页文本)，按页码顺序送出已连续完成的页面
+
+        Returns:
+            list: 各页文本（未格式化）
+        """
+        with open(file_path, 'rb') as file:
+            reader = open_pdf_reader(file)
+            page_count = len(reader.pages)
+            executor = self._get_executor() if page_count >= PDF_PARALLEL_MIN_PAGES else None
+            if executor is not None:
+                try:
+                    return self._extract_parallel(executor, file_path, page_count, progress_callback,
+                                                  cancel_check, pages_callback)
+                except BrokenExecutor as e:
+                    log.warning(f"并行提取PDF时子进程异常退出，改为单进程提取: {e}")
+                    with self._lock:
+                        if self._executor is executor:
+                            self._executor = None
+            return self._extract_serial(reader, page_count, progress_callback, cancel_check,
+                                        pages_callback)
+
+    def shutdown(self):
+        """关闭进程池，取消尚未开始的任务（程序退出时调用）"""
+        with self._lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_executor(self):
+        if self.workers <= 1:
+            return None
+        with self._lock:
+            if self._closed:
+                return None
+            if self._executor is None:
+                # 进程池模块在第一次并行提取时才导入
+                from concurrent.futures import ProcessPoolExecutor
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def _chunks(self, page_count):
+        return [(start, min(start + self.chunk_pages, page_count))
+                for start in range(0, page_count, self.chunk_pages)]
+
+    def _extract_parallel(self, executor, file_path, page_count, progress_callback, cancel_check,
+                          pages_callback):
+        # 按页码顺序提交，进程池按提交顺序取任务，前面的页面先完成
+        futures = {executor.submit(_extract_page_range, file_path, start, end): start
+                   for start, end in self._chunks(page_count)}
+        results = {}  # 起始页码 -> 各页文本
+        pages = []
+        try:
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=_WAIT_INTERVAL, return_when=FIRST_COMPLETED)
+                check_cancelled(cancel_check)
+                for future in done:
+                    results[futures[future]] = future.result()
+                # 送出从已完成部分末尾开始连续完成的各段
+                while len(pages) in results:
+                    chunk = results.pop(len(pages))
+                    if pages_callback:
+                        pages_callback(len(pages), chunk)
+                    pages.extend(chunk)
+                if progress_callback and done:
+                    progress_callback(len(pages), page_count)
+        finally:
+            for future in futures:
+                future.cancel()
+        return pages
+
+    def _extract_serial(self, reader, page_count, progress_callback, cancel_check, pages_callback):
+        pages = []
+        for start, end in self._chunks(page_count):
+            chunk = []
+            for page_num in range(start, end):
+                check_cancelled(cancel_check)
+                chunk.append(reader.pages[page_num].extract_text() or '')
+                if progress_callback:
+                    progress_callback(page_num + 1, page_count)
+            if pages_callback:
+                pages_callback(start, chunk)
+            pages.extend(chunk)
+        return pages
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化模块
+配置文件先写入临时文件再替换，写入中途崩溃或断电不会留下被截断的文件；
+短时间内的多次保存合并为一次写入
+"""
+
+import os
+
+from PyQt5.QtCore import QObject, QTimer
+
+# 第一次保存请求之后等待的毫秒数，期间的其他保存请求一起写入
+WRITE_COALESCE_MS = 500
+
+
+def atomic_write(file_path, text, encoding='utf-8'):
+    """
+    原子地写入文本文件
+
+    内容先写入同一目录下的临时文件并同步到磁盘，再替换目标文件并同步所在目录，
+    其他进程或下次启动时看到的要么是旧文件，要么是完整的新文件。
+    """
+    temp_path = f"{file_path}.tmp"
+    try:
+        with open(temp_path, 'w', encoding=encoding) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(os.path.dirname(os.path.abspath(file_path)))
+
+
+def _fsync_directory(dir_path):
+    """把目录项的改动（替换后的文件名）同步到磁盘，否则断电后替换可能丢失"""
+    if os.name == 'nt':
+        # Windows不能打开目录同步，替换由文件系统日志保证
+        return
+    try:
+        fd = os.open(dir_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        # 部分文件系统不支持同步目录，此时文件内容已经写入，只能依赖文件系统自身
+        pass
+    finally:
+        os.close(fd)
+
+
+class WriteCoalescer(QObject):
+    """写入合并器
+
+    各个存储通过 schedule() 登记自己的写入函数，第一次登记后等待 WRITE_COALESCE_MS，
+    期间重复登记的写入只执行一次，不同存储的写入在同一轮中依次执行。
+    """
+
+    def __init__(self, parent=None, delay_ms=WRITE_COALESCE_MS):
+        super().__init__(parent)
+        self._writers = {}  # 名称 -> 写入函数，按登记顺序执行
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self.flush)
+
+    def schedule(self, name, writer):
+        """登记一次写入，等待期间同名的写入只保留一个"""
+        self._writers[name] = writer
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def pending(self):
+        """是否有尚未执行的写入"""
+        return bool(self._writers)
+
+    def flush(self):
+        """立即执行所有登记的写入"""
+        self._timer.stop()
+        writers, self._writers = self._writers, {}
+        for writer in writers.values():
+            writer()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预取模块
+窗口显示后，在用户没有操作的空闲时间里，在后台读取最近几个文档
+（有缓存时从缓存读取，没有时解析并写入缓存），结果保存在内存中；
+之后打开这些文档时直接使用，不必再解析。主窗口收到用户操作时通知预取暂停，空闲后继续。
+解析与界面线程争用GIL，线程优先级不能保证界面流畅，所以预取在每页（每块）之间检查取消，
+用户一有操作就在下一页之前停下，并让出GIL。
+预取的内容总量有上限，超出时淘汰最早预取的文档。
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from PyQt5.QtCore import QObject, QRunnable, QThread, QThreadPool, QTimer, pyqtSignal
+
+from document_cache import DocumentCache
+from document_loader import PDF_INITIAL_PAGES
+from document_reader import LoadCancelled, check_cancelled, open_pdf_reader
+from debug_log import get_logger
+
+log = get_logger('document')
+
+# 预取的最近文档数
+PREFETCH_DOCUMENTS = 3
+
+# 没有用户操作多久之后开始（或继续）预取（毫秒）
+PREFETCH_IDLE_MS = 2000
+
+# 预取内容在内存中的总量上限（字节）
+PREFETCH_MEMORY_LIMIT = 48 * 1024 * 1024
+
+# 预取的文档：
+#   file_stat  读取时文件的(大小, 修改时间)，打开时文件已改变则不使用
+#   kind       'pdf'（各页文本）、'html'（Markdown正文）或 'text'
+#   content    内容，PDF为前几页文本的列表（其余页面打开后逐页读取）
+#   size       占用内存的估计值（字节）
+PrefetchedDocument = namedtuple('PrefetchedDocument', ['file_stat', 'kind', 'content', 'size'])
+
+
+class PrefetchStore:
+    """预取内容的存储，按预取的先后淘汰，总量不超过上限；可以在多个线程中使用"""
+
+    def __init__(self, limit=PREFETCH_MEMORY_LIMIT):
+        self.limit = limit
+        self.size = 0
+        self._entries = OrderedDict()  # 文件路径 -> PrefetchedDocument
+        self._lock = threading.Lock()
+
+    def put(self, file_path, entry):
+        """
+        保存预取的文档，超出上限时淘汰最早的
+
+        Returns:
+            bool: 文档本身超过上限、没有保存时返回False
+        """
+        if entry.size > self.limit:
+            return False
+        with self._lock:
+            self._discard(file_path)
+            while self._entries and self.size + entry.size > self.limit:
+                self._discard(next(iter(self._entries)))
+            self._entries[file_path] = entry
+            self.size += entry.size
+        return True
+
+    def take(self, file_path, file_stat):
+        """
+        取出预取的文档，取出后不再保留（内容交给了阅读区域）
+
+        Returns:
+            PrefetchedDocument: 没有预取或文件已改变时返回None
+        """
+        with self._lock:
+            entry = self._discard(file_path)
+        if entry is None or entry.file_stat != file_stat:
+            return None
+        return entry
+
+    def contains(self, file_path, file_stat):
+        """是否已预取了文件的当前版本"""
+        with self._lock:
+            entry = self._entries.get(file_path)
+        return entry is not None and entry.file_stat == file_stat
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _discard(self, file_path):
+        entry = self._entries.pop(file_path, None)
+        if entry is not None:
+            self.size -= entry.size
+        return entry
+
+
+def _text_size(texts):
+    """字符串占用内存的估计值"""
+    return sum(sys.getsizeof(text) for text in texts)
+
+
+class _PrefetchSignals(QObject):
+    finished = pyqtSignal(object)  # _PrefetchTask
+
+
+class _PrefetchTask(QRunnable):
+    """在后台读取一个文档并放入预取存储"""
+
+    def __init__(self, file_path, document_reader, document_cache, store, signals):
+        super().__init__()
+        self.file_path = file_path
+        self.document_reader = document_reader
+        self.document_cache = document_cache
+        self.store = store
+        self.signals = signals
+        self.cancel_event = threading.Event()
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _yield_check(self):
+        """检查是否已取消，同时让出GIL，界面线程不必等到解释器的切换间隔"""
+        time.sleep(0)
+        return self.cancel_event.is_set()
+
+    def run(self):
+        # 只影响操作系统对线程的调度，解析持有GIL时界面线程同样要等待，
+        # 界面的响应依靠用户操作时及时取消（见 _yield_check）
+        QThread.currentThread().setPriority(QThread.LowestPriority)
+        try:
+            entry = self._prefetch()
+            if entry is not None and not self.cancel_event.is_set():
+                if self.store.put(self.file_path, entry):
+                    log.debug(f"已预取: {self.file_path}, 约 {entry.size // 1024} KB")
+        except LoadCancelled:
+            pass
+        except Exception as e:
+            log.warning(f"预取文档时出错: {self.file_path}, {e}")
+        finally:
+            self.signals.finished.emit(self)
+
+    def _prefetch(self):
+        file_stat = DocumentCache.stat(self.file_path)
+        if file_stat is None:
+            return None
+        file_ext = os.path.splitext(self.file_path)[1].lower()
+        cancel_check = self._yield_check
+        cache = self.document_cache
+
+        if file_ext == '.pdf':
+            # 只读取打开时先显示的几页：有缓存时从缓存逐页读取，没有时提取，
+            # 全部页面由打开后的后台任务提取
+            page_table = cache.get_pdf_page_table(self.file_path) if cache else None
+            pages = []
+            if page_table is not None:
+                for page_num in range(min(PDF_INITIAL_PAGES, len(page_table))):
+                    check_cancelled(cancel_check)
+                    text = cache.get_pdf_page(self.file_path, page_table, page_num)
+                    if text is None:
+                        break
+                    pages.append(text)
+            if not pages:
+                with open(self.file_path, 'rb') as file:
+                    reader = open_pdf_reader(file)
+                    for page_num in range(min(PDF_INITIAL_PAGES, len(reader.pages))):
+                        check_cancelled(cancel_check)
+                        pages.append(reader.pages[page_num].extract_text() or '')
+            return PrefetchedDocument(file_stat, 'pdf', pages, _text_size(pages))
+
+        if file_ext == '.md':
+            content = cache.get(self.file_path, 'markdown-body') if cache else None
+            if content is None:
+                check_cancelled(cancel_check)
+                content = self.document_reader.read_markdown_body(self.file_path, cancel_check)
+                check_cancelled(cancel_check)
+                if cache:
+                    cache.put(self.file_path, 'markdown-body', content, file_stat)
+            return PrefetchedDocument(file_stat, 'html', content, _text_size([content]))
+
+        if file_ext == '.txt':
+            if file_stat[0] >= self.store.limit:
+                # 放不进预取存储，也不必读取
+                return None
+            encoding = cache.get(self.file_path, 'encoding') if cache else None
+            if not encoding:
+                encoding = self.document_reader.detect_encoding(self.file_path)
+                if cache:
+                    cache.put(self.file_path, 'encoding', encoding, file_stat)
+            check_cancelled(cancel_check)
+            content = self.document_reader.read_document(self.file_path, cancel_check=cancel_check,
+                                                         encoding=encoding)
+            if content is None:
+                return None
+            return PrefetchedDocument(file_stat, 'text', content, _text_size([content]))
+        return None
+
+
+class Prefetcher(QObject):
+    """空闲时预取最近文档
+
+    不监听整个程序的事件，由主窗口在收到按键、滚动、切换文档等操作时调用 notify_activity()：
+    每次操作都取消正在进行的预取并重新计时，空闲 PREFETCH_IDLE_MS 后从被取消的文档继续。
+    """
+
+    def __init__(self, document_reader, document_cache, store, parent=None):
+        super().__init__(parent)
+        self.document_reader = document_reader
+        self.document_cache = document_cache
+        self.store = store
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+
+        self._queue = []
+        self._skip = None
+        self._task = None
+        # 已取消但还没结束的任务：线程池不持有Python对象，排队中的任务被回收后线程池会访问已释放的对象
+        self._cancelled_tasks = set()
+
+        self._signals = _PrefetchSignals(self)
+        self._signals.finished.connect(self._on_task_finished)
+
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.setInterval(PREFETCH_IDLE_MS)
+        self.idle_timer.timeout.connect(self._prefetch_next)
+
+    def start(self, file_paths, skip=None):
+        """
+        空闲时预取文档
+
+        Args:
+            file_paths (list): 按优先顺序排列的文档，只预取前 PREFETCH_DOCUMENTS 个
+            skip (callable): 参数为文件路径，返回True时不预取（如已经打开的文档）
+        """
+        self.stop()
+        self._queue = list(file_paths[:PREFETCH_DOCUMENTS])
+        self._skip = skip
+        if self._queue:
+            self.idle_timer.start()
+
+    @property
+    def active(self):
+        """是否还有文档等待或正在预取"""
+        return bool(self._queue) or self._task is not None
+
+    def stop(self):
+        """停止预取，已预取的内容保留"""
+        self._queue = []
+        self.idle_timer.stop()
+        if self._task is not None:
+            self._cancel_task()
+
+    def notify_activity(self):
+        """用户有操作：取消正在预取的文档，空闲后重新开始；预取已完成时什么也不做"""
+        if not self.active:
+            return
+        if self._task is not None:
+            self._queue.insert(0, self._task.file_path)
+            self._cancel_task()
+        self.idle_timer.start()
+
+    def _cancel_task(self):
+        """取消当前任务，保留引用直到它发出 finished"""
+        self._task.cancel()
+        self._cancelled_tasks.add(self._task)
+        self._task = None
+
+    def _prefetch_next(self):
+        if self._task is not None:
+            return
+        while self._queue:
+            file_path = self._queue.pop(0)
+            if self._skip and self._skip(file_path):
+                continue
+            if self.store.contains(file_path, DocumentCache.stat(file_path)):
+                continue
+            self._task = _PrefetchTask(file_path, self.document_reader, self.document_cache,
+                                       self.store, self._signals)
+            self.thread_pool.start(self._task)
+            return
+        self.stop()
+
+    def _on_task_finished(self, task):
+        if task is not self._task:
+            # 已因用户操作取消的任务
+            self._cancelled_tasks.discard(task)
+            return
+        self._task = None
+        if not self.idle_timer.isActive():
+            # 期间没有用户操作，继续下一个
+            self._prefetch_next()
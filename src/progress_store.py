@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阅读进度存储模块
+阅读进度保存在SQLite数据库中，以文件路径的哈希为主键，按键查找和更新单条记录，
+不再每次读写整个进度文件
+
+阅读进度记录的是可视区域顶部的位置（锚点）：
+    position  字符位置，虚拟视图中为行号
+    block     文本块（段落）序号，虚拟视图中为行号，-1表示未知
+    offset    在文本块中的字符偏移
+    fraction  滚动条的相对位置，0-1，文档内容改变、锚点失效时使用
+"""
+
+import configparser
+import hashlib
+import os
+import sqlite3
+import time
+from collections import namedtuple
+
+from PyQt5.QtCore import QObject
+from persistence import WriteCoalescer
+from debug_log import get_logger
+
+log = get_logger('settings')
+
+# 数据库结构版本，保存在 PRAGMA user_version 中
+# 1: 字符位置  2: 增加文本块锚点和相对位置
+PROGRESS_SCHEMA_VERSION = 2
+
+ReadingAnchor = namedtuple('ReadingAnchor', ['position', 'block', 'offset', 'fraction'])
+
+
+def path_hash(file_path):
+    """进度记录的主键，与旧的 progress.ini 中的键相同"""
+    return hashlib.md5(file_path.encode()).hexdigest()
+
+
+class ProgressStore(QObject):
+    """阅读进度存储
+
+    读取过的进度缓存在内存中，重复查找不访问数据库。保存时位置与上次相同则直接跳过，
+    改变了的进度先放在待写入列表中，由写入合并器稍后在一次事务中批量写入。
+    数据库使用WAL日志，程序在写入过程中崩溃不会损坏已有的进度。
+    """
+
+    def __init__(self, db_file, legacy_file=None, write_coalescer=None, parent=None):
+        """
+        Args:
+            db_file (str): 数据库文件路径，第一次使用时创建
+            legacy_file (str): 旧的 progress.ini，创建数据库时导入其中的进度
+            write_coalescer (WriteCoalescer): 与其他存储共用的写入合并器，不指定时单独创建
+        """
+        super().__init__(parent)
+        self.db_file = db_file
+        self.legacy_file = legacy_file
+        self._connection = None
+        self._anchors = {}  # 路径哈希 -> 已写入数据库的锚点，None表示没有记录
+        self._pending = {}  # 路径哈希 -> (文件路径, 锚点)
+        self.write_coalescer = write_coalescer or WriteCoalescer(self)
+
+    def get(self, file_path):
+        """
+        获取阅读进度
+
+        Returns:
+            ReadingAnchor: 阅读位置，没有记录时返回None
+        """
+        key = path_hash(file_path)
+        pending = self._pending.get(key)
+        if pending is not None:
+            return pending[1]
+        if key not in self._anchors:
+            self._anchors[key] = self._query(key, file_path)
+        return self._anchors[key]
+
+    def save(self, file_path, anchor):
+        """保存阅读进度，与已保存的锚点相同时不做任何事"""
+        key = path_hash(file_path)
+        if key not in self._pending:
+            if key not in self._anchors:
+                self._anchors[key] = self._query(key, file_path)
+            if self._anchors[key] == anchor:
+                return
+        self._pending[key] = (file_path, anchor)
+        self.write_coalescer.schedule('progress', self.flush)
+
+    def file_paths(self):
+        """有阅读进度记录的所有文件路径，最近阅读的在前"""
+        paths = [file_path for file_path, _ in self._pending.values()]
+        try:
+            rows = self._connect().execute(
+                "SELECT file_path FROM progress ORDER BY updated DESC").fetchall()
+        except sqlite3.Error as e:
+            log.warning(f"获取阅读进度时出错: {e}")
+            rows = []
+        return list(dict.fromkeys(paths + [row[0] for row in rows]))
+
+    def flush(self):
+        """把待写入的进度写入数据库"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        now = time.time()
+        rows = [(key, file_path, *anchor, now) for key, (file_path, anchor) in pending.items()]
+        try:
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO progress "
+                    "(path_hash, file_path, position, block, block_offset, fraction, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            # 数据库被锁定或磁盘已满：放回待写入列表（不覆盖期间保存的更新的进度），稍后重试
+            log.warning(f"保存阅读进度时出错: {e}")
+            for key, entry in pending.items():
+                self._pending.setdefault(key, entry)
+            self.write_coalescer.schedule('progress', self.flush)
+            return
+        for key, (file_path, anchor) in pending.items():
+            self._anchors[key] = anchor
+
+    def close(self):
+        """写入待保存的进度（包括之前写入失败的）并关闭数据库"""
+        self.flush()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _query(self, key, file_path):
+        try:
+            row = self._connect().execute(
+                "SELECT file_path, position, block, block_offset, fraction "
+                "FROM progress WHERE path_hash = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            log.warning(f"获取阅读进度时出错: {e}")
+            return None
+        if row is None or row[0] != file_path:
+            return None
+        return ReadingAnchor(*row[1:])
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = self._open()
+        return self._connection
+
+    def _open(self):
+        """打开数据库，第一次创建时导入旧的进度文件"""
+        try:
+            connection = sqlite3.connect(self.db_file)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+        except sqlite3.Error as e:
+            # 数据库无法打开时本次运行的进度只保存在内存中
+            log.warning(f"打开阅读进度数据库时出错: {e}")
+            connection = sqlite3.connect(':memory:')
+
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version < PROGRESS_SCHEMA_VERSION:
+            with connection:
+                if version < 1:
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS progress ("
+                        "path_hash TEXT PRIMARY KEY, "
+                        "file_path TEXT NOT NULL, "
+                        "position INTEGER NOT NULL, "
+                        "updated REAL NOT NULL)")
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO progress (path_hash, file_path, position, updated) "
+                        "VALUES (?, ?, ?, ?)", self._legacy_rows())
+                if version < 2:
+                    connection.execute("ALTER TABLE progress ADD COLUMN block INTEGER NOT NULL DEFAULT -1")
+                    connection.execute("ALTER TABLE progress ADD COLUMN block_offset INTEGER NOT NULL DEFAULT 0")
+                    connection.execute("ALTER TABLE progress ADD COLUMN fraction REAL NOT NULL DEFAULT 0")
+                connection.execute(f"PRAGMA user_version = {PROGRESS_SCHEMA_VERSION}")
+        return connection
+
+    def _legacy_rows(self):
+        """读取旧的 progress.ini 中的进度，每项为 路径|位置"""
+        if not self.legacy_file or not os.path.exists(self.legacy_file):
+            return []
+        rows = []
+        now = time.time()
+        try:
+            config = configparser.ConfigParser()
+            config.read(self.legacy_file, encoding='utf-8')
+            if config.has_section('progress'):
+                for key, value in config.items('progress'):
+                    file_path, _, position = value.rpartition('|')
+                    if file_path and position.isdigit():
+                        rows.append((key, file_path, int(position), now))
+        except Exception as e:
+            log.warning(f"导入旧的阅读进度时出错: {e}")
+        log.info(f"从 {self.legacy_file} 导入 {len(rows)} 条阅读进度")
+        return rows
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全文搜索索引模块
+文档文本在后台建立倒排索引，搜索时只查找词项的位置列表，不再逐字扫描全文
+
+中日韩文字没有空格分词，连续的汉字按相邻两个字（二元组）建立索引，
+每段连续汉字的最后一个字另外单独索引，保证任何单字都能找到；
+其他文字按单词（字母数字序列，不区分大小写）建立索引。
+
+位置以UTF-16码元计，与QTextDocument中的位置一致（表情符号等辅助平面字符占两个位置）。
+"""
+
+import base64
+import bisect
+import json
+import re
+import zlib
+from array import array
+from collections import defaultdict
+from functools import lru_cache
+
+from document_reader import check_cancelled
+
+# 索引格式版本，格式或分词规则改变时增加，缓存中的旧索引随之失效
+SEARCH_INDEX_VERSION = 1
+
+# 单次搜索最多返回的结果数
+SEARCH_RESULT_LIMIT = 500
+
+# 建立索引时每处理这么多段文字检查一次是否取消
+_CANCEL_CHECK_INTERVAL = 65536
+
+# 按二元组索引的文字：中日韩统一表意文字及扩展A、兼容表意文字、日文假名、韩文音节
+_CJK_CHARS = '぀-ヿ㐀-䶿一-鿿豈-﫿가-힯'
+
+# 一段连续的中日韩文字，或一个其他文字的单词
+_TOKEN_PATTERN = f'[{_CJK_CHARS}]+|[^\\W_{_CJK_CHARS}]+'
+
+_CJK_RE = re.compile(f'[{_CJK_CHARS}]')
+
+# 辅助平面字符，在QTextDocument中占两个位置
+_ASTRAL_RE = re.compile('[\U00010000-\U0010ffff]')
+
+
+@lru_cache(maxsize=None)
+def _token_re():
+    """分词的正则表达式，编译要十几毫秒，第一次分词时才编译，不拖慢启动"""
+    return re.compile(_TOKEN_PATTERN)
+
+
+def utf16_len(text):
+    """文本在QTextDocument中占的位置数"""
+    return len(text) + len(_ASTRAL_RE.findall(text))
+
+
+def astral_indexes(text):
+    """文本中辅助平面字符的下标，字符下标与UTF-16位置之间的换算都依据它"""
+    return [match.start() for match in _ASTRAL_RE.finditer(text)]
+
+
+def _utf16_positions(text, positions):
+    """把文本中的字符下标转换为UTF-16位置"""
+    astral = astral_indexes(text)
+    if not astral:
+        return positions
+    return [position + bisect.bisect_left(astral, position) for position in positions]
+
+
+def _query_terms(query):
+    """
+    把搜索词切分为 (词项, 相对位置, 是否前缀匹配)
+
+    连续汉字只需要二元组就能确定位置；单个汉字和最后一个单词按前缀匹配，
+    输入到一半时也能找到结果。
+    """
+    terms = []
+    for match in _token_re().finditer(query):
+        run = match.group()
+        start = match.start()
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                terms.append((run, start, True))
+            for i in range(len(run) - 1):
+                terms.append((run[i:i + 2], start + i, False))
+        else:
+            terms.append((run.lower(), start, False))
+    offsets = _utf16_positions(query, [offset for _, offset, _ in terms])
+    terms = [(term, offset, prefix) for (term, _, prefix), offset in zip(terms, offsets)]
+    if terms and not _CJK_RE.match(terms[-1][0]):
+        word, offset, _ = terms[-1]
+        terms[-1] = (word, offset, True)
+    return terms
+
+
+class SearchIndex:
+    """文档的倒排索引
+
+    每个词项对应它在文档文本中出现的位置（字符偏移）的有序列表，
+    多个词项按相对位置求交集得到短语的位置。
+    所有位置列表按词项顺序首尾相接保存在一个数组中，恢复缓存时不需要逐个词项重建。
+    """
+
+    def __init__(self, terms, offsets, positions, text_length):
+        """
+        Args:
+            terms (list): 排好序的词项
+            offsets (array): 第i个词项的位置在 positions[offsets[i]:offsets[i + 1]] 中
+            positions (array): 所有词项的位置
+            text_length (int): 建立索引的文本长度
+        """
+        self._terms = terms
+        self._offsets = offsets
+        self._positions = positions
+        self.text_length = text_length
+
+    @classmethod
+    def build(cls, text, cancel_check=None):
+        """
+        为文本建立索引
+
+        Args:
+            text (str): 文档全文，位置与阅读区域中的文档位置一致
+            cancel_check (callable): 返回True时中止并抛出LoadCancelled
+        """
+        postings = defaultdict(list)
+        for count, match in enumerate(_token_re().finditer(text)):
+            if count % _CANCEL_CHECK_INTERVAL == 0:
+                check_cancelled(cancel_check)
+            run = match.group()
+            start = match.start()
+            if _CJK_RE.match(run):
+                # 相邻两个字组成的二元组，以及最后一个字
+                for position, term in enumerate(map(''.join, zip(run, run[1:])), start):
+                    postings[term].append(position)
+                postings[run[-1]].append(start + len(run) - 1)
+            else:
+                postings[run.lower()].append(start)
+
+        terms = sorted(postings)
+        check_cancelled(cancel_check)
+        offsets = array('I', [0])
+        positions = array('I')
+        for term in terms:
+            positions.extend(postings[term])
+            offsets.append(len(positions))
+        if _ASTRAL_RE.search(text):
+            positions = array('I', _utf16_positions(text, positions))
+        return cls(terms, offsets, positions, len(text))
+
+    @property
+    def term_count(self):
+        """词项数"""
+        return len(self._terms)
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        """
+        搜索
+
+        Args:
+            query (str): 搜索词，连续的汉字和单词按原有的相对位置匹配
+            limit (int): 最多返回的结果数
+
+        Returns:
+            list: 匹配开始的位置，按位置排列
+        """
+        terms = _query_terms(query)
+        if not terms:
+            return []
+
+        ranges = []
+        for term, offset, prefix in terms:
+            if prefix:
+                first, last = self._prefix_range(term)
+            else:
+                first = bisect.bisect_left(self._terms, term)
+                last = first + 1 if first < len(self._terms) and self._terms[first] == term else first
+            if first == last:
+                return []
+            ranges.append((first, last, offset))
+
+        # 从最少的位置出发，逐个检查其他词项在相应的相对位置上是否出现
+        ranges.sort(key=lambda item: self._offsets[item[1]] - self._offsets[item[0]])
+        first, last, base_offset = ranges[0]
+        results = []
+        for position in self._merged_positions(first, last):
+            start = position - base_offset
+            if start < 0:
+                continue
+            for other_first, other_last, offset in ranges[1:]:
+                if not self._contains(other_first, other_last, start + offset):
+                    break
+            else:
+                results.append(start)
+        results.sort()
+        return results[:limit]
+
+    def _prefix_range(self, prefix):
+        """以prefix开头的词项的范围 [first, last)"""
+        first = bisect.bisect_left(self._terms, prefix)
+        last = bisect.bisect_left(self._terms, prefix + '\U0010ffff', first)
+        return first, last
+
+    def _merged_positions(self, first, last):
+        """第first到last-1个词项的位置"""
+        return self._positions[self._offsets[first]:self._offsets[last]]
+
+    def _contains(self, first, last, target):
+        """第first到last-1个词项中是否有一个出现在target位置"""
+        positions = self._positions
+        for i in range(first, last):
+            lo, hi = self._offsets[i], self._offsets[i + 1]
+            j = bisect.bisect_left(positions, target, lo, hi)
+            if j < hi and positions[j] == target:
+                return True
+        return False
+
+    def dumps(self):
+        """序列化为字符串，保存在文档缓存中"""
+        payload = zlib.compress(self._offsets.tobytes() + self._positions.tobytes(), 6)
+        return json.dumps({
+            'version': SEARCH_INDEX_VERSION,
+            'length': self.text_length,
+            'terms': self._terms,
+            'data': base64.b64encode(payload).decode('ascii'),
+        }, ensure_ascii=False)
+
+    @classmethod
+    def loads(cls, content):
+        """
+        从 dumps() 的结果恢复索引
+
+        Returns:
+            SearchIndex: 格式版本不符或内容损坏时返回None
+        """
+        try:
+            data = json.loads(content)
+            if data.get('version') != SEARCH_INDEX_VERSION:
+                return None
+            terms = data['terms']
+            raw = array('I')
+            raw.frombytes(zlib.decompress(base64.b64decode(data['data'])))
+        except (ValueError, KeyError, TypeError, zlib.error):
+            return None
+        offsets = raw[:len(terms) + 1]
+        positions = raw[len(terms) + 1:]
+        if len(offsets) != len(terms) + 1 or offsets[-1] != len(positions):
+            return None
+        return cls(terms, offsets, positions, data['length'])
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+搜索面板模块
+在当前文档中全文搜索，使用后台建立的搜索索引，结果列表点击即可跳转
+"""
+
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtWidgets import (QApplication, QFrame, QHBoxLayout, QLabel, QLineEdit, QListWidget,
+                             QListWidgetItem, QPushButton, QVBoxLayout)
+
+from search_index import utf16_len
+
+# 输入停止多少毫秒后开始搜索
+SEARCH_DELAY_MS = 150
+
+# 结果列表中每项显示的上下文字数
+SNIPPET_BEFORE = 12
+SNIPPET_AFTER = 30
+
+
+class SearchPanel(QFrame):
+    """搜索面板
+
+    搜索本身只查索引，结果交给 verifier 按文档中的原文过滤，
+    上下文由 snippet_provider 从阅读区域中取得。
+    """
+
+    result_activated = pyqtSignal(int, int)  # 匹配在全文中的位置, 长度
+    closed = pyqtSignal()
+
+    def __init__(self, snippet_provider, verifier, parent=None):
+        """
+        Args:
+            snippet_provider (callable): (位置, 长度, 前文字数, 后文字数) -> 上下文文本，
+                该位置尚未显示时返回None
+            verifier (callable): (位置列表, 搜索词) -> 与原文一致的位置列表
+        """
+        super().__init__(parent)
+        self.snippet_provider = snippet_provider
+        self.verifier = verifier
+        self.index = None
+        self._message = ""
+        self._results = []
+        self._query_length = 0
+
+        self.setStyleSheet("""
+            QFrame {
+                background-color: rgba(240, 240, 240, 220);
+                border: 1px solid rgba(200, 200, 200, 100);
+                border-radius: 1px;
+            }
+            QLineEdit {
+                background-color: white;
+                padding: 2px 4px;
+            }
+            QLabel {
+                border: none;
+                background-color: transparent;
+                color: #333333;
+            }
+            QPushButton {
+                background-color: rgba(70, 130, 180, 150);
+                border: none;
+                border-radius: 2px;
+                color: white;
+                padding: 2px 6px;
+            }
+            QPushButton:hover {
+                background-color: rgba(70, 130, 180, 200);
+            }
+            QListWidget {
+                background-color: rgba(255, 255, 255, 200);
+            }
+            QListWidget::item:selected {
+                background-color: rgba(70, 130, 180, 150);
+                color: white;
+            }
+        """)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(3, 3, 3, 3)
+        layout.setSpacing(3)
+
+        row = QHBoxLayout()
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("在文档中查找...")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(self._on_text_changed)
+        self.search_edit.returnPressed.connect(self._on_return_pressed)
+        row.addWidget(self.search_edit)
+
+        self.count_label = QLabel()
+        row.addWidget(self.count_label)
+
+        previous_btn = QPushButton("↑")
+        previous_btn.setToolTip("上一个 (Shift+Enter)")
+        previous_btn.clicked.connect(self.previous_result)
+        row.addWidget(previous_btn)
+
+        next_btn = QPushButton("↓")
+        next_btn.setToolTip("下一个 (Enter)")
+        next_btn.clicked.connect(self.next_result)
+        row.addWidget(next_btn)
+
+        close_btn = QPushButton("×")
+        close_btn.setToolTip("关闭 (Esc)")
+        close_btn.clicked.connect(self.close_panel)
+        row.addWidget(close_btn)
+        layout.addLayout(row)
+
+        self.result_list = QListWidget()
+        self.result_list.setMaximumHeight(160)
+        self.result_list.currentRowChanged.connect(self._on_row_changed)
+        self.result_list.hide()
+        layout.addWidget(self.result_list)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(SEARCH_DELAY_MS)
+        self._timer.timeout.connect(self.search)
+
+    def open_panel(self):
+        """显示面板并选中搜索框中的文字"""
+        self.show()
+        self.search_edit.setFocus()
+        self.search_edit.selectAll()
+
+    def close_panel(self):
+        """隐藏面板"""
+        self.hide()
+        self.closed.emit()
+
+    def set_index(self, index, message=""):
+        """
+        设置当前文档的搜索索引
+
+        Args:
+            index (SearchIndex): 索引，尚未建立或不支持搜索时为None
+            message (str): 没有索引时显示的说明
+        """
+        self.index = index
+        self._message = message
+        if self.isVisible() and self.search_edit.text():
+            self.search()
+        else:
+            self._show_results([])
+
+    def search(self):
+        """按搜索框中的文字搜索"""
+        self._timer.stop()
+        query = self.search_edit.text()
+        if not query.strip():
+            self._show_results([])
+            return
+        if self.index is None:
+            self._show_results([])
+            self.count_label.setText(self._message)
+            return
+        self._query_length = utf16_len(query)
+        self._show_results(self.verifier(self.index.search(query), query))
+
+    def next_result(self):
+        """跳到下一个结果"""
+        if self._timer.isActive():
+            self.search()
+        if self._results:
+            self.result_list.setCurrentRow((self.result_list.currentRow() + 1) % len(self._results))
+
+    def previous_result(self):
+        """跳到上一个结果"""
+        if self._results:
+            self.result_list.setCurrentRow((self.result_list.currentRow() - 1) % len(self._results))
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Escape:
+            self.close_panel()
+        else:
+            super().keyPressEvent(event)
+
+    def _on_return_pressed(self):
+        if QApplication.keyboardModifiers() & Qt.ShiftModifier:
+            self.previous_result()
+        else:
+            self.next_result()
+
+    def _on_text_changed(self, text):
+        self._timer.start()
+
+    def _show_results(self, results):
+        self._results = results
+        self.result_list.blockSignals(True)
+        self.result_list.clear()
+        for number, position in enumerate(results, 1):
+            snippet = self.snippet_provider(position, self._query_length,
+                                            SNIPPET_BEFORE, SNIPPET_AFTER)
+            if snippet is None:
+                snippet = f"位置 {position}（尚未显示）"
+            item = QListWidgetItem(f"{number}. {snippet}")
+            item.setData(Qt.UserRole, position)
+            self.result_list.addItem(item)
+        self.result_list.blockSignals(False)
+        self.result_list.setVisible(bool(results))
+
+        if results:
+            self.count_label.setText(f"共 {len(results)} 处")
+        elif self.search_edit.text().strip():
+            self.count_label.setText("无结果")
+        else:
+            self.count_label.setText("")
+
+    def _on_row_changed(self, row):
+        if 0 <= row < len(self._results):
+            self.result_activated.emit(self._results[row], self._query_length)
@@ -3,59 +3,159 @@
 """
 设置管理器模块
 负责应用设置的保存和加载
+
+设置只在第一次使用时从磁盘读取一次，之后保存在内存中。修改设置只更新内存并发出
+settings_changed 信号，设置和阅读进度的写入由同一个写入合并器延迟合并，
+配置文件在后台线程中原子地替换。
 """
 
+import io
 import os
 import configparser
-from PyQt5.QtCore import QObject
+import threading
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from persistence import WriteCoalescer, atomic_write
+from progress_store import ProgressStore
+from debug_log import get_logger
+
+log = get_logger('settings')
+
+
+class _WriteSettingsTask(QRunnable):
+    """在后台把最新的设置写入配置文件"""
+
+    def __init__(self, manager):
+        super().__init__()
+        self.manager = manager
+
+    def run(self):
+        self.manager._write_pending()
+
 
 class SettingsManager(QObject):
     """设置管理器类"""
+
+    settings_changed = pyqtSignal(dict)  # 改变了的设置项 -> 新值
     
     def __init__(self):
         super().__init__()
         self.config_dir = "config"
         self.config_file = os.path.join(self.config_dir, "settings.ini")
-        self.progress_file = os.path.join(self.config_dir, "progress.ini")
+        self.progress_file = os.path.join(self.config_dir, "progress.ini")  # 旧版本的进度文件
         
         # 确保配置目录存在
         os.makedirs(self.config_dir, exist_ok=True)
+
+        # 设置和阅读进度共用的写入合并器，短时间内的多次保存一起写入
+        self.write_coalescer = WriteCoalescer(self)
+
+        # 阅读进度数据库，第一次使用时导入旧的进度文件
+        self.progress_store = ProgressStore(os.path.join(self.config_dir, "progress.db"),
+                                            self.progress_file, self.write_coalescer, self)
         
-        # 默认设置
+        # 默认设置，值的类型决定读取时的类型转换
         self.default_settings = {
             'window': {
-                'opacity': '1.0',
-                'width': '1000',
-                'height': '700',
-                'x': '100',
-                'y': '100',
-                'stay_on_top': 'False',
-                'maximized': 'False'
+                'opacity': 1.0,
+                'width': 1000,
+                'height': 700,
+                'x': 100,
+                'y': 100,
+                'stay_on_top': False,
+                'maximized': False
             },
             'appearance': {
                 'font_family': 'Microsoft YaHei',
-                'font_size': '12',
+                'font_size': 12,
                 'bg_color': '#ffffff',
                 'text_color': '#000000',
                 'theme': 'light'
             },
             'minimal_mode': {
-                'minimal_ui_opacity': '20',        # 极简模式UI透明度 (0-100%)
-                'minimal_text_opacity': '80'       # 极简模式文字透明度 (0-100%)
+                'minimal_ui_opacity': 20,          # 极简模式UI透明度 (0-100%)
+                'minimal_text_opacity': 80         # 极简模式文字透明度 (0-100%)
             },
             'behavior': {
-                'auto_save_progress': 'True',
-                'show_page_numbers': 'True',
-                'remember_window_position': 'True',
+                'auto_save_progress': True,
+                'show_page_numbers': True,
+                'remember_window_position': True,
+                'live_reload': True,               # Markdown文件改变后自动重新加载
                 'boss_key': 'Ctrl+Shift+H'
             },
             'recent': {
-                'max_recent_files': '10'
+                'max_recent_files': 10
             }
         }
+
+        # 内存中的设置，第一次使用时从磁盘读取
+        self._settings = None
+        self._dirty = False
+
+        # 在后台写回磁盘
+        self._write_pool = QThreadPool(self)
+        self._write_pool.setMaxThreadCount(1)
+        self._write_lock = threading.Lock()  # 同一时间只有一次写入，保证后写入的是较新的设置
+        self._pending_text = None
         
     def load_settings(self):
-        """加载设置"""
+        """
+        获取全部设置
+
+        Returns:
+            dict: 设置的副本，修改它不会影响已保存的设置，需要调用 save_settings()
+        """
+        settings = dict(self._ensure_loaded())
+        settings['recent_files'] = list(settings['recent_files'])
+        return settings
+
+    def get(self, key, default=None):
+        """获取单个设置项"""
+        return self._ensure_loaded().get(key, default)
+
+    def save_settings(self, settings):
+        """
+        更新设置，只修改给出的设置项
+
+        Args:
+            settings (dict): 设置项 -> 新值，window_geometry 为 [x, y, 宽, 高]，
+                不属于任何配置段的键被忽略
+        """
+        current = self._ensure_loaded()
+        updates = {}
+        for key, value in settings.items():
+            if key == 'window_geometry':
+                for name, item in zip(('x', 'y', 'width', 'height'), value):
+                    updates[name] = int(item)
+            elif key == 'recent_files':
+                updates[key] = list(value)
+            else:
+                section = self._get_section_for_key(key)
+                if section:
+                    updates[key] = self._convert_value(value, self.default_settings[section][key])
+
+        changed = {key: value for key, value in updates.items() if current.get(key) != value}
+        if not changed:
+            return
+        current.update(changed)
+        self._dirty = True
+        self.write_coalescer.schedule('settings', self._schedule_write)
+        self.settings_changed.emit(changed)
+
+    def flush(self):
+        """立即把未写入的设置和阅读进度写回磁盘（程序退出时调用）"""
+        self.write_coalescer.flush()
+        # 等待后台写入完成，或者在这里直接写入尚未开始的部分
+        self._write_pending()
+        # 关闭进度数据库，之前写入失败、仍在等待重试的进度在关闭前再写入一次
+        self.progress_store.close()
+
+    def _ensure_loaded(self):
+        if self._settings is None:
+            self._settings = self._read_settings()
+        return self._settings
+
+    def _read_settings(self):
+        """从配置文件读取设置"""
         config = configparser.ConfigParser()
         
         # 如果配置文件不存在，创建默认配置
@@ -96,105 +196,63 @@ class SettingsManager(QObject):
             return settings
             
         except Exception as e:
-            print(f"加载设置时出错: {e}")
+            log.warning(f"加载设置时出错: {e}")
             return self._get_default_settings_dict()
+
+    def _serialize(self):
+        """把内存中的设置转换为配置文件的内容"""
+        config = configparser.ConfigParser()
+        for section_name, section_data in self.default_settings.items():
+            config.add_section(section_name)
+            for key in section_data:
+                config.set(section_name, key, str(self._settings[key]))
+
+        # 保存最近文档
+        config.add_section('recent_files')
+        for i, file_path in enumerate(self._settings['recent_files']):
+            config.set('recent_files', f'file_{i}', file_path)
+
+        buffer = io.StringIO()
+        config.write(buffer)
+        return buffer.getvalue()
+
+    def _schedule_write(self):
+        """把当前设置交给后台线程写入"""
+        if not self._dirty:
+            return
+        with self._write_lock:
+            self._pending_text = self._serialize()
+        self._dirty = False
+        self._write_pool.start(_WriteSettingsTask(self))
+
+    def _write_pending(self):
+        """写入最近一次序列化的设置，已被其他写入处理时不做任何事"""
+        with self._write_lock:
+            text = self._pending_text
+            self._pending_text = None
+            if text is None:
+                return
+            try:
+                atomic_write(self.config_file, text)
+            except Exception as e:
+                log.warning(f"保存设置时出错: {e}")
             
-    def save_settings(self, settings):
-        """保存设置"""
-        try:
-            config = configparser.ConfigParser()
-            
-            # 创建各个段
-            for section_name in self.default_settings:
-                config.add_section(section_name)
-                
-            # 保存窗口设置
-            if 'window_geometry' in settings:
-                geometry = settings['window_geometry']
-                config.set('window', 'x', str(geometry[0]))
-                config.set('window', 'y', str(geometry[1]))
-                config.set('window', 'width', str(geometry[2]))
-                config.set('window', 'height', str(geometry[3]))
-                
-            # 保存其他设置
-            for key, value in settings.items():
-                if key == 'recent_files':
-                    continue
-                elif key == 'window_geometry':
-                    continue
-                else:
-                    # 根据键名确定要保存到哪个段
-                    section = self._get_section_for_key(key)
-                    if section:
-                        config.set(section, key, str(value))
-                        
-            # 保存最近文档
-            if 'recent_files' in settings:
-                if not config.has_section('recent_files'):
-                    config.add_section('recent_files')
-                    
-                recent_files = settings['recent_files']
-                for i, file_path in enumerate(recent_files):
-                    config.set('recent_files', f'file_{i}', file_path)
-                    
-            # 写入文件
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                config.write(f)
-                
-        except Exception as e:
-            print(f"保存设置时出错: {e}")
-            
-    def save_reading_progress(self, file_path, position):
-        """保存阅读进度"""
-        try:
-            config = configparser.ConfigParser()
-            
-            # 读取现有进度文件
-            if os.path.exists(self.progress_file):
-                config.read(self.progress_file, encoding='utf-8')
-                
-            # 确保有progress段
-            if not config.has_section('progress'):
-                config.add_section('progress')
-                
-            # 保存进度（使用文件路径的hash作为键）
-            import hashlib
-            file_hash = hashlib.md5(file_path.encode()).hexdigest()
-            config.set('progress', file_hash, f"{file_path}|{position}")
-            
-            # 写入文件
-            with open(self.progress_file, 'w', encoding='utf-8') as f:
-                config.write(f)
-                
-        except Exception as e:
-            print(f"保存阅读进度时出错: {e}")
+    def save_reading_progress(self, file_path, anchor):
+        """保存阅读进度（ReadingAnchor），稍后批量写入进度数据库"""
+        self.progress_store.save(file_path, anchor)
             
+    def get_reading_progress(self, file_path):
+        """获取阅读进度，没有记录时返回None"""
+        return self.progress_store.get(file_path)
+
+    def get_progress_files(self):
+        """有阅读进度记录的所有文件，最近阅读的在前"""
+        return self.progress_store.file_paths()
+
     def get_reading_position(self, file_path):
-        """获取阅读进度"""
-        try:
-            if not os.path.exists(self.progress_file):
-                return 0
-                
-            config = configparser.ConfigParser()
-            config.read(self.progress_file, encoding='utf-8')
-            
-            if not config.has_section('progress'):
-                return 0
-                
-            import hashlib
-            file_hash = hashlib.md5(file_path.encode()).hexdigest()
-            
-            if config.has_option('progress', file_hash):
-                progress_data = config.get('progress', file_hash)
-                parts = progress_data.split('|')
-                if len(parts) == 2 and parts[0] == file_path:
-                    return int(parts[1])
-                    
-            return 0
-            
-        except Exception as e:
-            print(f"获取阅读进度时出错: {e}")
-            return 0
+        """获取阅读进度的字符位置，没有记录时返回0"""
+        anchor = self.progress_store.get(file_path)
+        return anchor.position if anchor else 0
             
     def _create_default_config(self):
         """创建默认配置文件"""
@@ -207,8 +265,9 @@ class SettingsManager(QObject):
                 config.set(section_name, key, str(value))
                 
         # 写入文件
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            config.write(f)
+        buffer = io.StringIO()
+        config.write(buffer)
+        atomic_write(self.config_file, buffer.getvalue())
             
     def _get_default_settings_dict(self):
         """获取默认设置字典"""
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单实例模块
+第一个启动的实例在本地套接字（Windows上为命名管道）上监听；之后启动的实例连接它，
+把命令行中的文档路径转发过去后直接退出，由已在运行的实例在后台加载，
+从资源管理器打开文档时不必再冷启动一个进程。
+"""
+
+import hashlib
+import json
+import os
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtNetwork import QAbstractSocket, QLocalServer, QLocalSocket
+
+from debug_log import get_logger
+
+log = get_logger('init')
+
+# 连接已运行实例、发送路径的超时（毫秒）
+FORWARD_TIMEOUT_MS = 1000
+
+
+def _server_name():
+    """监听的名称，按用户区分，不同用户各自运行一个实例"""
+    home = os.path.expanduser('~')
+    return "thief-reader-" + hashlib.sha1(home.encode('utf-8')).hexdigest()[:12]
+
+
+class SingleInstance(QObject):
+    """单实例管理
+
+    消息是一行UTF-8编码的JSON：{"files": [文档的绝对路径, ...]}，
+    路径为空表示只是再次启动了程序，已运行的实例显示窗口即可。
+    """
+
+    # 收到其他实例转发的文档路径（可能为空列表）
+    files_received = pyqtSignal(list)
+
+    def __init__(self, server_name=None, parent=None):
+        super().__init__(parent)
+        self.server_name = server_name or _server_name()
+        self.server = None
+        self._buffers = {}  # 连接 -> 已收到的数据
+
+    def start(self, file_paths):
+        """
+        成为唯一的实例，或把文档路径转发给已运行的实例
+
+        Args:
+            file_paths (list): 本次启动要打开的文档
+
+        Returns:
+            bool: 成为唯一实例时返回True；已转发给其他实例时返回False，调用者应退出
+        """
+        if self._forward(file_paths):
+            return False
+
+        server = QLocalServer(self)
+        server.setSocketOptions(QLocalServer.UserAccessOption)
+        if not server.listen(self.server_name):
+            if server.serverError() == QAbstractSocket.AddressInUseError:
+                # 两个实例几乎同时启动，另一个刚开始监听
+                if self._forward(file_paths):
+                    return False
+                # 上次异常退出留下的套接字文件
+                QLocalServer.removeServer(self.server_name)
+            if not server.listen(self.server_name):
+                log.warning(f"无法监听单实例通道: {server.errorString()}")
+                return True
+        server.newConnection.connect(self._on_new_connection)
+        self.server = server
+        return True
+
+    def close(self):
+        """停止监听（程序退出时调用）"""
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+    def _forward(self, file_paths):
+        """连接已运行的实例并发送路径，没有实例在运行时返回False"""
+        socket = QLocalSocket()
+        socket.connectToServer(self.server_name)
+        if not socket.waitForConnected(FORWARD_TIMEOUT_MS):
+            return False
+        message = json.dumps({'files': file_paths}, ensure_ascii=False) + '\n'
+        socket.write(message.encode('utf-8'))
+        if not socket.waitForBytesWritten(FORWARD_TIMEOUT_MS):
+            log.warning(f"转发文档路径时出错: {socket.errorString()}")
+        socket.disconnectFromServer()
+        if socket.state() != QLocalSocket.UnconnectedState:
+            socket.waitForDisconnected(FORWARD_TIMEOUT_MS)
+        return True
+
+    def _on_new_connection(self):
+        while self.server is not None and self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self._buffers[socket] = b''
+            socket.readyRead.connect(lambda socket=socket: self._on_ready_read(socket))
+            socket.disconnected.connect(lambda socket=socket: self._on_disconnected(socket))
+            # 数据可能在连接建立时就已经到达
+            self._on_ready_read(socket)
+
+    def _on_ready_read(self, socket):
+        # 断开后设备已关闭，再读取Qt会输出警告
+        if socket not in self._buffers or socket.bytesAvailable() <= 0:
+            return
+        self._buffers[socket] += bytes(socket.readAll())
+        data, separator, rest = self._buffers[socket].partition(b'\n')
+        if not separator:
+            return
+        self._buffers[socket] = rest
+        try:
+            file_paths = json.loads(data.decode('utf-8')).get('files', [])
+        except (ValueError, AttributeError) as e:
+            log.warning(f"解析转发的消息时出错: {e}")
+            return
+        self.files_received.emit([path for path in file_paths if isinstance(path, str)])
+
+    def _on_disconnected(self, socket):
+        self._on_ready_read(socket)
+        self._buffers.pop(socket, None)
+        socket.deleteLater()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分块插入模块
+把大文本分成多块，在多次事件循环中插入阅读区域，先显示可视区域附近的内容
+"""
+
+import bisect
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from PyQt5.QtGui import QTextCursor
+
+from search_index import astral_indexes
+
+# 每次事件循环插入的字符数，插入的同时Qt会完成这部分的排版，块太大会造成卡顿
+INSERT_CHUNK_SIZE = 64 * 1024
+
+# 补齐开头之前先向后追加的块数，保证可以继续往下读
+INSERT_LOOKAHEAD_CHUNKS = 4
+
+
+class ChunkedTextInserter(QObject):
+    """分块文本插入器
+
+    首先只显示阅读位置所在的一块文本，然后向后追加几块；
+    接着从文档开头起按顺序补齐阅读位置之前的内容，补齐时保持可视区域不动；
+    最后追加剩余部分。
+    在文档中间插入的开销与插入点之后的内容长度有关，
+    因此开头部分总是在剩余部分追加之前补齐。
+
+    对外的位置都是完整文档中的位置，与QTextDocument一样按UTF-16码元计数
+    （辅助平面字符占两个位置）；内部记录原文的字符下标，用于切分文本。
+    """
+
+    progress = pyqtSignal(int, int)  # 已插入字符数, 总字符数
+    finished = pyqtSignal()
+
+    def __init__(self, text_edit, chunk_size=INSERT_CHUNK_SIZE, parent=None):
+        super().__init__(parent)
+        self.text_edit = text_edit
+        self.chunk_size = chunk_size
+        self._text = ''
+        self._head_end = 0     # 首块在原文中的起始下标，之前的内容需要补齐
+        self._head_filled = 0  # 开头部分已补齐到原文中的下标
+        self._gap = 0          # 开头部分下一块在文档中的插入位置
+        self._tail = 0         # 已插入部分在原文中的结束下标
+        self._astral = []      # 原文中辅助平面字符的下标
+        self._astral_positions = []  # 这些字符在完整文档中的位置
+        self._lookahead = 0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._insert_next)
+
+    @property
+    def active(self):
+        """是否正在插入"""
+        return self._timer.isActive()
+
+    @property
+    def offset(self):
+        """开头部分尚未补齐的位置数，补齐之前文档位置需要加上这个偏移"""
+        return self._position(self._head_end) - self._position(self._head_filled)
+
+    @property
+    def block_offset(self):
+        """开头部分尚未补齐的行数，补齐之前文本块序号需要加上这个偏移"""
+        if self._head_filled >= self._head_end:
+            return 0
+        return self._text.count('\n', self._head_filled, self._head_end)
+
+    def document_position(self, position):
+        """
+        完整文档中的位置在阅读区域文档中的位置
+
+        Returns:
+            int: 文档位置，该位置的内容尚未插入时返回None
+        """
+        if not self._text or position < self._position(self._head_filled):
+            return position
+        if self._position(self._head_end) <= position < self._position(self._tail):
+            return position - self.offset
+        return None
+
+    def source_position(self, position):
+        """阅读区域文档中的位置在完整文档中的位置（document_position 的逆运算）"""
+        if not self._text or position < self._gap:
+            # 已补齐的开头部分与原文一致
+            return position
+        return position + self.offset
+
+    def source_block(self, block_position, block_number):
+        """
+        阅读区域文档中的文本块在原文中的序号
+
+        Args:
+            block_position (int): 文本块在文档中的起始位置
+            block_number (int): 文本块在文档中的序号
+        """
+        if not self._text or block_position < self._gap:
+            return block_number
+        return block_number + self.block_offset
+
+    def start(self, text, position=0):
+        """
+        开始分块插入
+
+        Args:
+            text (str): 完整文本
+            position (int): 阅读位置（完整文档中的位置），先显示这个位置所在的块并把这一行滚动到顶部
+        """
+        self.stop()
+        self._text = text
+        self._astral = astral_indexes(text)
+        self._astral_positions = [index + count for count, index in enumerate(self._astral)]
+        index = max(0, min(self._index(position), len(text)))
+        position = self._position(index)
+
+        # 首块从阅读位置所在行的开头开始
+        self._head_end = text.rfind('\n', 0, index) + 1
+        self._head_filled = 0
+        self._gap = 0
+        self._tail = self._chunk_end(self._head_end)
+        self._lookahead = INSERT_LOOKAHEAD_CHUNKS
+        self.text_edit.setPlainText(text[self._head_end:self._tail])
+
+        cursor = self.text_edit.textCursor()
+        cursor.setPosition(position - self._position(self._head_end))
+        self.text_edit.setTextCursor(cursor)
+        bar = self.text_edit.verticalScrollBar()
+        bar.setValue(bar.value() + self.text_edit.cursorRect().top())
+
+        self._report_progress()
+        self._schedule()
+
+    def stop(self):
+        """停止插入，已插入的内容保留"""
+        self._timer.stop()
+        self._text = ''
+        self._head_end = 0
+        self._head_filled = 0
+        self._gap = 0
+        self._tail = 0
+        self._astral = []
+        self._astral_positions = []
+
+    def _position(self, index):
+        """原文中的字符下标在完整文档中的位置"""
+        return index + bisect.bisect_left(self._astral, index)
+
+    def _index(self, position):
+        """完整文档中的位置在原文中的字符下标（_position 的逆运算）"""
+        return position - bisect.bisect_left(self._astral_positions, position)
+
+    def _schedule(self):
+        if self._head_filled < self._head_end or self._tail < len(self._text):
+            self._timer.start(0)
+        else:
+            self._text = ''
+            self.finished.emit()
+
+    def _chunk_end(self, start, limit=None):
+        """块的结束位置，尽量落在换行符之后"""
+        limit = len(self._text) if limit is None else limit
+        end = min(start + self.chunk_size, limit)
+        if end < limit:
+            newline = self._text.find('\n', end, limit)
+            if newline != -1 and newline - end < self.chunk_size:
+                end = newline + 1
+        return end
+
+    def _insert_next(self):
+        if self._tail < len(self._text) and (self._lookahead > 0 or self._head_filled >= self._head_end):
+            self._append_tail()
+            self._lookahead -= 1
+        else:
+            self._fill_head()
+        self._report_progress()
+        self._schedule()
+
+    def _append_tail(self):
+        """向后追加，不影响滚动位置"""
+        end = self._chunk_end(self._tail)
+        cursor = QTextCursor(self.text_edit.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(self._text[self._tail:end])
+        self._tail = end
+
+    def _fill_head(self):
+        """在可视区域之前插入，插入后按新增的高度修正滚动位置"""
+        end = self._chunk_end(self._head_filled, self._head_end)
+        document = self.text_edit.document()
+
+        # 插入点处的标记光标会随插入后移，它的纵向位移就是新增内容的高度
+        marker = QTextCursor(document)
+        marker.setPosition(self._gap)
+        marker_y = self.text_edit.cursorRect(marker).top()
+
+        cursor = QTextCursor(document)
+        cursor.setPosition(self._gap)
+        cursor.insertText(self._text[self._head_filled:end])
+        self._gap = cursor.position()
+        self._head_filled = end
+
+        bar = self.text_edit.verticalScrollBar()
+        bar.setValue(bar.value() + self.text_edit.cursorRect(marker).top() - marker_y)
+
+    def _report_progress(self):
+        inserted = self._head_filled + self._tail - self._head_end
+        self.progress.emit(inserted, len(self._text))
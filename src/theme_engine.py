@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+样式表模块
+阅读区域等控件的样式表按 (模式, 字体, 字号, 透明度) 生成一次后缓存，
+只有内容真正改变时才调用 setStyleSheet，避免Qt重新解析样式表并刷新整个子控件树
+"""
+
+from string import Template
+
+# 状态栏样式，窗口大小和状态变化时不再重复设置
+STATUS_BAR_STYLE = """
+    QStatusBar {
+        background-color: rgba(240, 240, 240, 255);
+        border-top: 1px solid rgba(200, 200, 200, 100);  /* 进一步优化：减小边框透明度 */
+        border-radius: 0 0 1px 1px;  /* 进一步优化：减小圆角到1px */
+        padding: 1px;  # 进一步优化：减小内边距
+        height: 18px;  # 进一步优化：减小高度
+        color: #333333;
+        font-size: 10px;  # 进一步优化：减小字体大小
+    }
+"""
+
+# 极简模式下的中央部件 - 移除所有边框和圆角
+MINIMAL_CENTRAL_STYLE = """
+    QWidget {
+        background-color: transparent;
+        border: none;
+        border-radius: 0px;
+    }
+"""
+
+# 退出极简模式后的中央部件 - 完全不透明
+NORMAL_CENTRAL_STYLE = """
+    QWidget {
+        background-color: rgba(255, 255, 255, 255);  /* 完全不透明 */
+        border-radius: 2px;  /* 进一步优化：匹配主窗口圆角 */
+    }
+"""
+
+# 标题栏 - 完全不透明
+TITLE_BAR_STYLE = """
+    QWidget {
+        background-color: rgba(70, 130, 180, 255);  /* 完全不透明 */
+        border-radius: 1px 1px 0 0;  /* 进一步优化：减小圆角到1px */
+    }
+"""
+
+# 菜单容器 - 完全不透明
+MENU_CONTAINER_STYLE = """
+    QWidget {
+        background-color: rgba(240, 240, 240, 255);  /* 完全不透明 */
+        border-radius: 0px;
+    }
+"""
+
+# 阅读面板容器
+READING_PANEL_STYLE = """
+    QFrame {
+        background-color: rgba(255, 255, 255, 0);
+        border: none;
+    }
+"""
+
+# 阅读区域样式模板，键为模式：
+#   compact      启动时和退出极简模式后的样式
+#   normal       普通模式下应用设置后的样式
+#   minimal      刚进入极简模式时的样式
+#   translucent  极简模式下按界面和文字透明度应用设置后的样式
+READING_AREA_TEMPLATES = {
+    'compact': Template("""
+        QTextEdit {
+            background-color: rgba(255, 255, 255, 255);  /* 完全不透明 */
+            border: 1px solid rgba(200, 200, 200, 100);  /* 进一步优化：减小边框透明度 */
+            border-radius: 1px;  /* 进一步优化：减小圆角到1px */
+            padding: 10px;  # 进一步优化：减小内边距
+            font-family: '$font_family';
+            font-size: ${font_size}px;
+            color: #333333;
+        }
+        QScrollBar:vertical {
+            background-color: rgba(240, 240, 240, 150);  /* 进一步优化：调整透明度 */
+            width: 8px;  /* 进一步优化：减小滚动条宽度到8px */
+            border-radius: 4px;  /* 调整圆角以匹配新宽度 */
+        }
+        QScrollBar::handle:vertical {
+            background-color: rgba(180, 180, 180, 150);  /* 进一步优化：调整透明度 */
+            border-radius: 4px;  /* 调整圆角以匹配新宽度 */
+            min-height: 15px;  # 调整最小高度
+        }
+        QScrollBar:horizontal {
+            height: 0px;
+        }
+    """),
+    'normal': Template("""
+        QTextEdit {
+            background-color: rgba(255, 255, 255, 220);
+            border: 1px solid rgba(200, 200, 200, 100);
+            border-radius: 8px;
+            padding: 15px;
+            font-family: '$font_family';
+            font-size: ${font_size}px;
+            color: #333333;
+        }
+        QScrollBar:vertical {
+            background-color: rgba(240, 240, 240, 150);
+            width: 12px;
+            border-radius: 6px;
+        }
+        QScrollBar::handle:vertical {
+            background-color: rgba(180, 180, 180, 200);
+            border-radius: 6px;
+            min-height: 20px;
+        }
+        QScrollBar:horizontal {
+            height: 0px;
+        }
+    """),
+    'minimal': Template("""
+        QTextEdit {
+            background-color: rgba(255, 255, 255, 200);
+            border: none;
+            border-radius: 0px;
+            padding: 5px;
+            font-family: '$font_family';
+            font-size: ${font_size}px;
+            color: #333333;
+        }
+        /* 修改垂直滚动条 */
+        QTextEdit QScrollBar:vertical {
+            width: 8px;                /* 滚动条宽度 */
+            background: transparent;
+            border-radius: 4px;
+        }
+        QTextEdit QScrollBar::handle:vertical {
+            background: #a0a0a0;       /* 滑块颜色 */
+            border-radius: 4px;
+            min-height: 20px;
+        }
+        QTextEdit QScrollBar::handle:vertical:hover {
+            background: #707070;       /* 鼠标悬停时颜色 */
+        }
+        /* 可选：隐藏滚动条边框和箭头按钮 */
+        QTextEdit QScrollBar::add-line:vertical,
+        QTextEdit QScrollBar::sub-line:vertical {
+            height: 0px;
+            background: none;
+        }
+    """),
+    'translucent': Template("""
+        QTextEdit {
+            background-color: rgba(255, 255, 255, $text_alpha);
+            border: none;
+            border-radius: 8px;
+            padding: 15px;
+            font-family: '$font_family';
+            font-size: ${font_size}px;
+            color: rgba(51, 51, 51, $text_color_alpha);
+        }
+        QScrollBar:vertical {
+            background-color: rgba(240, 240, 240, $ui_alpha);
+            width: 8px;
+            border-radius: 4px;
+        }
+        QScrollBar::handle:vertical {
+            background-color: rgba(180, 180, 180, $handle_alpha);
+            border-radius: 4px;
+            min-height: 20px;
+        }
+        QScrollBar:horizontal {
+            height: 0px;
+        }
+    """),
+}
+
+
+class ThemeEngine:
+    """样式表引擎
+
+    每种不同的 (模式, 字体, 字号, 透明度) 组合只生成一次样式表。
+    apply() 在控件当前的样式表与目标相同时直接返回，
+    重复设置同样的样式不会触发Qt重新解析和重新布局。
+    """
+
+    def __init__(self):
+        self._reading_styles = {}  # (模式, 字体, 字号, 界面透明度, 文字透明度) -> 样式表
+
+    def reading_area_style(self, mode, font_family, font_size, ui_alpha=0, text_alpha=0):
+        """
+        阅读区域的样式表
+
+        Args:
+            mode (str): READING_AREA_TEMPLATES 中的模式名称
+            font_family (str): 字体
+            font_size (int): 字号（像素）
+            ui_alpha (int): 极简模式下滚动条的透明度，0-255，只用于translucent模式
+            text_alpha (int): 极简模式下文字背景的透明度，0-255，只用于translucent模式
+
+        Returns:
+            str: 样式表
+        """
+        key = (mode, font_family, font_size, ui_alpha, text_alpha)
+        style = self._reading_styles.get(key)
+        if style is None:
+            style = READING_AREA_TEMPLATES[mode].substitute(
+                font_family=font_family,
+                font_size=font_size,
+                ui_alpha=ui_alpha,
+                text_alpha=text_alpha,
+                text_color_alpha=min(255, text_alpha + 55),
+                handle_alpha=min(255, ui_alpha + 50))
+            self._reading_styles[key] = style
+        return style
+
+    def apply(self, widget, style):
+        """
+        设置控件的样式表，与当前样式表相同时不做任何事
+
+        Returns:
+            bool: 是否实际设置了样式表
+        """
+        if widget.styleSheet() == style:
+            return False
+        widget.setStyleSheet(style)
+        return True
+
+    def apply_reading_area(self, widget, mode, font_family, font_size, ui_alpha=0, text_alpha=0):
+        """按模式和字体设置阅读区域的样式表"""
+        return self.apply(widget, self.reading_area_style(
+            mode, font_family, font_size, ui_alpha, text_alpha))
@@ -8,6 +8,9 @@ import sys
 from PyQt5.QtWidgets import QSystemTrayIcon, QMenu, QAction, QApplication
 from PyQt5.QtCore import QObject, pyqtSignal
 from PyQt5.QtGui import QIcon, QPixmap, QPainter, QColor
+from debug_log import get_logger
+
+log = get_logger('tray')
 
 class TrayManager(QObject):
     """系统托盘管理器类"""
@@ -23,7 +26,7 @@ class TrayManager(QObject):
         
         # 检查系统是否支持托盘图标
         if not QSystemTrayIcon.isSystemTrayAvailable():
-            print("系统托盘不可用")
+            log.warning("系统托盘不可用")
             return
             
         self.create_tray_icon()
@@ -51,15 +54,14 @@ class TrayManager(QObject):
             self.tray_icon.show()
             
         except Exception as e:
-            print(f"创建托盘图标时出错: {e}")
+            log.warning(f"创建托盘图标时出错: {e}")
             
     def create_icon(self):
-        """创建应用图标 - 使用logo.png"""
-        # 尝试加载logo.png文件作为图标
-        import os
-        icon_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logo.png")
-        if os.path.exists(icon_path):
-            return QIcon(icon_path)
+        """创建应用图标 - 使用预缩放的logo.png"""
+        # 图标缓存中的小尺寸图标，托盘只读取它需要的尺寸
+        icon = self.main_window.icon_cache.icon()
+        if icon is not None:
+            return icon
         else:
             # 如果logo.png不存在，则使用原来的绘制图标
             # 创建一个类似谷歌浏览器的圆形图标
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+虚拟文本视图模块
+通过内存映射读取超大文本文件，只解码和排版可视区域附近的行
+"""
+
+import codecs
+import mmap
+import os
+import threading
+from array import array
+from itertools import accumulate
+
+from PyQt5.QtCore import Qt, QPointF
+from PyQt5.QtGui import QPainter, QTextLayout, QTextOption
+from PyQt5.QtWidgets import QAbstractScrollArea
+
+from document_reader import check_cancelled
+
+# 行索引的采样间隔：每隔这么多行记录一次行首偏移，内存占用与文件大小无关
+LINE_INDEX_STEP = 256
+
+# 建立行索引时每次读取的字节数
+INDEX_CHUNK_SIZE = 4 * 1024 * 1024
+
+# 每行最多的字节数，更长的行在索引中按这个长度（退到字符边界）切分为多行，
+# 解码和排版的开销与行长无关，滚动条也覆盖超长行的全部内容
+MAX_LINE_BYTES = 16 * 1024
+
+
+class MappedTextFile:
+    """内存映射的文本文件
+
+    这里的“行”是显示行：以换行符结束、不超过 MAX_LINE_BYTES 的一段字节，
+    超长的行被切分为多个显示行，行号、滚动条和阅读进度都以显示行为单位。
+    行首偏移只按 LINE_INDEX_STEP 采样保存，定位某一行时从最近的采样点逐行向后查找。
+    只支持换行符为单字节 \\n 的编码（UTF-8、GBK等）。
+    """
+
+    def __init__(self, file_path, encoding='utf-8'):
+        self.file_path = file_path
+        self.encoding = encoding
+        self._file = open(file_path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._mmap = None
+        if self.size > 0:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._lock = threading.Lock()
+        self._checkpoints = array('Q', [0])
+        self._rows = 0                 # 已索引部分结束了的行数
+        self._row_start = 0            # 已索引部分最后一行（尚未结束）的行首偏移
+        self.indexed_bytes = 0
+        self.index_complete = self.size == 0
+
+    @property
+    def line_count(self):
+        """已知的行数，索引建立完成前会随进度增加"""
+        if self.index_complete and self._row_start < self.size:
+            return self._rows + 1
+        return max(self._rows, 1)
+
+    def build_index(self, progress_callback=None, cancel_check=None):
+        """
+        建立行索引，使用普通文件读取而不是映射，扫描过的页面不会留在进程内存中
+
+        Args:
+            progress_callback (callable): 参数为(已索引字节数, 文件大小)
+            cancel_check (callable): 返回True时中止并抛出LoadCancelled
+        """
+        with open(self.file_path, 'rb') as file, open(self.file_path, 'rb') as segment_file:
+            def read_segment(start):
+                segment_file.seek(start)
+                return segment_file.read(MAX_LINE_BYTES)
+
+            offset = 0
+            while offset < self.size:
+                check_cancelled(cancel_check)
+                data = file.read(INDEX_CHUNK_SIZE)
+                if not data:
+                    break
+                self._index_chunk(data, offset, read_segment)
+                offset += len(data)
+                self.indexed_bytes = offset
+                if progress_callback:
+                    progress_callback(offset, self.size)
+        self.index_complete = True
+
+    def _index_chunk(self, data, offset, read_segment):
+        """
+        记录数据块中落在采样行上的行首偏移
+
+        Args:
+            read_segment (callable): 参数为偏移，读取从这里开始的 MAX_LINE_BYTES 字节，用于切分超长行
+        """
+        parts = data.split(b'\n')
+        count = len(parts) - 1
+        end = offset + len(data)
+        if count == 0:
+            self._split_long_row(end, read_segment)
+            return
+        # 第k个换行符（从0开始）之后的位置是 ends[k] + k + 1
+        ends = list(accumulate(map(len, parts[:-1])))
+        first_length = offset + ends[0] - self._row_start
+        if max(first_length, max(map(len, parts[1:-1]), default=0)) <= MAX_LINE_BYTES:
+            # 没有超长行：每个换行符结束一行
+            step = LINE_INDEX_STEP
+            first = (step - self._rows % step) - 1
+            checkpoints = array('Q', (offset + ends[k] + k + 1 for k in range(first, count, step)))
+            with self._lock:
+                self._checkpoints.extend(checkpoints)
+                self._rows += count
+                self._row_start = offset + ends[-1] + count
+        else:
+            for k in range(count):
+                newline = offset + ends[k] + k
+                self._split_long_row(newline, read_segment)
+                self._end_row(newline + 1)
+        self._split_long_row(end, read_segment)
+
+    def _split_long_row(self, end, read_segment):
+        """已索引到end且其中没有换行符，把当前行超过 MAX_LINE_BYTES 的部分切分出去"""
+        while end - self._row_start > MAX_LINE_BYTES:
+            start = self._row_start
+            self._end_row(start + self._segment_length(read_segment(start)))
+
+    def _end_row(self, next_start):
+        """结束当前行，下一行从next_start开始"""
+        with self._lock:
+            self._rows += 1
+            if self._rows % LINE_INDEX_STEP == 0:
+                self._checkpoints.append(next_start)
+            self._row_start = next_start
+
+    def _segment_length(self, data):
+        """超长行的一段：data中到最后一个完整字符为止的字节数，不把多字节字符切开"""
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+        decoder.decode(data)
+        return len(data) - len(decoder.getstate()[0])
+
+    def _row_end(self, offset):
+        """
+        从offset开始的一行
+
+        Returns:
+            tuple: (行内容的结束偏移, 下一行的行首偏移)
+        """
+        limit = offset + MAX_LINE_BYTES
+        newline = self._mmap.find(b'\n', offset, limit + 1)
+        if newline != -1:
+            return newline, newline + 1
+        if limit < self.size:
+            # 超长行：切分出不超过 MAX_LINE_BYTES 的一段，与建立索引时一致
+            end = offset + self._segment_length(self._mmap[offset:limit])
+            return end, end
+        return self.size, self.size
+
+    def line_offset(self, line):
+        """某一行的行首偏移，超出已索引范围时返回None"""
+        if line > self._rows or self._mmap is None:
+            return 0 if line == 0 else None
+        with self._lock:
+            offset = self._checkpoints[line // LINE_INDEX_STEP]
+        for _ in range(line % LINE_INDEX_STEP):
+            if offset >= self.size:
+                return None
+            offset = self._row_end(offset)[1]
+        return offset
+
+    def read_lines(self, first, count):
+        """
+        读取并解码若干行
+
+        Returns:
+            list: 解码后的行文本
+        """
+        if self._mmap is None:
+            return []
+        offset = self.line_offset(first)
+        if offset is None:
+            return []
+        lines = []
+        while len(lines) < count and offset < self.size:
+            end, next_offset = self._row_end(offset)
+            raw = self._mmap[offset:end]
+            if end != next_offset and raw.endswith(b'\r'):
+                raw = raw[:-1]
+            lines.append(raw.decode(self.encoding, errors='replace'))
+            offset = next_offset
+        return lines
+
+    def close(self):
+        """关闭映射和文件"""
+        if self._mmap:
+            self._mmap.close()
+            self._mmap = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class VirtualTextView(QAbstractScrollArea):
+    """虚拟文本视图
+
+    滚动条以行为单位覆盖整个文件，每次绘制只解码和排版从顶部行开始、
+    填满可视区域所需的那些行，长行按视图宽度自动换行。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.text_file = None
+        self.margin = 10
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.verticalScrollBar().setSingleStep(1)
+        self.verticalScrollBar().valueChanged.connect(self.viewport().update)
+
+    def set_text_file(self, text_file):
+        """设置要显示的文件，传入None时清空"""
+        self.text_file = text_file
+        self.verticalScrollBar().setValue(0)
+        self.update_line_count()
+        self.viewport().update()
+
+    def update_line_count(self):
+        """行索引增长后更新滚动条范围"""
+        bar = self.verticalScrollBar()
+        lines = self.text_file.line_count if self.text_file else 0
+        bar.setRange(0, max(0, lines - 1))
+        bar.setPageStep(max(1, self._visible_line_estimate()))
+
+    def top_line(self):
+        """可视区域顶部的行号"""
+        return self.verticalScrollBar().value()
+
+    def scroll_to_line(self, line):
+        """滚动到指定行"""
+        self.verticalScrollBar().setValue(line)
+
+    def _visible_line_estimate(self):
+        line_height = self.fontMetrics().lineSpacing()
+        return max(1, (self.viewport().height() - 2 * self.margin) // max(1, line_height))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_line_count()
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.fillRect(self.viewport().rect(), self.palette().base())
+        if not self.text_file:
+            return
+
+        painter.setPen(self.palette().text().color())
+        width = self.viewport().width() - 2 * self.margin
+        height = self.viewport().height()
+        line_spacing = self.fontMetrics().lineSpacing()
+        option = QTextOption()
+        option.setWrapMode(QTextOption.WrapAtWordBoundaryOrAnywhere)
+
+        y = self.margin
+        first = self.verticalScrollBar().value()
+        # 最多读取可视区域能容纳的行数，长行换行后会提前填满
+        for text in self.text_file.read_lines(first, self._visible_line_estimate() + 1):
+            layout = QTextLayout(text, self.font())
+            layout.setTextOption(option)
+            layout.beginLayout()
+            line_y = 0
+            while True:
+                line = layout.createLine()
+                if not line.isValid():
+                    break
+                line.setLineWidth(width)
+                line.setPosition(QPointF(0, line_y))
+                line_y += line_spacing
+            layout.endLayout()
+            layout.draw(painter, QPointF(self.margin, y))
+            y += max(line_y, line_spacing)
+            if y >= height:
+                break
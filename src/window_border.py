@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+窗口边框命中测试模块
+无边框窗口靠边框区域调整大小和移动，边界在窗口大小变化时预先算好，
+鼠标事件中只做几次整数比较
+"""
+
+from PyQt5.QtCore import Qt
+
+# 各区域对应的光标，None表示不在边框上
+REGION_CURSORS = {
+    None: Qt.ArrowCursor,
+    'top': Qt.SizeAllCursor,           # 上边框移动窗口
+    'top-left': Qt.SizeFDiagCursor,
+    'bottom-right': Qt.SizeFDiagCursor,
+    'top-right': Qt.SizeBDiagCursor,
+    'bottom-left': Qt.SizeBDiagCursor,
+    'left': Qt.SizeHorCursor,
+    'right': Qt.SizeHorCursor,
+    'bottom': Qt.SizeVerCursor,
+}
+
+
+class BorderHitTester:
+    """边框命中测试
+
+    区域名称与调整大小的方向一致：'left'、'right'、'bottom'、
+    'top-left'、'top-right'、'bottom-left'、'bottom-right'，
+    上边框（不含角落）为 'top'，用于移动窗口。
+    """
+
+    def __init__(self, border_width=7):
+        self.border_width = border_width
+        self._width = 0
+        self._height = 0
+        self._right = 0   # x 大于等于此值在右边框上
+        self._bottom = 0  # y 大于等于此值在下边框上
+
+    def set_border_width(self, border_width):
+        """修改边框宽度"""
+        self.border_width = border_width
+        self.update_geometry(self._width, self._height)
+
+    def update_geometry(self, width, height):
+        """窗口大小变化时重新计算边界"""
+        self._width = width
+        self._height = height
+        self._right = width - self.border_width
+        self._bottom = height - self.border_width
+
+    def hit(self, x, y):
+        """
+        判断窗口坐标落在哪个边框区域
+
+        Returns:
+            str: 区域名称，不在边框上时返回None
+        """
+        border = self.border_width
+        if border < x < self._right and border < y < self._bottom:
+            return None
+
+        left = x <= border
+        right = x >= self._right
+        if y <= border:
+            if left:
+                return 'top-left'
+            return 'top-right' if right else 'top'
+        if y >= self._bottom:
+            if left:
+                return 'bottom-left'
+            return 'bottom-right' if right else 'bottom'
+        return 'left' if left else 'right'
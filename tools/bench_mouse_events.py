@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+鼠标事件性能测试
+向主窗口和子控件发送大量鼠标移动事件，统计每秒能处理的事件数
+子控件的事件经主窗口的事件过滤器转发给主窗口处理
+
+用法:
+    python tools/bench_mouse_events.py              # 跟踪关闭
+    python tools/bench_mouse_events.py --trace      # 开启mouse、cursor、border跟踪
+    python tools/bench_mouse_events.py --src 旧版本的src目录   # 与旧版本对比
+
+调试输出被重定向到空设备，模拟没有控制台的窗口程序。
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="鼠标事件性能测试")
+    parser.add_argument('--events', type=int, default=20000, help="每个目标发送的事件数")
+    parser.add_argument('--trace', action='store_true', help="开启热路径调试日志")
+    parser.add_argument('--src', default=os.path.join(ROOT, 'src'), help="被测试的src目录")
+    return parser.parse_args()
+
+
+def positions(width, height, count):
+    """在窗口内来回移动的坐标序列，约一成落在边框附近"""
+    points = []
+    for i in range(count):
+        if i % 10 == 0:
+            points.append((width - 2, (i * 7) % height))
+        else:
+            points.append(((i * 13) % width, (i * 7) % height))
+    return points
+
+
+def send_moves(app, target, points):
+    from PyQt5.QtCore import QEvent, QPoint, Qt
+    from PyQt5.QtGui import QMouseEvent
+
+    start = time.perf_counter()
+    for x, y in points:
+        event = QMouseEvent(QEvent.MouseMove, QPoint(x, y), target.mapToGlobal(QPoint(x, y)),
+                            Qt.NoButton, Qt.NoButton, Qt.NoModifier)
+        app.sendEvent(target, event)
+    return time.perf_counter() - start
+
+
+def main():
+    args = parse_args()
+    if args.trace:
+        os.environ['THIEF_READER_LOG'] = 'mouse,cursor,border'
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    sys.path.insert(0, os.path.abspath(args.src))
+
+    # 在临时目录中运行，不修改真实的配置文件
+    os.chdir(tempfile.mkdtemp(prefix='bench_mouse_'))
+
+    from PyQt5.QtCore import qInstallMessageHandler
+    from PyQt5.QtWidgets import QApplication
+    qInstallMessageHandler(lambda *args: None)  # 不输出Qt的样式表警告
+    app = QApplication(sys.argv)
+
+    with open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        try:
+            from debug_log import setup_logging
+            setup_logging()
+        except ImportError:
+            pass  # 旧版本没有日志模块
+        from main_window import MainWindow
+        window = MainWindow()
+        window.resize(1000, 700)
+        window.show()
+        app.processEvents()
+
+        results = []
+        for name, target in [("主窗口", window), ("状态栏", window.status_bar)]:
+            points = positions(target.width(), target.height(), args.events)
+            send_moves(app, target, points[:200])  # 预热
+            elapsed = send_moves(app, target, points)
+            results.append((name, elapsed))
+
+    print(f"被测试的代码: {os.path.abspath(args.src)}  跟踪: {'开启' if args.trace else '关闭'}")
+    for name, elapsed in results:
+        print(f"{name}: {args.events} 个事件, {elapsed:.3f} 秒, {args.events / elapsed:,.0f} 事件/秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF提取性能测试
+比较单线程逐页提取和多进程并行提取全部页面的耗时，并检查两者结果一致
+
+用法:
+    python tools/bench_pdf_extract.py 文档.pdf
+    python tools/bench_pdf_extract.py 文档.pdf --workers 4 --chunk 16
+
+并行提取的时间包括启动子进程的开销；"首段"是第一段页面送出的时间。
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from document_reader import DocumentReader
+from pdf_extractor import ParallelPdfExtractor, PDF_CHUNK_PAGES, PDF_WORKERS
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="PDF提取性能测试")
+    parser.add_argument('pdf', help="PDF文件")
+    parser.add_argument('--workers', type=int, default=max(2, PDF_WORKERS), help="子进程数")
+    parser.add_argument('--chunk', type=int, default=PDF_CHUNK_PAGES, help="每个子进程任务的页数")
+    return parser.parse_args()
+
+
+def timed_extract(reader, file_path):
+    """提取全部页面，返回 (各页文本, 总耗时, 首段耗时)"""
+    first = []
+    start = time.perf_counter()
+
+    def on_pages(start_page, pages):
+        if not first:
+            first.append(time.perf_counter() - start)
+
+    pages = reader.extract_pdf_pages(file_path, pages_callback=on_pages)
+    return pages, time.perf_counter() - start, first[0] if first else 0.0
+
+
+def main():
+    args = parse_args()
+    print(f"CPU核心数: {os.cpu_count()}")
+
+    serial, serial_time, serial_first = timed_extract(DocumentReader(), args.pdf)
+    print(f"单线程: {len(serial)} 页, {serial_time:.2f}s, 首段 {serial_first:.3f}s")
+
+    extractor = ParallelPdfExtractor(args.workers, args.chunk)
+    try:
+        parallel, parallel_time, parallel_first = timed_extract(DocumentReader(extractor), args.pdf)
+    finally:
+        extractor.shutdown()
+    print(f"{args.workers} 个进程: {len(parallel)} 页, {parallel_time:.2f}s, 首段 {parallel_first:.3f}s, "
+          f"加速 {serial_time / parallel_time:.2f}x")
+
+    if parallel != serial:
+        print("结果不一致!")
+        return 1
+    print("结果一致")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
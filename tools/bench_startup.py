@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动性能测试
+在全新的Python进程中多次启动阅读器，测量导入模块、创建主窗口和首次绘制的耗时，
+并检查首次绘制之前没有加载应当延迟导入的模块（PDF、Markdown引擎和很少用的对话框）
+
+用法:
+    python tools/bench_startup.py
+    python tools/bench_startup.py --runs 10 --budget 800
+    python tools/bench_startup.py --config-dir config
+
+默认在空的临时目录中启动（没有文档列表），先启动一次生成图标等缓存，之后的各次计时；
+--config-dir 使用已有的配置目录，测量带着真实文档列表启动的耗时。
+超过 --budget（毫秒，按中位数）时返回1，可用于持续集成。
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 首次绘制之前不应加载的模块
+DEFERRED_MODULES = ['PyPDF2', 'markdown', 'settings_dialog', 'library_dialog',
+                    'concurrent.futures.process']
+
+# 各阶段结束的时间点：(结果中的键, 显示名称)
+PHASES = [
+    ('interpreter', "解释器启动"),
+    ('qt', "导入PyQt5"),
+    ('imports', "导入主窗口模块"),
+    ('window', "创建主窗口"),
+    ('paint', "显示到首次绘制"),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="启动性能测试")
+    parser.add_argument('--runs', type=int, default=5, help="启动次数")
+    parser.add_argument('--budget', type=float, help="总耗时预算（毫秒），中位数超出时返回1")
+    parser.add_argument('--config-dir', help="使用已有的配置目录，默认每次使用空的临时目录")
+    return parser.parse_args()
+
+
+def child(launched):
+    """在子进程中启动阅读器，首次绘制后输出各阶段的时间点（秒，相对于父进程启动子进程的时刻）"""
+    marks = {'interpreter': time.time() - launched}
+    start = time.perf_counter()
+
+    def mark(name):
+        marks[name] = marks['interpreter'] + time.perf_counter() - start
+
+    from PyQt5.QtCore import QEvent, QObject, QTimer
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+    mark('qt')
+
+    sys.path.insert(0, os.path.join(ROOT, 'src'))
+    from main_window import MainWindow
+    mark('imports')
+
+    window = MainWindow()
+    mark('window')
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and 'paint' not in marks:
+                mark('paint')
+                QTimer.singleShot(0, app.quit)
+            return False
+
+    watcher = PaintWatcher()
+    window.installEventFilter(watcher)
+    window.show()
+    QTimer.singleShot(10000, app.quit)
+    app.exec_()
+
+    marks['deferred'] = [name for name in DEFERRED_MODULES if name in sys.modules]
+    print(json.dumps(marks))
+    # 不等待后台线程和进程池，退出耗时不计入启动
+    sys.stdout.flush()
+    os._exit(0)
+
+
+def run_once(work_dir):
+    """在工作目录中启动一次，返回各阶段的耗时（毫秒）和首次绘制前加载的延迟模块"""
+    launched = time.time()
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', str(launched)],
+        cwd=work_dir, capture_output=True, text=True, check=True).stdout
+    marks = json.loads(output.strip().splitlines()[-1])
+    if 'paint' not in marks:
+        raise RuntimeError("10秒内没有绘制主窗口")
+    phases = {}
+    previous = 0.0
+    for key, title in PHASES:
+        phases[key] = (marks[key] - previous) * 1000
+        previous = marks[key]
+    phases['total'] = marks['paint'] * 1000
+    return phases, marks['deferred']
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == '--child':
+        child(float(sys.argv[2]))
+        return 0
+
+    args = parse_args()
+    if args.config_dir and os.path.basename(os.path.normpath(args.config_dir)) != 'config':
+        print("--config-dir 应指向名为config的目录（阅读器在工作目录下的config中读取配置）")
+        return 2
+
+    temp_dir = None
+    if args.config_dir:
+        work_dir = os.path.dirname(os.path.abspath(args.config_dir))
+    else:
+        temp_dir = work_dir = tempfile.mkdtemp(prefix='reader-startup-')
+
+    runs = []
+    try:
+        if temp_dir is not None:
+            phases, _ = run_once(work_dir)
+            print(f"首次启动（生成缓存）: {phases['total']:.0f}ms")
+        for run in range(args.runs):
+            phases, deferred = run_once(work_dir)
+            runs.append(phases)
+            print(f"第 {run + 1} 次: {phases['total']:.0f}ms")
+            if deferred:
+                print(f"  首次绘制前加载了应延迟导入的模块: {', '.join(deferred)}")
+    finally:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    print("\n各阶段耗时（中位数）:")
+    for key, title in PHASES:
+        print(f"  {title}: {statistics.median(phases[key] for phases in runs):.1f}ms")
+    total = statistics.median(phases['total'] for phases in runs)
+    print(f"启动到首次绘制: {total:.1f}ms")
+    if args.budget is not None and total > args.budget:
+        print(f"超出预算 {args.budget:.0f}ms")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())